@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Throughput of the offline batch transform (`cli.py transform`).
+
+Writes a large file and a set of small files with identifier-heavy text,
+then transforms them by streaming (the stdin path), serially and through
+the process pool, and reports MB/s. Every output is checked against a
+single `apply_chain()` call over the same input, the function the
+interactive path uses. Before timing, small inputs are also cut into
+pieces of 1 and 64 bytes and streamed in small chunks, and must give the
+same output too.
+
+    python benchmarks/bench_batch.py --size-mb 256 --modes camel lower
+"""
+import argparse
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from features import batch
+from features.transforms import apply_chain
+
+SAMPLE = (
+    "The quick brown_fox jumps-over the lazyDog. parseHTTPResponse2 returns "
+    "XMLHttpRequest objects; don't panic!\n    nested_value = getUserID(42)\n"
+)
+
+# Inputs checked with tiny pieces and chunks before timing
+CHECK_INPUTS = (
+    "NASA AND ESA\n" * 10 + "the NASA rocket\n",
+    "HELLO WORLD the NASA rocket. AB CD\nTHIS IS LOUD. it was OK\n",
+    SAMPLE * 3,
+)
+CHECK_PIECE_BYTES = (1, 64)
+CHECK_CHUNK_CHARS = 7
+
+MB = 1024 * 1024
+
+
+def write_input(path, size):
+    reps = size // len(SAMPLE) + 1
+    with open(path, "w") as f:
+        f.write((SAMPLE * reps)[:size])
+
+
+def expected(paths, chain):
+    out = io.BytesIO()
+    for path in paths:
+        with batch.open_text(path) as f:
+            out.write(apply_chain(f.read(), chain).encode(batch.ENCODING, batch.ENCODING_ERRORS))
+    return out.getvalue()
+
+
+def run_stream(paths, chain, jobs):
+    out = io.BytesIO()
+    dst = io.TextIOWrapper(out, encoding=batch.ENCODING, errors=batch.ENCODING_ERRORS, newline="")
+    for path in paths:
+        with batch.open_text(path) as src:
+            batch.transform_stream(chain, src, dst)
+    dst.flush()
+    return out.getvalue()
+
+
+def run_files(paths, chain, jobs):
+    out = io.BytesIO()
+    batch.transform_files(paths, chain, out, jobs)
+    return out.getvalue()
+
+
+def check_pieces(tmp, chains):
+    """Return how many chains give different output when cut into small pieces."""
+    failed = 0
+    path = os.path.join(tmp, "check.txt")
+    for text in CHECK_INPUTS:
+        with batch.open_text(path, "w") as f:
+            f.write(text)
+        for chain in chains:
+            want = expected([path], chain)
+            got = {}
+            for piece_bytes in CHECK_PIECE_BYTES:
+                out = io.BytesIO()
+                batch.transform_files([path], chain, out, 1, piece_bytes=piece_bytes)
+                got[f"pieces of {piece_bytes} bytes"] = out.getvalue()
+            out = io.StringIO()
+            with batch.open_text(path) as src:
+                batch.transform_stream(chain, src, out, CHECK_CHUNK_CHARS)
+            got[f"stream in {CHECK_CHUNK_CHARS} chars"] = out.getvalue().encode(batch.ENCODING, batch.ENCODING_ERRORS)
+            for how, data in got.items():
+                if data != want:
+                    failed += 1
+                    print(f"check failed: {chain} on {text[:24]!r}... differs with {how}")
+    return failed
+
+
+def measure(func, paths, chain, jobs, want):
+    size = sum(os.path.getsize(p) for p in paths)
+    start = time.perf_counter()
+    got = func(paths, chain, jobs)
+    elapsed = time.perf_counter() - start
+    return size / MB / elapsed, got == want
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch transform throughput benchmark")
+    parser.add_argument("--size-mb", type=int, default=128, help="Size of the large file")
+    parser.add_argument("--small-files", type=int, default=256, help="Number of 256 KB files")
+    parser.add_argument("--modes", nargs="+", default=["camel", "lower", "title", "sentence"])
+    parser.add_argument("--jobs", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="kapsulate-batch-")
+    try:
+        if check_pieces(tmp, args.modes):
+            sys.exit(1)
+        large = [os.path.join(tmp, "large.txt")]
+        write_input(large[0], args.size_mb * MB)
+        small = []
+        for i in range(args.small_files):
+            small.append(os.path.join(tmp, f"small{i:04}.txt"))
+            write_input(small[-1], 256 * 1024)
+
+        runs = (
+            ("stream", run_stream, 1),
+            ("serial", run_files, 1),
+            (f"pool -j{args.jobs}", run_files, args.jobs),
+        )
+        print(f"{args.size_mb} MB file, {args.small_files} x 256 KB files, {os.cpu_count()} CPUs")
+        print(f"{'mode':<9} {'input':<6} " + " ".join(f"{name:>14}" for name, _, _ in runs))
+        for chain in args.modes:
+            for label, paths in (("large", large), ("small", small)):
+                want = expected(paths, chain)
+                cells = []
+                for _, func, jobs in runs:
+                    mb_s, same = measure(func, paths, chain, jobs, want)
+                    cells.append(f"{mb_s:8.1f} MB/s" + ("" if same else "!"))
+                print(f"{chain:<9} {label:<6} " + " ".join(f"{c:>14}" for c in cells))
+        print("(! = output differs from a single apply_chain() call)")
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark: per-operation latency of the clipboard backends.
+
+Must run inside a Wayland session with wl-clipboard installed. Klipper is
+used for writes by the persistent backend when it is running.
+
+    python benchmarks/bench_clipboard.py --iterations 200 --size 4096
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from PyQt6.QtCore import QCoreApplication
+from core.clipboard import ClipboardWatcher, PersistentClipboardBackend, WlClipboardBackend
+
+
+def measure(func, iterations):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "p50": statistics.median(samples),
+        "p95": samples[int(len(samples) * 0.95) - 1],
+        "mean": statistics.fmean(samples),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Clipboard backend latency benchmark")
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--size", type=int, default=4096, help="Payload size in bytes")
+    args = parser.parse_args()
+
+    app = QCoreApplication(sys.argv)
+    payload = ("x" * args.size).encode("utf-8")
+
+    watcher = ClipboardWatcher()
+    watcher.start()
+    backends = [WlClipboardBackend(), PersistentClipboardBackend(watcher)]
+
+    print(f"{'backend':<16} {'op':<6} {'p50 ms':>8} {'p95 ms':>8} {'mean ms':>8}")
+    for backend in backends:
+        def write():
+            seq = watcher.sequence()
+            backend.set_bytes(payload)
+            # A write only counts once the new offer is visible
+            watcher.wait_for_change(seq, 2000)
+
+        for op, func in (("set", write), ("get", backend.get_bytes)):
+            r = measure(func, args.iterations)
+            print(f"{backend.name:<16} {op:<6} {r['p50']:>8.2f} {r['p95']:>8.2f} {r['mean']:>8.2f}")
+
+    watcher.stop()
+    del app
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Cost of saving the clipboard before a transformation and restoring it after.
+
+For each payload the clipboard is filled with it, saved with the
+persistent backend's snapshot() (the part a transformation waits for,
+before Ctrl+C), replaced by a transformed text, and restored (the part
+that runs after the paste, while the worker is idle). Restored bytes
+are checked against the payload.
+
+  text-4k    4 KB of plain text, saved from the watcher's mirror
+  image-4m   a 4 MB image/png, read with wl-paste (only text is mirrored)
+  image-10m  a 10 MB image/png with a text/html alternative; only the
+             image is read with wl-paste, and spilled to a temporary file
+
+Uses the fake wl-paste / wl-copy from benchmarks/fakes unless --real is
+given (inside a Wayland session with wl-clipboard). Needs PyQt6, like
+bench_clipboard.py.
+
+    python benchmarks/bench_clipboard_restore.py --iterations 20
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+FAKES_DIR = os.path.join(BENCH_DIR, "fakes")
+sys.path.insert(0, os.path.join(os.path.dirname(BENCH_DIR), "src"))
+sys.path.insert(0, FAKES_DIR)
+
+from e2e_latency import percentiles
+
+MB = 1024 * 1024
+WAIT_MS = 5000
+
+
+def payloads():
+    text = ("parseHttpResponse for the quickBrown_fox " * 100)[:4096].encode("utf-8")
+    return {
+        "text-4k": {"text/plain;charset=utf-8": text},
+        "image-4m": {"image/png": os.urandom(4 * MB)},
+        "image-10m": {"image/png": os.urandom(10 * MB), "text/html": b'<img src="cat.png">'},
+    }
+
+
+def publish(offers):
+    """Put `offers` on the clipboard as one application offering every type would."""
+    if len(offers) == 1:
+        (mime_type, data), = offers.items()
+        subprocess.run(["wl-copy", "--type", mime_type], input=data, check=True)
+        return
+    # wl-copy offers a single type; the fake clipboard can hold several
+    import fakeclip
+    fakeclip.publish(offers)
+
+
+def run(name, offers, backend, watcher, iterations):
+    preferred = next(iter(offers))
+    snap_ms, restore_ms, visible_ms = [], [], []
+    spilled = ok = True
+    for _ in range(iterations):
+        seq = watcher.sequence()
+        publish(offers)
+        watcher.wait_for_change(seq, WAIT_MS)
+
+        start = time.perf_counter()
+        snapshot = backend.snapshot()
+        snap_ms.append((time.perf_counter() - start) * 1000)
+        spilled = snapshot.spilled
+
+        # The transformation's paste replaces the clipboard
+        seq = watcher.sequence()
+        backend.set_text("PARSE HTTP RESPONSE")
+        watcher.wait_for_change(seq, WAIT_MS)
+
+        seq = watcher.sequence()
+        start = time.perf_counter()
+        backend.restore(snapshot)
+        restore_ms.append((time.perf_counter() - start) * 1000)
+        watcher.wait_for_change(seq, WAIT_MS)
+        visible_ms.append((time.perf_counter() - start) * 1000)
+        snapshot.close()
+
+        restored = subprocess.run(["wl-paste", "--no-newline", "--type", preferred], capture_output=True).stdout
+        ok = ok and restored == offers[preferred]
+    return snap_ms, restore_ms, visible_ms, spilled, ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Clipboard snapshot and restore cost")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--real", action="store_true", help="Use the real wl-clipboard instead of the fakes")
+    args = parser.parse_args()
+
+    tmp = None
+    if not args.real:
+        tmp = tempfile.mkdtemp(prefix="kapsulate-bench-")
+        os.environ["KAPSULATE_FAKE_CLIPBOARD_DIR"] = os.path.join(tmp, "clipboard")
+        os.environ["PATH"] = FAKES_DIR + os.pathsep + os.environ.get("PATH", "")
+
+    from PyQt6.QtCore import QCoreApplication
+    from core.clipboard import ClipboardWatcher, PersistentClipboardBackend
+
+    app = QCoreApplication(sys.argv)
+    watcher = ClipboardWatcher()
+    watcher.start()
+    backend = PersistentClipboardBackend(watcher)
+    # Klipper is not part of the path being measured
+    backend._klipper_ok = False
+    try:
+        print(f"{'payload':<10} {'step':<20} {'p50 ms':>8} {'p95 ms':>8} {'mean ms':>8}")
+        for name, offers in payloads().items():
+            if args.real and len(offers) > 1:
+                continue
+            snap_ms, restore_ms, visible_ms, spilled, ok = run(name, offers, backend, watcher, args.iterations)
+            steps = (
+                ("snapshot (on path)", snap_ms),
+                ("restore (after)", restore_ms),
+                ("restore visible", visible_ms),
+            )
+            for step, samples in steps:
+                r = percentiles(samples)
+                print(f"{name:<10} {step:<20} {r['p50']:8.2f} {r['p95']:8.2f} {r['mean']:8.2f}")
+            print(f"{name:<10} {'spilled to disk' if spilled else 'kept in memory'}"
+                  + ("" if ok else "; restored bytes differ!"))
+    finally:
+        watcher.stop()
+        del app
+        if tmp:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Throughput of the TransformText / TransformTexts DBus methods.
+
+Starts the full service headless on a private session bus (with the fake
+clipboard and UInput stand-ins) and sends transform requests through the
+stdlib bus client:
+
+  sequential  one TransformText call at a time, waiting for each reply
+  pipelined   up to --window TransformText calls in flight on one connection
+  batched     TransformTexts calls carrying --batch strings each
+
+A NameHasOwner round-trip to the bus daemon is measured as the floor.
+Every reply is checked against apply_chain().
+
+Needs PyQt6 and `dbus-daemon`, like e2e_latency.py.
+
+    python benchmarks/bench_dbus_api.py --calls 5000 --window 64 --batch 100
+"""
+import argparse
+import collections
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from e2e_latency import SAMPLE, percentiles, start_private_bus
+from idle_wakeups import BOOTSTRAP
+from startup_profile import has_owner, service_env, stop
+from core.dbus_client import SessionBusClient
+from features.transforms import apply_chain
+
+SERVICE = ("org.kapsulate.service", "/org/kapsulate/Service", "local.py.main.KapsulateService")
+BUS = ("org.freedesktop.DBus", "/org/freedesktop/DBus", "org.freedesktop.DBus")
+START_TIMEOUT_S = 30
+
+
+def make_texts(count, size):
+    reps = size // len(SAMPLE) + 1
+    base = (SAMPLE + " ") * reps
+    # Vary the texts so no layer can serve repeats from a cache
+    return [f"{i} {base}"[:size] for i in range(count)]
+
+
+def bench_floor(bus, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        bus.call(*BUS, "NameHasOwner", SERVICE[0])
+    return calls / (time.perf_counter() - start), None
+
+
+def bench_sequential(bus, texts, mode, expected):
+    samples = []
+    start = time.perf_counter()
+    for text, want in zip(texts, expected):
+        t0 = time.perf_counter()
+        (got,) = bus.call(*SERVICE, "TransformText", text, mode)
+        samples.append((time.perf_counter() - t0) * 1000)
+        assert got == want, "TransformText reply differs from apply_chain()"
+    return len(texts) / (time.perf_counter() - start), percentiles(samples)
+
+
+def bench_pipelined(bus, texts, mode, expected, window):
+    in_flight = collections.deque()
+    start = time.perf_counter()
+    for text, want in zip(texts, expected):
+        if len(in_flight) >= window:
+            serial, w = in_flight.popleft()
+            assert bus.reply(serial)[0] == w, "TransformText reply differs from apply_chain()"
+        in_flight.append((bus.send(*SERVICE, "TransformText", text, mode), want))
+    while in_flight:
+        serial, w = in_flight.popleft()
+        assert bus.reply(serial)[0] == w, "TransformText reply differs from apply_chain()"
+    return len(texts) / (time.perf_counter() - start), None
+
+
+def bench_batched(bus, texts, mode, expected, batch):
+    start = time.perf_counter()
+    for i in range(0, len(texts), batch):
+        (got,) = bus.call(*SERVICE, "TransformTexts", texts[i:i + batch], mode)
+        assert got == expected[i:i + batch], "TransformTexts reply differs from apply_chain()"
+    return len(texts) / (time.perf_counter() - start), None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DBus text transform API throughput")
+    parser.add_argument("--calls", type=int, default=5000, help="Texts transformed per run")
+    parser.add_argument("--size", type=int, default=64, help="Characters per text")
+    parser.add_argument("--window", type=int, default=64, help="Calls in flight when pipelining")
+    parser.add_argument("--batch", type=int, default=100, help="Texts per TransformTexts call")
+    parser.add_argument("--modes", nargs="+", default=["camel", "upper"])
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="kapsulate-bench-")
+    bus_proc, address = start_private_bus()
+    service = subprocess.Popen([sys.executable, "-c", BOOTSTRAP], env=service_env(tmp, address),
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        with SessionBusClient(address, timeout=START_TIMEOUT_S) as bus:
+            deadline = time.monotonic() + START_TIMEOUT_S
+            while not has_owner(bus):
+                if time.monotonic() > deadline or service.poll() is not None:
+                    sys.exit("Service did not register on the bus")
+                time.sleep(0.01)
+
+            texts = make_texts(args.calls, args.size)
+            rate, _ = bench_floor(bus, args.calls)
+            print(f"{args.calls} texts of {args.size} chars; bus round-trip floor {rate:,.0f} calls/s")
+            print(f"{'mode':<8} {'run':<12} {'texts/s':>10} {'p50 ms':>8} {'p99 ms':>8}")
+            for mode in args.modes:
+                expected = [apply_chain(t, mode) for t in texts]
+                runs = (
+                    ("sequential", lambda: bench_sequential(bus, texts, mode, expected)),
+                    (f"pipelined/{args.window}", lambda: bench_pipelined(bus, texts, mode, expected, args.window)),
+                    (f"batched/{args.batch}", lambda: bench_batched(bus, texts, mode, expected, args.batch)),
+                )
+                for name, run in runs:
+                    rate, pcts = run()
+                    lat = f" {pcts['p50']:8.2f} {pcts['p99']:8.2f}" if pcts else f" {'-':>8} {'-':>8}"
+                    print(f"{mode:<8} {name:<12} {rate:10,.0f}{lat}")
+    finally:
+        stop(service)
+        bus_proc.terminate()
+        bus_proc.wait()
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Clipboard history benchmark: recording, search, memory and persistence.
+
+Fills a history with N text entries (mostly short, a few multi-megabyte
+ones, some repeats) and measures:
+
+  add         ClipboardHistory.add() per entry, including eviction
+  search      substring search through the trigram index (hit and miss);
+              entries longer than the indexed prefix are scanned in full
+  linear      the same search as a scan over all entries, for reference
+  memory      Python heap held by the history (tracemalloc)
+  reopen      replaying the persisted log on startup
+
+    python benchmarks/bench_history.py --count 1000 10000
+"""
+import argparse
+import os
+import random
+import shutil
+import string
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from features.history import INDEX_PREFIX_CHARS, MB, ClipboardHistory
+
+SEARCHES = 500
+LARGE_EVERY = 200
+LARGE_BYTES = 4 * MB
+
+
+def make_entries(count, rng):
+    words = ["".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 9))) for _ in range(5000)]
+    entries = []
+    for i in range(count):
+        if i % LARGE_EVERY == LARGE_EVERY - 1:
+            line = " ".join(rng.choice(words) for _ in range(20)) + "\n"
+            entries.append((line * (LARGE_BYTES // len(line))).encode())
+        elif i % 10 == 9 and entries:
+            entries.append(rng.choice(entries[-50:]))  # copied again
+        else:
+            entries.append(" ".join(rng.choice(words) for _ in range(rng.randint(1, 40))).encode())
+    return entries, words
+
+
+def check_search():
+    """Return True if search finds text only past the indexed prefix of an entry."""
+    history = ClipboardHistory(capacity=10, max_bytes=MB)
+    history.add(b"filler " * INDEX_PREFIX_CHARS + b"Needle at the end")
+    history.add(b"short entry")
+    found = [r["preview"][:6] for r in history.search("needle AT")] == ["filler"]
+    missed = history.search("needle at the start") == []
+    if not (found and missed):
+        print("check failed: search past the indexed prefix")
+    return found and missed
+
+
+def latency(func, queries):
+    samples = []
+    for q in queries:
+        start = time.perf_counter_ns()
+        func(q)
+        samples.append(time.perf_counter_ns() - start)
+    samples.sort()
+    return samples[len(samples) // 2] / 1000, samples[int(len(samples) * 0.95)] / 1000
+
+
+def bench(count, capacity, max_mb, rng):
+    entries, words = make_entries(count, rng)
+    tmp = tempfile.mkdtemp(prefix="kapsulate-history-")
+    path = os.path.join(tmp, "history.log")
+
+    tracemalloc.start()
+    history = ClipboardHistory(capacity=capacity, max_bytes=max_mb * MB, path=path)
+    start = time.perf_counter()
+    for data in entries:
+        history.add(data)
+    add_s = time.perf_counter() - start
+    heap_mb = tracemalloc.get_traced_memory()[0] / 1e6
+    tracemalloc.stop()
+
+    hits = [rng.choice(words) for _ in range(SEARCHES)]
+    misses = [w + "zq" for w in hits]
+    hit_p50, hit_p95 = latency(history.search, hits)
+    miss_p50, miss_p95 = latency(history.search, misses)
+
+    def linear(query):
+        texts = [history._text(e) for e in reversed(history._entries.values())]
+        return [t for t in texts if query in t.lower()][:50]
+
+    linear_p50, linear_p95 = latency(linear, hits[:50])
+    live, live_mb = len(history), history.total_bytes / MB
+    history.close()
+    log_mb = os.path.getsize(path) / MB
+
+    start = time.perf_counter()
+    reopened = ClipboardHistory(capacity=capacity, max_bytes=max_mb * MB, path=path)
+    reopen_s = time.perf_counter() - start
+    assert len(reopened) == live
+    reopened.close()
+    shutil.rmtree(tmp)
+
+    print(f"\n{count} copies -> {live} entries, {live_mb:.1f} MB live, {log_mb:.1f} MB log")
+    print(f"  add      {add_s / count * 1e6:9.1f} us per entry")
+    print(f"  memory   {heap_mb:9.1f} MB heap")
+    print(f"  search   hit p50 {hit_p50:7.1f} us  p95 {hit_p95:7.1f} us")
+    print(f"           miss p50 {miss_p50:6.1f} us  p95 {miss_p95:7.1f} us")
+    print(f"  linear   p50 {linear_p50:11.1f} us  p95 {linear_p95:7.1f} us")
+    print(f"  reopen   {reopen_s * 1000:9.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Clipboard history benchmark")
+    parser.add_argument("--count", type=int, nargs="+", default=[1000])
+    parser.add_argument("--capacity", type=int, default=1000)
+    parser.add_argument("--max-mb", type=int, default=64)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    if not check_search():
+        sys.exit(1)
+    rng = random.Random(args.seed)
+    for count in args.count:
+        bench(count, args.capacity, args.max_mb, rng)
+
+
+if __name__ == "__main__":
+    main()
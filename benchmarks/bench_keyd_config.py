@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+keyd config handling: parse/validate cost and reload time.
+
+Times parsing and validating the shipped kapsulate.conf and a large
+synthetic config, and a cached load of an unchanged file (one stat). With
+--live, also times `keyd reload` against the previous
+`systemctl restart keyd` on this machine; that needs keyd 2.4+ and root
+(or the keyd group for the reload).
+
+    python benchmarks/bench_keyd_config.py
+    sudo python benchmarks/bench_keyd_config.py --live --iterations 5
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from core.keyd_config import KeydConfigStore, parse_config
+
+SHIPPED_CONFIG = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config", "kapsulate.conf")
+
+
+def synthetic_config(layers, bindings):
+    lines = ["[ids]", "*", "", "[main]", "capslock = overload(layer0, esc)"]
+    for i in range(layers):
+        lines += ["", f"[layer{i}]"]
+        lines += [f"k{j} = macro(C-c {j})" for j in range(bindings - 1)]
+        lines.append(f"x = layer(layer{(i + 1) % layers})")
+    return "\n".join(lines) + "\n"
+
+
+def best_us(func, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter_ns()
+        func()
+        best = min(best, (time.perf_counter_ns() - start) / 1000)
+    return best
+
+
+def time_command(cmd, iterations):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL)
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return samples[len(samples) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="keyd config benchmark")
+    parser.add_argument("--layers", type=int, default=50)
+    parser.add_argument("--bindings", type=int, default=100, help="Bindings per synthetic layer")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--live", action="store_true", help="Also time keyd reload vs. restart")
+    parser.add_argument("--iterations", type=int, default=5)
+    args = parser.parse_args()
+
+    with open(SHIPPED_CONFIG) as f:
+        shipped = f.read()
+    synthetic = synthetic_config(args.layers, args.bindings)
+    for name, text in (("kapsulate.conf", shipped), (f"{args.layers}x{args.bindings} bindings", synthetic)):
+        _, errors = parse_config(text)
+        assert not errors, errors
+        us = best_us(lambda: parse_config(text), args.repeat)
+        print(f"parse + validate {name:<22} {us:10.1f} us")
+
+    with tempfile.NamedTemporaryFile("w", suffix=".conf", delete=False) as f:
+        f.write(synthetic)
+    try:
+        store = KeydConfigStore(f.name)
+        store.load()
+        us = best_us(store.load, args.repeat)
+        print(f"cached load (unchanged file)            {us:10.1f} us")
+    finally:
+        os.unlink(f.name)
+
+    if args.live:
+        reload_ms = time_command(["keyd", "reload"], args.iterations)
+        restart_ms = time_command(["systemctl", "restart", "keyd"], args.iterations)
+        print(f"keyd reload                             {reload_ms:10.1f} ms")
+        print(f"systemctl restart keyd                  {restart_ms:10.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Logging overhead on the calling thread.
+
+Simulates triggers that each log a short burst of typical worker lines
+(one INFO, the rest DEBUG) with idle time in between, through the previous
+setup (f-strings, synchronous FileHandler at DEBUG) and through the queue
+pipeline from core/logger.py (lazy %-formatting, writer thread, DEBUG kept
+in a ring until an error). Reports the time each burst costs the calling
+thread and the bytes written to disk.
+
+    python benchmarks/bench_logging.py --triggers 500 --calls-per-trigger 20
+"""
+import argparse
+import logging
+import logging.handlers
+import os
+import queue
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from core.logger import LOG_FORMAT, DebugRingHandler, DeferredQueueHandler
+
+# Pause between triggers; the writer thread drains the queue meanwhile
+IDLE_MS = 5
+
+
+def burst_fstring(logger, calls):
+    mode, waited, depth = "camel", 12.345, 0
+    logger.info(f"Triggering Text Transformation: {mode}")
+    for _ in range(calls - 1):
+        logger.debug(f"Clipboard changed {waited:.1f} ms after Ctrl+C (queue depth {depth})")
+
+
+def burst_lazy(logger, calls):
+    mode, waited, depth = "camel", 12.345, 0
+    logger.info("Triggering Text Transformation: %s", mode)
+    for _ in range(calls - 1):
+        logger.debug("Clipboard changed %.1f ms after Ctrl+C (queue depth %d)", waited, depth)
+
+
+def run_triggers(logger, burst, triggers, calls):
+    samples = []
+    for _ in range(triggers):
+        start = time.perf_counter_ns()
+        burst(logger, calls)
+        samples.append((time.perf_counter_ns() - start) / 1000)
+        time.sleep(IDLE_MS / 1000)
+    samples.sort()
+    return samples[len(samples) // 2], samples[int(len(samples) * 0.99)]
+
+
+def make_logger(name):
+    logger = logging.getLogger(name)
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+    return logger
+
+
+def bench_legacy(path, triggers, calls):
+    logger = make_logger("bench-legacy")
+    handler = logging.FileHandler(path)
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    logger.addHandler(handler)
+    result = run_triggers(logger, burst_fstring, triggers, calls)
+    handler.close()
+    logger.removeHandler(handler)
+    return result
+
+
+def bench_queue(path, triggers, calls):
+    logger = make_logger("bench-queue")
+    handler = logging.handlers.RotatingFileHandler(path, maxBytes=1024 * 1024, backupCount=3)
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    log_queue = queue.SimpleQueue()
+    queue_handler = DeferredQueueHandler(log_queue)
+    logger.addHandler(queue_handler)
+    listener = logging.handlers.QueueListener(log_queue, DebugRingHandler(handler), respect_handler_level=True)
+    listener.start()
+    result = run_triggers(logger, burst_lazy, triggers, calls)
+    listener.stop()
+    handler.close()
+    logger.removeHandler(queue_handler)
+    return result
+
+
+def disk_bytes(path):
+    return sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Logging overhead benchmark")
+    parser.add_argument("--triggers", type=int, default=500)
+    parser.add_argument("--calls-per-trigger", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{args.triggers} triggers of {args.calls_per_trigger} log calls (1 INFO, rest DEBUG)")
+    print(f"{'pipeline':<10} {'p50/trigger':>12} {'p99/trigger':>12} {'disk':>10}")
+    for name, bench in (("legacy", bench_legacy), ("queue", bench_queue)):
+        tmp = tempfile.mkdtemp(prefix="kapsulate-logging-")
+        p50, p99 = bench(os.path.join(tmp, "kapsulate.log"), args.triggers, args.calls_per_trigger)
+        size_kb = disk_bytes(tmp) / 1024
+        shutil.rmtree(tmp)
+        print(f"{name:<10} {p50:9.1f} us {p99:9.1f} us {size_kb:7.0f} KB")
+
+
+if __name__ == "__main__":
+    main()
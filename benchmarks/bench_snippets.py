@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Snippet store benchmark: load time, lookup latency, memory and reloads.
+
+Generates a snippet file with N abbreviations (bodies mostly small, 1% of
+them large) and measures:
+
+  load        initial index build from the file
+  find        SnippetStore.find() for a hit and a miss (includes body read)
+  linear      the same lookup as a scan over all abbreviations, for reference
+  memory      Python heap held by the index (tracemalloc) vs. the file size
+  append      reload after appending one snippet (incremental)
+  edit        reload after growing one body in the middle of the file
+  rebuild     building a fresh index of the edited file, for reference
+
+    python benchmarks/bench_snippets.py --count 10000 100000
+"""
+import argparse
+import os
+import random
+import string
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from features.snippets import SnippetStore
+
+LOOKUPS = 20000
+LARGE_BODY_BYTES = 256 * 1024
+
+
+def make_file(path, count, rng):
+    abbrs = set()
+    while len(abbrs) < count:
+        abbrs.add("".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 8))))
+    abbrs = sorted(abbrs)
+    with open(path, "w") as f:
+        f.write("# generated by bench_snippets.py\n")
+        for i, abbr in enumerate(abbrs):
+            f.write(f"::{abbr}\n")
+            if i % 100 == 99:
+                f.write(("lorem ipsum dolor sit amet " * (LARGE_BODY_BYTES // 27)) + "\n")
+            else:
+                f.write(" ".join(rng.choice(abbrs) for _ in range(rng.randint(5, 60))) + "\n")
+    return abbrs
+
+
+def timed(func, repeat=1):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    return (time.perf_counter() - start) / repeat, result
+
+
+def latency(func, queries):
+    samples = []
+    for q in queries:
+        start = time.perf_counter_ns()
+        func(q)
+        samples.append(time.perf_counter_ns() - start)
+    samples.sort()
+    return samples[len(samples) // 2] / 1000, samples[int(len(samples) * 0.95)] / 1000
+
+
+def bench(count, rng):
+    tmp = tempfile.mkdtemp(prefix="kapsulate-snippets-")
+    path = os.path.join(tmp, "snippets.txt")
+    abbrs = make_file(path, count, rng)
+    file_mb = os.path.getsize(path) / 1e6
+
+    tracemalloc.start()
+    store = SnippetStore(path)
+    load_s, _ = timed(store.reload)
+    heap_mb = tracemalloc.get_traced_memory()[0] / 1e6
+    tracemalloc.stop()
+
+    hits = [f"some text {rng.choice(abbrs)}" for _ in range(LOOKUPS)]
+    misses = [f"some text {rng.choice(abbrs)}zq" for _ in range(LOOKUPS)]
+    hit_p50, hit_p95 = latency(store.find, hits)
+    miss_p50, miss_p95 = latency(store.find, misses)
+    scan_queries = hits[:200]
+    linear_p50, linear_p95 = latency(lambda t: [a for a in abbrs if t.endswith(a)], scan_queries)
+
+    with open(path, "a") as f:
+        f.write("::zzappended\nnew body\n")
+    append_s, append_changed = timed(store.reload)
+
+    with open(path, "rb") as f:
+        data = f.read()
+    middle = data.index(f"\n::{abbrs[len(abbrs) // 2]}\n".encode()) + 1
+    end = data.index(b"\n", middle) + 1
+    with open(path, "wb") as f:
+        f.write(data[:end] + b"grown body line\n" + data[end:])
+    edit_s, edit_changed = timed(store.reload)
+    rebuild_s, _ = timed(lambda: SnippetStore(path).reload())
+
+    store.close()
+    os.remove(path)
+    os.rmdir(tmp)
+
+    print(f"\n{count} snippets, {file_mb:.1f} MB file")
+    print(f"  load     {load_s * 1000:9.1f} ms")
+    print(f"  memory   {heap_mb:9.1f} MB index heap ({heap_mb / file_mb * 100:.1f}% of the file)")
+    print(f"  find     hit p50 {hit_p50:7.1f} us  p95 {hit_p95:7.1f} us")
+    print(f"           miss p50 {miss_p50:6.1f} us  p95 {miss_p95:7.1f} us")
+    print(f"  linear   p50 {linear_p50:11.1f} us  p95 {linear_p95:7.1f} us")
+    print(f"  append   {append_s * 1000:9.1f} ms ({append_changed} entries changed)")
+    print(f"  edit     {edit_s * 1000:9.1f} ms ({edit_changed} entries changed)")
+    print(f"  rebuild  {rebuild_s * 1000:9.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Snippet store benchmark")
+    parser.add_argument("--count", type=int, nargs="+", default=[10000])
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+    for count in args.count:
+        bench(count, rng)
+
+
+if __name__ == "__main__":
+    main()
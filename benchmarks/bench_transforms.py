@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark: registry-based transform engine vs. the original if-chain.
+
+    python benchmarks/bench_transforms.py
+    python benchmarks/bench_transforms.py --sizes 1K 1M --modes camel snake
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from features.transforms import StreamTransformer, apply_chain, available_modes, get_mode, tokenize
+
+SAMPLE = (
+    "The quick brown_fox jumps-over the lazyDog. parseHTTPResponse2 returns "
+    "XMLHttpRequest objects; don't panic!\n    nested_value = getUserID(42)\n"
+)
+
+# Outputs checked before timing: (input, chain, expected)
+CHECKS = [
+    ("HELLO WORLD", "title", "Hello World"),
+    ("THIS IS A SHOUTED SENTENCE. OK", "sentence", "This is a shouted sentence. Ok"),
+    ("the NASA launch. it was OK", "sentence", "The NASA launch. It was OK"),
+    ("ßtart of a NASA thing", "sentence", "SStart of a NASA thing"),
+    ("don't parse the HTTP response", "title", "Don't Parse The HTTP Response"),
+    ("HELLO WORLD the NASA rocket. AB CD", "title", "HELLO WORLD The NASA Rocket. AB CD"),
+    ("NASA AND ESA\nthe NASA rocket", "title", "Nasa And Esa\nThe NASA Rocket"),
+]
+
+# Chunkings StreamTransformer output is checked against a single call with
+STREAM_CHUNKS = ([12, 17, 5], [1], [64])
+
+SIZES = {"1K": 1024, "1M": 1024 ** 2, "50M": 50 * 1024 ** 2}
+
+
+def legacy_transform(text, mode):
+    """TransformationWorker._transform_case before the transform engine."""
+    if mode == "upper": return text.upper()
+    if mode == "lower": return text.lower()
+    if mode == "title": return text.title()
+    if mode == "camel":
+        parts = text.replace("-", " ").replace("_", " ").split()
+        if not parts: return ""
+        return parts[0].lower() + "".join(p.capitalize() for p in parts[1:])
+    return text
+
+
+def make_input(size):
+    reps = size // len(SAMPLE) + 1
+    return (SAMPLE * reps)[:size]
+
+
+def check_outputs():
+    failed = 0
+    for text, chain, want in CHECKS:
+        got = apply_chain(text, chain)
+        if got != want:
+            failed += 1
+            print(f"check failed: {chain}({text!r}) = {got!r}, expected {want!r}")
+        for sizes in STREAM_CHUNKS:
+            streamed = stream_chain(text, chain, sizes)
+            if streamed != got:
+                failed += 1
+                print(f"check failed: {chain}({text!r}) streamed in {sizes} = {streamed!r}, "
+                      f"single call {got!r}")
+    return failed
+
+
+def stream_chain(text, chain, sizes):
+    """Feed `text` to a StreamTransformer in chunks of `sizes` (cycled)."""
+    stream = StreamTransformer(chain)
+    out = []
+    pos = i = 0
+    while pos < len(text):
+        size = sizes[i % len(sizes)]
+        out.append(stream.feed(text[pos:pos + size]))
+        pos += size
+        i += 1
+    out.append(stream.flush())
+    return "".join(out)
+
+
+def best_of(func, text, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Transform engine benchmark")
+    parser.add_argument("--sizes", nargs="+", default=list(SIZES), choices=list(SIZES))
+    parser.add_argument("--modes", nargs="+", default=available_modes())
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if check_outputs():
+        sys.exit(1)
+    tokenize("")  # exclude the one-off tokenizer compile
+    print(f"{'size':>5} {'mode':<9} {'engine ms':>10} {'MB/s':>8} {'legacy ms':>10}")
+    for size_name in args.sizes:
+        text = make_input(SIZES[size_name])
+        repeat = 1 if SIZES[size_name] > SIZES["1M"] else args.repeat
+        for name in args.modes:
+            mode = get_mode(name)
+            t = best_of(mode, text, repeat)
+            mbps = len(text) / t / 1024 ** 2
+            legacy = "-"
+            if name in ("upper", "lower", "title", "camel"):
+                legacy = f"{best_of(lambda s: legacy_transform(s, name), text, repeat) * 1000:10.2f}"
+            print(f"{size_name:>5} {name:<9} {t * 1000:10.2f} {mbps:8.1f} {legacy:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Keystroke output rate of type mode (`[transform] output = type`).
+
+Types text into a pipe that stands in for the uinput device, with a
+reader thread draining it the way the compositor drains the device, and
+reports characters per second for:
+
+  per-event  one write() per event, as UInput.write() + syn() would do
+  batched    encode_text() batches, one write() each, as the worker does
+  paced      batched plus the worker's pause between batches, i.e. the
+             rate a real application sees
+
+The events are decoded again and checked against the input text. The
+latency of typing against pasting, end to end through the service, is
+measured by `e2e_latency.py --outputs paste type`.
+
+    python benchmarks/bench_type.py --chars 16 64 256 --iterations 200
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+import types
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(BENCH_DIR), "src"))
+sys.path.insert(0, os.path.join(BENCH_DIR, "fakes"))
+
+from fake_uinput import ECODES, TYPED_CHARS
+from features.keymap import INPUT_EVENT, build_keymap, encode_text
+
+# Keep this in sync with TYPE_BATCH_PAUSE_MS in features/text_engine.py (which needs Qt)
+BATCH_PAUSE_MS = 1
+
+SAMPLE = "Hello wonderful World, parseHttpResponse for the quickBrown_fox! "
+
+E = types.SimpleNamespace(**ECODES)
+
+
+class PipeDevice:
+    """A pipe read by a thread that decodes the typed characters back."""
+
+    def __init__(self):
+        self._read_fd, self.fd = os.pipe()
+        self.typed = []
+        self._thread = threading.Thread(target=self._drain, daemon=True)
+        self._thread.start()
+
+    def _drain(self):
+        size = INPUT_EVENT.size
+        pending = b""
+        shift = False
+        with os.fdopen(self._read_fd, "rb", buffering=0) as pipe:
+            while True:
+                data = pipe.read(64 * size)
+                if not data:
+                    break
+                pending += data
+                whole = len(pending) - len(pending) % size
+                for _sec, _usec, etype, code, value in INPUT_EVENT.iter_unpack(pending[:whole]):
+                    if etype != E.EV_KEY:
+                        continue
+                    if code == E.KEY_LEFTSHIFT:
+                        shift = bool(value)
+                    elif value == 1:
+                        self.typed.append(TYPED_CHARS[(code, shift)])
+                pending = pending[whole:]
+
+    def close(self):
+        os.close(self.fd)
+        self._thread.join()
+        return "".join(self.typed)
+
+
+def type_per_event(fd, text, keymap):
+    for batch in encode_text(text, keymap, E):
+        for i in range(0, len(batch), INPUT_EVENT.size):
+            os.write(fd, batch[i:i + INPUT_EVENT.size])
+
+
+def type_batched(fd, text, keymap):
+    for batch in encode_text(text, keymap, E):
+        os.write(fd, batch)
+
+
+def type_paced(fd, text, keymap):
+    for i, batch in enumerate(encode_text(text, keymap, E)):
+        if i:
+            time.sleep(BATCH_PAUSE_MS / 1000)
+        os.write(fd, batch)
+
+
+def measure(func, text, keymap, iterations):
+    device = PipeDevice()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func(device.fd, text, keymap)
+    elapsed = time.perf_counter() - start
+    same = device.close() == text * iterations
+    return len(text) * iterations / elapsed, elapsed / iterations * 1000, same
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Type mode keystroke rate benchmark")
+    parser.add_argument("--chars", type=int, nargs="+", default=[16, 64, 256], help="Text lengths")
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    keymap = build_keymap(E, ("us", ""))
+    runs = (("per-event", type_per_event), ("batched", type_batched), ("paced", type_paced))
+    print(f"{'chars':>6} {'run':<10} {'chars/s':>12} {'ms/text':>9} {'batches':>8}")
+    for length in args.chars:
+        text = (SAMPLE * (length // len(SAMPLE) + 1))[:length]
+        batches = len(encode_text(text, keymap, E))
+        for name, func in runs:
+            rate, ms, same = measure(func, text, keymap, args.iterations)
+            print(f"{length:6} {name:<10} {rate:12,.0f} {ms:9.3f} {batches:8}" + ("" if same else " !"))
+    print("(! = decoded keystrokes differ from the text)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark for the trigger client.
+
+Measures the wall time of one complete client run (interpreter start,
+imports, bus connection, method call, exit) against the real
+KapsulateService on a private session bus:
+
+  python     bare `python -c pass`, the floor for any Python client
+  cli        `cli.py stats --json` with the stdlib DBus client
+  legacy-qt  the previous client: QCoreApplication + QtDBus for one call
+
+Needs PyQt6 and `dbus-daemon`, like e2e_latency.py.
+
+    python benchmarks/cli_startup.py --iterations 30 --json startup.json
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from e2e_latency import FAKES_DIR, SRC_DIR, git_revision, percentiles, start_private_bus
+
+# The Qt based client used before the stdlib DBus client, reduced to one call
+LEGACY_CLIENT = """
+import sys
+from PyQt6.QtCore import QCoreApplication
+from PyQt6.QtDBus import QDBusConnection, QDBusMessage
+app = QCoreApplication(sys.argv)
+msg = QDBusMessage.createMethodCall(
+    "org.kapsulate.service", "/org/kapsulate/Service",
+    "local.py.main.KapsulateService", "GetStats")
+reply = QDBusConnection.sessionBus().call(msg)
+sys.exit(reply.type() == QDBusMessage.MessageType.ErrorMessage)
+"""
+
+CLIENTS = {
+    "python": [sys.executable, "-c", "pass"],
+    "cli": [sys.executable, os.path.join(SRC_DIR, "cli.py"), "stats", "--json"],
+    "legacy-qt": [sys.executable, "-c", LEGACY_CLIENT],
+}
+
+
+def measure(cmd, iterations):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        subprocess.run(cmd, stdout=subprocess.DEVNULL, check=True)
+        samples.append((time.perf_counter() - start) * 1000)
+    return percentiles(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Kapsulate trigger client startup benchmark")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--clients", nargs="+", default=list(CLIENTS), choices=list(CLIENTS))
+    parser.add_argument("--json", help="Write machine-readable results to this file")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="kapsulate-bench-")
+    bus, address = start_private_bus()
+    os.environ.update({
+        "DBUS_SESSION_BUS_ADDRESS": address,
+        "PATH": FAKES_DIR + os.pathsep + os.environ.get("PATH", ""),
+        "KAPSULATE_FAKE_CLIPBOARD_DIR": os.path.join(tmp, "clipboard"),
+        "XDG_DATA_HOME": os.path.join(tmp, "data"),
+        "XDG_CONFIG_HOME": os.path.join(tmp, "config"),
+        "QT_QPA_PLATFORM": "offscreen",
+    })
+
+    import fake_uinput
+    fake_uinput.install()
+
+    from PyQt6.QtCore import QMetaObject, Qt
+    from PyQt6.QtWidgets import QApplication
+    from core.logger import setup_logging
+    from core.listener import KapsulateService
+
+    setup_logging(tmp)
+    app = QApplication([sys.argv[0]])
+    service = KapsulateService()
+
+    results = {
+        "benchmark": "cli_startup",
+        "revision": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "config": {"iterations": args.iterations},
+        "clients": {},
+    }
+
+    def drive():
+        try:
+            for name in args.clients:
+                # One untimed run so every client starts from a warm page cache
+                subprocess.run(CLIENTS[name], stdout=subprocess.DEVNULL)
+                results["clients"][name] = measure(CLIENTS[name], args.iterations)
+        finally:
+            QMetaObject.invokeMethod(app, "quit", Qt.ConnectionType.QueuedConnection)
+
+    threading.Thread(target=drive, name="bench-driver", daemon=True).start()
+    try:
+        app.exec()
+    finally:
+        service.text_engine.shutdown()
+        bus.terminate()
+        bus.wait()
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    print(f"{'client':<10} {'p50':>8} {'p95':>8} {'mean':>8} {'n':>4}  (ms per run)")
+    for name, r in results["clients"].items():
+        print(f"{name:<10} {r['p50']:8.2f} {r['p95']:8.2f} {r['mean']:8.2f} {r['n']:4}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+End-to-end latency benchmark for `cli.py trigger transform <mode>` -> paste.
+
+Runs the real KapsulateService headless on a private session bus with
+stand-ins for the rest of the desktop:
+
+- fake `wl-paste` / `wl-copy` executables backed by files (benchmarks/fakes)
+- a fake UInput sink that timestamps every event and drives a fake
+  application which answers Ctrl+C / Ctrl+V
+
+Needs PyQt6 and `dbus-daemon`; evdev, wl-clipboard, Klipper and a
+compositor are not required.
+
+    python benchmarks/e2e_latency.py --iterations 30 --json e2e.json
+
+Phases reported per mode (milliseconds):
+  trigger    CLI start -> TriggerTransform reaches the scheduler
+  schedule   scheduler -> Ctrl+C keystroke (debounce + queue)
+  copy       Ctrl+C keystroke -> application published the clipboard
+  transform  clipboard published -> Ctrl+V keystroke (read, transform, write),
+             or -> last typed character
+  total      CLI start -> Ctrl+V keystroke or last typed character
+
+Each mode runs once with the selection taken by Ctrl+C and once from the
+primary selection (`--sources`); with both, the report ends with the time
+the primary selection saves per transform. The primary runs only have the
+trigger and total phases, since no Ctrl+C is sent. Raise `--app-delay-ms`
+to model applications that are slow to answer Ctrl+C.
+
+Each run is repeated per output strategy (`--outputs`): `paste` writes the
+clipboard and presses Ctrl+V, `type` types the result on the virtual
+keyboard. With both, the report ends with the time typing saves.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+SRC_DIR = os.path.join(ROOT_DIR, "src")
+FAKES_DIR = os.path.join(BENCH_DIR, "fakes")
+sys.path.insert(0, SRC_DIR)
+sys.path.insert(0, FAKES_DIR)
+
+SAMPLE = "Hello wonderful World, parseHttpResponse for the quickBrown_fox"
+DEFAULT_MODES = ["upper", "lower", "title", "camel", "snake"]
+PHASES = ["trigger", "schedule", "copy", "transform", "total"]
+SOURCES = ["clipboard", "primary"]
+OUTPUTS = ["paste", "type"]
+
+
+def percentiles(samples):
+    if not samples:
+        return {"n": 0}
+    s = sorted(samples)
+
+    def rank(p):
+        return s[min(len(s) - 1, max(0, int(round(p / 100 * len(s))) - 1))]
+
+    return {
+        "n": len(s),
+        "p50": round(rank(50), 3),
+        "p95": round(rank(95), 3),
+        "p99": round(rank(99), 3),
+        "mean": round(sum(s) / len(s), 3),
+    }
+
+
+def start_private_bus():
+    proc = subprocess.Popen(
+        ["dbus-daemon", "--session", "--nofork", "--print-address=1"],
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    return proc, proc.stdout.readline().strip()
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "-C", ROOT_DIR, "describe", "--always", "--dirty"],
+            text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def trigger(mode):
+    subprocess.run(
+        [sys.executable, os.path.join(SRC_DIR, "cli.py"), "trigger", "transform", mode],
+        stdout=subprocess.DEVNULL,
+        check=True,
+    )
+
+
+class Harness:
+    def __init__(self, app_sim, args):
+        self.app_sim = app_sim
+        self.args = args
+        self.requests = []  # perf_counter() of each scheduler request
+        self._lock = threading.Lock()
+
+    def mark_request(self):
+        with self._lock:
+            self.requests.append(time.perf_counter())
+
+    def use_source(self, source):
+        from core.settings import get_settings
+        get_settings()._parser.set("transform", "use_primary", "true" if source == "primary" else "false")
+
+    def use_output(self, output):
+        from core.settings import get_settings
+        get_settings()._parser.set("transform", "output", output)
+
+    def run_sequential(self, source="clipboard"):
+        from core.clipboard import get_primary_watcher
+        from features.transforms import apply_chain
+        self.use_source(source)
+        primary = get_primary_watcher()
+
+        samples = {mode: {phase: [] for phase in PHASES} for mode in self.args.modes}
+        failures = {mode: 0 for mode in self.args.modes}
+        for _ in range(self.args.iterations):
+            for mode in self.args.modes:
+                seq = primary.sequence()
+                self.app_sim.reset(SAMPLE, apply_chain(SAMPLE, mode))
+                if source == "primary":
+                    # The user selects the text well before pressing the shortcut
+                    primary.wait_for_change(seq, self.args.timeout * 1000)
+                with self._lock:
+                    self.requests = []
+                start = time.perf_counter()
+                trigger(mode)
+                if not self.app_sim.wait_for_pastes(1, self.args.timeout):
+                    failures[mode] += 1
+                    continue
+                paste_at = self.app_sim.pastes[0][0]
+                request_at = self.requests[0]
+                phases = samples[mode]
+                phases["trigger"].append((request_at - start) * 1000)
+                phases["total"].append((paste_at - start) * 1000)
+                if source == "clipboard":
+                    copy_key_at = self._copy_keystroke_after(start)
+                    copied_at = self.app_sim.copies[0]
+                    phases["schedule"].append((copy_key_at - request_at) * 1000)
+                    phases["copy"].append((copied_at - copy_key_at) * 1000)
+                    phases["transform"].append((paste_at - copied_at) * 1000)
+                # Stay clear of the scheduler's duplicate/debounce window
+                time.sleep(self.args.gap_ms / 1000)
+        return {
+            mode: {"failures": failures[mode], **{p: percentiles(v) for p, v in phases.items()}}
+            for mode, phases in samples.items()
+        }
+
+    def run_burst(self):
+        """Fire concurrent triggers and measure how fast the service drains them."""
+        self.use_source("clipboard")
+        self.app_sim.reset(SAMPLE)
+        with self._lock:
+            self.requests = []
+        modes = [self.args.modes[i % len(self.args.modes)] for i in range(self.args.burst)]
+        threads = [threading.Thread(target=trigger, args=(m,)) for m in modes]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        # Wait until pastes stop arriving
+        last = 0
+        while True:
+            self.app_sim.wait_for_pastes(last + 1, self.args.timeout)
+            if len(self.app_sim.pastes) == last:
+                break
+            last = len(self.app_sim.pastes)
+        end = self.app_sim.pastes[-1][0] if self.app_sim.pastes else time.perf_counter()
+        elapsed = end - start
+        return {
+            "triggers": self.args.burst,
+            "requests_seen": len(self.requests),
+            "pastes": len(self.app_sim.pastes),
+            "elapsed_ms": round(elapsed * 1000, 3),
+            "triggers_per_s": round(self.args.burst / elapsed, 2) if elapsed > 0 else None,
+        }
+
+    def _copy_keystroke_after(self, start):
+        import fake_uinput
+        ctrl = fake_uinput.ECODES["KEY_LEFTCTRL"]
+        key_c = fake_uinput.ECODES["KEY_C"]
+        for device in fake_uinput.FakeUInput.instances:
+            for i, (ts, etype, code, value) in enumerate(device.events):
+                if ts >= start and code == key_c and value == 1 and etype == fake_uinput.ECODES["EV_KEY"]:
+                    if any(c == ctrl and v == 1 for _, _, c, v in device.events[max(0, i - 2):i]):
+                        return ts
+        return start
+
+
+def saved_ms(slower, faster, modes):
+    """Total p50 difference per mode between two runs, for modes both completed."""
+    return {
+        mode: round(slower[mode]["total"]["p50"] - faster[mode]["total"]["p50"], 3)
+        for mode in modes
+        if slower[mode]["total"]["n"] and faster[mode]["total"]["n"]
+    }
+
+
+def print_report(results):
+    for output, sources in results["outputs"].items():
+        for source in SOURCES:
+            if source not in sources:
+                continue
+            print(f"\nselection from {source}, {output}")
+            print(f"{'mode':<10} {'phase':<10} {'p50':>8} {'p95':>8} {'p99':>8} {'n':>4}")
+            for mode, phases in sources[source].items():
+                for phase in PHASES:
+                    r = phases[phase]
+                    if r["n"]:
+                        print(f"{mode:<10} {phase:<10} {r['p50']:8.2f} {r['p95']:8.2f} {r['p99']:8.2f} {r['n']:4}")
+                if phases["failures"]:
+                    print(f"{mode:<10} failures: {phases['failures']}")
+    for output, saved in results.get("primary_saved_ms", {}).items():
+        if saved:
+            print(f"\nsaved per transform by the primary selection ({output}, total p50, ms): " +
+                  ", ".join(f"{mode} {ms:.1f}" for mode, ms in saved.items()))
+    for source, saved in results.get("type_saved_ms", {}).items():
+        if saved:
+            print(f"saved per transform by typing instead of pasting ({source}, total p50, ms): " +
+                  ", ".join(f"{mode} {ms:.1f}" for mode, ms in saved.items()))
+    burst = results.get("burst")
+    if burst:
+        print(f"burst: {burst['triggers']} triggers -> {burst['pastes']} pastes in "
+              f"{burst['elapsed_ms']:.1f} ms ({burst['triggers_per_s']} triggers/s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Kapsulate end-to-end latency benchmark")
+    parser.add_argument("--modes", nargs="+", default=DEFAULT_MODES)
+    parser.add_argument("--sources", nargs="+", choices=SOURCES, default=SOURCES,
+                        help="Where the service takes the selection from")
+    parser.add_argument("--outputs", nargs="+", choices=OUTPUTS, default=OUTPUTS,
+                        help="How the service puts the result in place")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--burst", type=int, default=20, help="Concurrent triggers in the burst run (0 to skip)")
+    parser.add_argument("--app-delay-ms", type=float, default=5.0, help="Simulated application copy latency")
+    parser.add_argument("--gap-ms", type=float, default=300.0, help="Pause between sequential triggers")
+    parser.add_argument("--timeout", type=float, default=5.0, help="Seconds to wait for a paste")
+    parser.add_argument("--json", help="Write machine-readable results to this file")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="kapsulate-bench-")
+    bus, address = start_private_bus()
+    os.environ.update({
+        "DBUS_SESSION_BUS_ADDRESS": address,
+        "PATH": FAKES_DIR + os.pathsep + os.environ.get("PATH", ""),
+        "KAPSULATE_FAKE_CLIPBOARD_DIR": os.path.join(tmp, "clipboard"),
+        "XDG_DATA_HOME": os.path.join(tmp, "data"),
+        "XDG_CONFIG_HOME": os.path.join(tmp, "config"),
+        "QT_QPA_PLATFORM": "offscreen",
+    })
+
+    import fake_uinput
+    app_sim = fake_uinput.install(copy_delay_ms=args.app_delay_ms)
+
+    from PyQt6.QtCore import QMetaObject, Qt
+    from PyQt6.QtWidgets import QApplication
+    from core.logger import setup_logging
+    from core.listener import KapsulateService
+    import features.text_engine as text_engine
+
+    setup_logging(tmp)
+    app = QApplication([sys.argv[0]])
+    service = KapsulateService()
+    harness = Harness(app_sim, args)
+
+    original_request = text_engine.TransformScheduler.request
+
+    def timed_request(self, mode):
+        harness.mark_request()
+        return original_request(self, mode)
+
+    text_engine.TransformScheduler.request = timed_request
+
+    results = {
+        "benchmark": "e2e_latency",
+        "revision": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "config": {k: v for k, v in vars(args).items() if k != "json"},
+    }
+
+    def drive():
+        try:
+            # Let the worker open and warm up its device first
+            time.sleep(text_engine.UINPUT_WARMUP_MS / 1000 + 0.5)
+            outputs = results["outputs"] = {}
+            for output in args.outputs:
+                harness.use_output(output)
+                outputs[output] = {source: harness.run_sequential(source) for source in args.sources}
+            if len(args.sources) == len(SOURCES):
+                results["primary_saved_ms"] = {
+                    output: saved_ms(sources["clipboard"], sources["primary"], args.modes)
+                    for output, sources in outputs.items()
+                }
+            if len(args.outputs) == len(OUTPUTS):
+                results["type_saved_ms"] = {
+                    source: saved_ms(outputs["paste"][source], outputs["type"][source], args.modes)
+                    for source in args.sources
+                }
+            if args.burst:
+                harness.use_output("paste")
+                time.sleep(args.gap_ms / 1000)
+                results["burst"] = harness.run_burst()
+        finally:
+            QMetaObject.invokeMethod(app, "quit", Qt.ConnectionType.QueuedConnection)
+
+    threading.Thread(target=drive, name="bench-driver", daemon=True).start()
+    try:
+        app.exec()
+    finally:
+        service.text_engine.shutdown()
+        bus.terminate()
+        bus.wait()
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    print_report(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+In-process stand-ins for evdev's UInput and for the focused application.
+
+`install()` registers a stub `evdev` module so the service can be imported
+on machines without evdev or /dev/uinput. Every event written to the fake
+device is timestamped; Ctrl+C and Ctrl+V drive a FakeApp that copies its
+"selection" into the fake clipboard and "pastes" the clipboard back. The
+selection is also offered as the primary selection, as a real app does.
+
+Events written in bulk to the device's fd (typed text) arrive through a
+pipe and are decoded back into characters with the US keymap; the FakeApp
+counts a typed text as pasted once it matches the expected result.
+"""
+import os
+import sys
+import threading
+import time
+import types
+
+import fakeclip
+from features.keymap import INPUT_EVENT, build_keymap
+
+# Linux input-event-codes used by the service
+ECODES = {
+    "EV_SYN": 0, "EV_KEY": 1, "SYN_REPORT": 0,
+    "KEY_LEFTCTRL": 29, "KEY_LEFTSHIFT": 42, "KEY_LEFT": 105, "KEY_RIGHT": 106,
+    "KEY_MINUS": 12, "KEY_EQUAL": 13, "KEY_LEFTBRACE": 26, "KEY_RIGHTBRACE": 27,
+    "KEY_SEMICOLON": 39, "KEY_APOSTROPHE": 40, "KEY_GRAVE": 41, "KEY_BACKSLASH": 43,
+    "KEY_COMMA": 51, "KEY_DOT": 52, "KEY_SLASH": 53, "KEY_SPACE": 57,
+}
+ECODES.update({f"KEY_{d}": 2 + i for i, d in enumerate("1234567890")})
+for row, first in (("QWERTYUIOP", 16), ("ASDFGHJKL", 30), ("ZXCVBNM", 44)):
+    ECODES.update({f"KEY_{c}": first + i for i, c in enumerate(row)})
+
+# (keycode, shift) -> character, for decoding typed text
+TYPED_CHARS = {
+    key: char for char, key in build_keymap(types.SimpleNamespace(**ECODES), ("us", "")).items()
+}
+
+
+class FakeApp:
+    """The application holding the selection that is being transformed."""
+
+    def __init__(self, copy_delay_ms=5.0):
+        self.copy_delay_ms = copy_delay_ms
+        self.selection = ""
+        self.expected = None  # typed text that completes a "paste"
+        self.typed = ""
+        self.copies = []  # perf_counter() of each published copy
+        self.pastes = []  # (perf_counter(), pasted or typed text)
+        self._cond = threading.Condition()
+
+    def reset(self, selection, expected=None):
+        with self._cond:
+            self.selection = selection
+            self.expected = expected
+            self.typed = ""
+            self.copies = []
+            self.pastes = []
+        # Selecting text offers it as the primary selection
+        fakeclip.publish_text(selection, "primary")
+
+    def on_copy(self):
+        def publish():
+            fakeclip.publish_text(self.selection)
+            with self._cond:
+                self.copies.append(time.perf_counter())
+        threading.Timer(self.copy_delay_ms / 1000, publish).start()
+
+    def on_paste(self):
+        now = time.perf_counter()
+        data = fakeclip.read() or b""
+        text = data.decode("utf-8", errors="replace")
+        with self._cond:
+            self.selection = text
+            self.pastes.append((now, text))
+            self._cond.notify_all()
+
+    def on_type(self, char):
+        now = time.perf_counter()
+        with self._cond:
+            self.typed += char
+            if self.typed == self.expected:
+                self.selection = self.typed
+                self.pastes.append((now, self.typed))
+                self._cond.notify_all()
+
+    def wait_for_pastes(self, count, timeout):
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while len(self.pastes) < count:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+
+class FakeUInput:
+    """Records written events with timestamps and forwards shortcuts to the FakeApp."""
+    app = None
+    instances = []
+
+    def __init__(self, events=None, name="py-evdev-uinput", **kwargs):
+        self.name = name
+        self.events = []  # (perf_counter(), type, code, value)
+        self._held = set()
+        self._lock = threading.Lock()
+        read_fd, self.fd = os.pipe()
+        threading.Thread(target=self._read_events, args=(read_fd,), daemon=True).start()
+        FakeUInput.instances.append(self)
+
+    def _read_events(self, read_fd):
+        size = INPUT_EVENT.size
+        pending = b""
+        with os.fdopen(read_fd, "rb", buffering=0) as pipe:
+            while True:
+                data = pipe.read(64 * size)
+                if not data:
+                    break
+                pending += data
+                whole = len(pending) - len(pending) % size
+                for _sec, _usec, etype, code, value in INPUT_EVENT.iter_unpack(pending[:whole]):
+                    self.write(etype, code, value)
+                pending = pending[whole:]
+
+    def write(self, etype, code, value):
+        with self._lock:
+            self.events.append((time.perf_counter(), etype, code, value))
+            if etype != ECODES["EV_KEY"]:
+                return
+            if value:
+                self._held.add(code)
+            else:
+                self._held.discard(code)
+            held = set(self._held)
+        if value != 1 or self.app is None:
+            return
+        if ECODES["KEY_LEFTCTRL"] in held:
+            if code == ECODES["KEY_C"]:
+                self.app.on_copy()
+            elif code == ECODES["KEY_V"]:
+                self.app.on_paste()
+        else:
+            char = TYPED_CHARS.get((code, ECODES["KEY_LEFTSHIFT"] in held))
+            if char is not None:
+                self.app.on_type(char)
+
+    def syn(self):
+        self.write(ECODES["EV_SYN"], ECODES["SYN_REPORT"], 0)
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def install(copy_delay_ms=5.0):
+    """Register the stub evdev module and return the FakeApp it drives."""
+    app = FakeApp(copy_delay_ms)
+    FakeUInput.app = app
+    module = types.ModuleType("evdev")
+    module.UInput = FakeUInput
+    module.ecodes = types.SimpleNamespace(**ECODES)
+    sys.modules["evdev"] = module
+    return app
@@ -0,0 +1,139 @@
+"""
+File-backed stand-in for the Wayland clipboard, used by the fake wl-paste /
+wl-copy executables and by in-process benchmark harnesses.
+
+Each selection ("clipboard" or "primary") is a symlink in
+$KAPSULATE_FAKE_CLIPBOARD_DIR pointing at a generation directory that holds
+one file per offered MIME type. Publishing a new offer swaps the symlink
+atomically, which is what the fake `wl-paste --watch` polls for.
+"""
+import os
+import subprocess
+import sys
+import time
+import urllib.parse
+
+TEXT_TYPE = "text/plain;charset=utf-8"
+TEXT_ALIASES = ["text/plain", "UTF8_STRING", "TEXT", "STRING"]
+WATCH_POLL_S = 0.001
+
+
+def state_dir():
+    path = os.environ["KAPSULATE_FAKE_CLIPBOARD_DIR"]
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _link(selection):
+    return os.path.join(state_dir(), selection)
+
+
+def publish(offers, selection="clipboard"):
+    """Replace the selection with `offers` ({mime_type: bytes})."""
+    gen = os.path.join(state_dir(), f"gen-{selection}-{time.monotonic_ns()}-{os.getpid()}")
+    os.mkdir(gen)
+    for mime_type, data in offers.items():
+        with open(os.path.join(gen, urllib.parse.quote(mime_type, safe="")), "wb") as f:
+            f.write(data)
+    tmp = gen + ".lnk"
+    os.symlink(gen, tmp)
+    os.replace(tmp, _link(selection))
+
+
+def publish_text(text, selection="clipboard"):
+    publish({TEXT_TYPE: text.encode("utf-8")}, selection)
+
+
+def current(selection="clipboard"):
+    try:
+        return os.readlink(_link(selection))
+    except FileNotFoundError:
+        return None
+
+
+def list_types(selection="clipboard"):
+    gen = current(selection)
+    if gen is None:
+        return []
+    types = [urllib.parse.unquote(name) for name in sorted(os.listdir(gen))]
+    if TEXT_TYPE in types:
+        types += [t for t in TEXT_ALIASES if t not in types]
+    return types
+
+
+def read(mime_type=None, selection="clipboard"):
+    gen = current(selection)
+    if gen is None:
+        return None
+    stored = [urllib.parse.unquote(name) for name in sorted(os.listdir(gen))]
+    if mime_type in (None, "text") or mime_type in TEXT_ALIASES:
+        texts = [t for t in stored if t.startswith("text/plain")]
+        if texts:
+            mime_type = texts[0]
+        elif mime_type is None and stored:
+            mime_type = stored[0]
+    if mime_type not in stored:
+        return None
+    with open(os.path.join(gen, urllib.parse.quote(mime_type, safe="")), "rb") as f:
+        return f.read()
+
+
+def _parse(argv, flags_with_value):
+    opts = {}
+    rest = []
+    i = 0
+    while i < len(argv):
+        arg = argv[i]
+        if arg in flags_with_value:
+            opts[flags_with_value[arg]] = argv[i + 1]
+            i += 2
+        elif arg.startswith("-") and not rest:
+            opts[arg] = True
+            i += 1
+        else:
+            rest = argv[i:]
+            break
+    return opts, rest
+
+
+def wl_paste(argv=None):
+    opts, rest = _parse(sys.argv[1:] if argv is None else argv, {"-t": "type", "--type": "type"})
+    selection = "primary" if ("-p" in opts or "--primary" in opts) else "clipboard"
+
+    if "-l" in opts or "--list-types" in opts:
+        for t in list_types(selection):
+            print(t)
+        return 0
+
+    if "-w" in opts or "--watch" in opts:
+        seen = None
+        while True:
+            gen = current(selection)
+            if gen != seen:
+                seen = gen
+                data = read(opts.get("type"), selection)
+                env = dict(os.environ, CLIPBOARD_STATE="data" if data is not None else "nil")
+                subprocess.run(rest, input=data or b"", env=env)
+            time.sleep(WATCH_POLL_S)
+
+    data = read(opts.get("type"), selection)
+    if data is None:
+        sys.stderr.write("No selection\n")
+        return 1
+    sys.stdout.buffer.write(data)
+    return 0
+
+
+def wl_copy(argv=None):
+    opts, rest = _parse(sys.argv[1:] if argv is None else argv, {"-t": "type", "--type": "type"})
+    selection = "primary" if ("-p" in opts or "--primary" in opts) else "clipboard"
+    data = " ".join(rest).encode("utf-8") if rest else sys.stdin.buffer.read()
+    mime_type = opts.get("type")
+    if mime_type is None:
+        try:
+            data.decode("utf-8")
+            mime_type = TEXT_TYPE
+        except UnicodeDecodeError:
+            mime_type = "application/octet-stream"
+    publish({mime_type: data}, selection)
+    return 0
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Idle wakeup check for the Kapsulate service.
+
+Starts the full application (`src/main.py`, tray included) headless on a
+private session bus with the fake clipboard and UInput stand-ins, lets it
+settle, then counts context switches of every service thread over a quiet
+window. An idle service that does no periodic work should stay close to
+zero; a polling timer shows up as a steady rate.
+
+Needs PyQt6 and `dbus-daemon`; Linux only (reads /proc).
+
+    python benchmarks/idle_wakeups.py --window 30 --max-per-minute 10
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from e2e_latency import FAKES_DIR, SRC_DIR, git_revision, start_private_bus
+
+# Runs the real main.py with the fake evdev module registered first
+BOOTSTRAP = f"""
+import runpy, sys
+sys.path.insert(0, {FAKES_DIR!r})
+sys.path.insert(0, {SRC_DIR!r})
+import fake_uinput
+fake_uinput.install()
+sys.argv = [{os.path.join(SRC_DIR, "main.py")!r}]
+runpy.run_path(sys.argv[0], run_name="__main__")
+"""
+
+
+def context_switches(pid):
+    """Return {thread name: voluntary + involuntary switches} for every thread of `pid`."""
+    counts = {}
+    for status in glob.glob(f"/proc/{pid}/task/*/status"):
+        fields = {}
+        try:
+            with open(status) as f:
+                for line in f:
+                    key, _, value = line.partition(":")
+                    fields[key] = value.strip()
+        except FileNotFoundError:
+            continue  # thread exited
+        tid = status.split("/")[4]
+        name = f"{fields.get('Name', '?')}[{tid}]"
+        counts[name] = int(fields["voluntary_ctxt_switches"]) + int(fields["nonvoluntary_ctxt_switches"])
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Kapsulate idle wakeup check")
+    parser.add_argument("--settle", type=float, default=5.0, help="Seconds to wait after start")
+    parser.add_argument("--window", type=float, default=30.0, help="Seconds to measure")
+    parser.add_argument("--max-per-minute", type=float, help="Exit non-zero above this many wakeups per minute")
+    parser.add_argument("--json", help="Write machine-readable results to this file")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="kapsulate-bench-")
+    bus, address = start_private_bus()
+    env = dict(os.environ)
+    env.update({
+        "DBUS_SESSION_BUS_ADDRESS": address,
+        "PATH": FAKES_DIR + os.pathsep + os.environ.get("PATH", ""),
+        "KAPSULATE_FAKE_CLIPBOARD_DIR": os.path.join(tmp, "clipboard"),
+        "XDG_DATA_HOME": os.path.join(tmp, "data"),
+        "XDG_CONFIG_HOME": os.path.join(tmp, "config"),
+        "QT_QPA_PLATFORM": "offscreen",
+    })
+    service = subprocess.Popen([sys.executable, "-c", BOOTSTRAP], env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        time.sleep(args.settle)
+        if service.poll() is not None:
+            sys.exit(f"Service exited during startup with status {service.returncode}")
+        before = context_switches(service.pid)
+        time.sleep(args.window)
+        after = context_switches(service.pid)
+    finally:
+        service.terminate()
+        try:
+            service.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            service.kill()
+        bus.terminate()
+        bus.wait()
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    threads = {name: after[name] - before.get(name, 0) for name in after}
+    total = sum(threads.values())
+    per_minute = total * 60 / args.window
+    results = {
+        "benchmark": "idle_wakeups",
+        "revision": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "config": {"settle": args.settle, "window": args.window},
+        "wakeups": total,
+        "wakeups_per_minute": round(per_minute, 2),
+        "threads": threads,
+    }
+
+    for name, count in sorted(threads.items(), key=lambda kv: -kv[1]):
+        print(f"{name:<32} {count:6}")
+    print(f"total: {total} wakeups in {args.window:.0f} s ({per_minute:.1f}/min)")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.max_per_minute is not None and per_minute > args.max_per_minute:
+        sys.exit(f"Idle wakeups above the limit of {args.max_per_minute}/min")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Launcher soak test.
+
+Fires thousands of launches of a short-lived command through
+core/launcher.py, interleaved with launches of a longer-running command
+under a single-instance key, and checks that the process table and the
+file descriptor table are back where they started: no zombies, no
+leftover children, no leaked pidfds, and at most one keyed instance
+running at a time. For comparison the previous fire-and-forget
+`subprocess.Popen` is run too, which leaves one zombie per launch until
+the process exits.
+
+Also times executable lookup through the launcher's cache vs. a plain
+`shutil.which()`.
+
+Needs PyQt6; Linux only (reads /proc). Exits non-zero if the tables
+do not come back flat.
+
+    python benchmarks/soak_launcher.py --launches 5000
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from PyQt6.QtCore import QCoreApplication
+
+from core.launcher import ExecutableCache, get_launcher
+
+# Keyed program; long enough that most keyed launches find it running
+KEYED_CMD = ["sleep", "0.5"]
+KEY = "soak"
+# A keyed launch is attempted every this many plain launches
+KEYED_EVERY = 50
+# Give up waiting for the children to exit after this long
+SETTLE_TIMEOUT_S = 30
+
+
+def children():
+    """Return (children, zombies) of this process, read from /proc."""
+    me = str(os.getpid())
+    count = zombies = 0
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # The command name is in parentheses and may contain spaces
+        fields = stat[stat.rindex(")") + 2:].split()
+        if fields[1] == me:
+            count += 1
+            zombies += fields[0] == "Z"
+    return count, zombies
+
+
+def open_fds():
+    return len(os.listdir("/proc/self/fd"))
+
+
+def settle(app, launcher, done=lambda: True):
+    deadline = time.monotonic() + SETTLE_TIMEOUT_S
+    while launcher.child_count() or not done():
+        if time.monotonic() > deadline:
+            break
+        app.processEvents()
+        time.sleep(0.01)
+
+
+def warm_up(app):
+    """Launch and re-activate the keyed program once.
+
+    The activation opens the session bus connection; it stays open and
+    must not be counted as a leaked descriptor.
+    """
+    launcher = get_launcher()
+    launcher.launch(KEYED_CMD, key=KEY)
+    while launcher.running(KEY) is None:
+        app.processEvents()
+        time.sleep(0.01)
+    launcher.launch(KEYED_CMD, key=KEY)
+    settle(app, launcher)
+    # Let the activation finish in the pool
+    time.sleep(0.5)
+    app.processEvents()
+
+
+def soak_launcher(app, launches):
+    launcher = get_launcher()
+    started = {"plain": 0, "keyed": 0, "failed": 0}
+    max_keyed = 0
+
+    def on_started(kind):
+        def done(result):
+            started[kind if result.ok else "failed"] += 1
+        return done
+
+    start = time.perf_counter()
+    for i in range(launches):
+        launcher.launch(["true"], on_finished=on_started("plain"))
+        if i % KEYED_EVERY == 0:
+            launcher.launch(KEYED_CMD, key=KEY, on_finished=on_started("keyed"))
+        app.processEvents()
+        max_keyed = max(max_keyed, sum(1 for c in launcher._children.values() if c.key == KEY))
+    elapsed = time.perf_counter() - start
+
+    settle(app, launcher, lambda: started["plain"] + started["failed"] >= launches)
+    return elapsed, started, max_keyed
+
+
+def soak_legacy(launches):
+    start = time.perf_counter()
+    procs = [subprocess.Popen(["true"], stdin=subprocess.DEVNULL) for _ in range(launches)]
+    elapsed = time.perf_counter() - start
+    time.sleep(0.5)
+    after = children()
+    for proc in procs:
+        proc.wait()
+    return elapsed, after
+
+
+def bench_which(iterations):
+    names = ["plasma-systemmonitor", "ksysguard", "gnome-system-monitor", "htop"]
+    cache = ExecutableCache()
+    timings = {}
+    for label, which in (("shutil.which", shutil.which), ("cached", cache.which)):
+        start = time.perf_counter_ns()
+        for _ in range(iterations):
+            for name in names:
+                which(name)
+        timings[label] = (time.perf_counter_ns() - start) / iterations / 1000
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Launcher soak test")
+    parser.add_argument("--launches", type=int, default=5000)
+    parser.add_argument("--which-iterations", type=int, default=2000)
+    parser.add_argument("--skip-legacy", action="store_true", help="Do not run the Popen comparison")
+    args = parser.parse_args()
+
+    app = QCoreApplication(sys.argv)
+
+    if not args.skip_legacy:
+        elapsed, (count, zombies) = soak_legacy(args.launches)
+        print(f"legacy:   {args.launches} launches in {elapsed:.1f} s, "
+              f"{count} children ({zombies} zombies) left before exit")
+
+    warm_up(app)
+    before_children, before_fds = children(), open_fds()
+    elapsed, started, max_keyed = soak_launcher(app, args.launches)
+    after_children, after_fds = children(), open_fds()
+    print(f"launcher: {args.launches} launches in {elapsed:.1f} s, "
+          f"{started['keyed']} keyed starts, {started['failed']} failures, "
+          f"at most {max_keyed} keyed instance(s) at once")
+    print(f"          children {before_children[0]} -> {after_children[0]} "
+          f"(zombies {before_children[1]} -> {after_children[1]}), "
+          f"open fds {before_fds} -> {after_fds}")
+
+    timings = bench_which(args.which_iterations)
+    print("which() for the four task managers: "
+          + ", ".join(f"{label} {us:.1f} us" for label, us in timings.items()))
+
+    flat = (after_children == before_children and after_fds <= before_fds
+            and max_keyed <= 1 and started["failed"] == 0)
+    if not flat:
+        print("FAIL: launcher left processes or descriptors behind")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Startup profile for the Kapsulate service.
+
+Launches the full application (`src/main.py`) headless on a private
+session bus with the fake clipboard and UInput stand-ins and records,
+from process spawn:
+
+  dbus_ready    org.kapsulate.service has an owner (triggers are accepted)
+  tray_visible  the tray is shown and the event loop is about to start
+  duplicate     a second launch detects the running instance and exits
+
+One extra run under `python -X importtime` lists the slowest imports.
+
+Needs PyQt6 and `dbus-daemon`, like e2e_latency.py.
+
+    python benchmarks/startup_profile.py --iterations 10 --json startup.json
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from e2e_latency import SRC_DIR, FAKES_DIR, git_revision, percentiles, start_private_bus
+from idle_wakeups import BOOTSTRAP
+from core.dbus_client import SessionBusClient
+
+TRAY_LOG_LINE = "Starting event loop..."
+TOP_IMPORTS = 15
+
+
+def service_env(tmp, address):
+    env = dict(os.environ)
+    env.update({
+        "DBUS_SESSION_BUS_ADDRESS": address,
+        "PATH": FAKES_DIR + os.pathsep + os.environ.get("PATH", ""),
+        "KAPSULATE_FAKE_CLIPBOARD_DIR": os.path.join(tmp, "clipboard"),
+        "XDG_DATA_HOME": os.path.join(tmp, "data"),
+        "XDG_CONFIG_HOME": os.path.join(tmp, "config"),
+        "QT_QPA_PLATFORM": "offscreen",
+        "PYTHONUNBUFFERED": "1",
+    })
+    return env
+
+
+def has_owner(bus):
+    return bus.call("org.freedesktop.DBus", "/org/freedesktop/DBus", "org.freedesktop.DBus",
+                    "NameHasOwner", "org.kapsulate.service")[0]
+
+
+def stop(proc):
+    proc.terminate()
+    try:
+        proc.wait(timeout=5)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+
+
+def profile_once(env, address, timeout):
+    """Start the service once and return the phase timings in milliseconds."""
+    tray_at = []
+
+    def watch_log(proc):
+        for line in proc.stdout:
+            if TRAY_LOG_LINE in line and not tray_at:
+                tray_at.append(time.perf_counter())
+
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-c", BOOTSTRAP], env=env,
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    reader = threading.Thread(target=watch_log, args=(proc,), daemon=True)
+    reader.start()
+    try:
+        with SessionBusClient(address) as bus:
+            deadline = start + timeout
+            while not has_owner(bus):
+                if time.perf_counter() > deadline or proc.poll() is not None:
+                    raise RuntimeError("Service did not register on the bus")
+                time.sleep(0.001)
+            dbus_ready = time.perf_counter()
+        while not tray_at:
+            if time.perf_counter() > start + timeout or proc.poll() is not None:
+                raise RuntimeError("Service did not show the tray")
+            time.sleep(0.001)
+
+        dup_start = time.perf_counter()
+        subprocess.run([sys.executable, os.path.join(SRC_DIR, "main.py")], env=env,
+                       stdout=subprocess.DEVNULL, check=True, timeout=timeout)
+        duplicate = time.perf_counter() - dup_start
+    finally:
+        stop(proc)
+        reader.join(timeout=5)
+
+    return {
+        "dbus_ready": (dbus_ready - start) * 1000,
+        "tray_visible": (tray_at[0] - start) * 1000,
+        "duplicate": duplicate * 1000,
+    }
+
+
+def slowest_imports(env):
+    """Return the slowest imports (cumulative microseconds) of one startup."""
+    proc = subprocess.Popen([sys.executable, "-X", "importtime", "-c", BOOTSTRAP], env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    lines = []
+
+    def collect():
+        for line in proc.stderr:
+            lines.append(line)
+
+    reader = threading.Thread(target=collect, daemon=True)
+    reader.start()
+    time.sleep(5)
+    stop(proc)
+    reader.join(timeout=5)
+
+    imports = []
+    for line in lines:
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, _, rest = line.partition(":")
+        _, cumulative, name = rest.split("|", 2)
+        imports.append((name.strip(), int(cumulative)))
+    imports.sort(key=lambda item: -item[1])
+    return imports[:TOP_IMPORTS]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Kapsulate startup profile")
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--timeout", type=float, default=20.0, help="Seconds to wait for each phase")
+    parser.add_argument("--no-imports", action="store_true", help="Skip the -X importtime run")
+    parser.add_argument("--json", help="Write machine-readable results to this file")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="kapsulate-bench-")
+    bus, address = start_private_bus()
+    env = service_env(tmp, address)
+    samples = {"dbus_ready": [], "tray_visible": [], "duplicate": []}
+    try:
+        for _ in range(args.iterations):
+            for phase, ms in profile_once(env, address, args.timeout).items():
+                samples[phase].append(ms)
+        imports = [] if args.no_imports else slowest_imports(env)
+    finally:
+        bus.terminate()
+        bus.wait()
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    results = {
+        "benchmark": "startup_profile",
+        "revision": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "config": {"iterations": args.iterations},
+        "phases": {phase: percentiles(v) for phase, v in samples.items()},
+        "slowest_imports_us": dict(imports),
+    }
+
+    print(f"{'phase':<14} {'p50':>8} {'p95':>8} {'mean':>8} {'n':>4}  (ms from spawn)")
+    for phase, r in results["phases"].items():
+        print(f"{phase:<14} {r['p50']:8.2f} {r['p95']:8.2f} {r['mean']:8.2f} {r['n']:4}")
+    if imports:
+        print("\nslowest imports (cumulative ms):")
+        for name, us in imports:
+            print(f"  {us / 1000:8.1f}  {name}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -18,8 +18,8 @@ echo "Preparing release ${VERSION}..."
 # Update version in control file
 sed -i "s/^Version: .*/Version: ${VERSION}/" packaging/DEBIAN/control
 
-# Update version in main.py
-sed -i "s/^APP_VERSION = \".*\"/APP_VERSION = \"${VERSION}\"/" src/main.py
+# Update version in app.py
+sed -i "s/^APP_VERSION = \".*\"/APP_VERSION = \"${VERSION}\"/" src/app.py
 
 # Update CHANGELOG.md (you'll need to edit this manually)
 echo ""
@@ -0,0 +1,251 @@
+import sys
+import os
+from PyQt6.QtWidgets import QApplication, QSystemTrayIcon, QMenu, QMessageBox
+from PyQt6.QtGui import QIcon, QAction, QDesktopServices
+from PyQt6.QtCore import QUrl, Qt
+from core.listener import KapsulateService, KapsulateServiceError
+from core.logger import setup_logging, get_logger
+from core.keyd_manager import get_keyd_manager
+from core.unix_signals import UnixSignalNotifier
+from ui.theme import ThemeWatcher
+
+# Application metadata
+APP_VERSION = "1.0.1"
+APP_AUTHOR = "Darko Kuzmanovic"
+APP_WEBSITE = "https://github.com/DarkoKuzmanovic/Kapsulate"
+
+# Base directory (parent of src/)
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class KapsulateApp:
+    def __init__(self):
+        # Initialize logging
+        self.logger = setup_logging(BASE_DIR)
+        self.logger.info("Initializing KapsulateApp...")
+
+        self.app = QApplication(sys.argv)
+        self.app.setApplicationName("Kapsulate")
+        self.app.setQuitOnLastWindowClosed(False)
+
+        # Quit cleanly on Ctrl+C / SIGTERM without waking up periodically
+        self.unix_signals = UnixSignalNotifier()
+        self.unix_signals.received.connect(self.app.quit)
+
+        # Register on the bus first so triggers work as early as possible
+        service_error = None
+        try:
+            self.service = KapsulateService()
+        except KapsulateServiceError as e:
+            self.logger.error("DBus Service failed: %s", e)
+            service_error = str(e)
+
+        # Load both icon variants once; theme changes only swap them
+        self._icons = {is_dark: self._load_icon(is_dark) for is_dark in (True, False)}
+
+        # Setup Tray Icon
+        self.tray_icon = QSystemTrayIcon(self.app)
+        self.tray_icon.setToolTip("Kapsulate Running")
+
+        # Listen for theme changes via DBus
+        self._setup_theme_listener()
+        if service_error:
+            self._show_error("Kapsulate Error", service_error)
+
+        # Validate kapsulate.conf and have keyd reload it whenever it is saved
+        self.keyd = get_keyd_manager()
+        self.keyd.reloaded.connect(self._on_keyd_reloaded)
+        self.keyd.failed.connect(lambda message: self._show_error("keyd config", message))
+        self.keyd.start()
+
+        # Context Menu
+        self.menu = QMenu()
+
+        # Open Config Action
+        self.open_config_action = QAction("Open Config", self.menu)
+        self.open_config_action.triggered.connect(self._open_config)
+        self.menu.addAction(self.open_config_action)
+
+        # Reload Config Action
+        self.reload_action = QAction("Reload Config", self.menu)
+        self.reload_action.triggered.connect(self._reload_config)
+        self.menu.addAction(self.reload_action)
+
+        self.menu.addSeparator()
+
+        # About Action
+        self.about_action = QAction("About Kapsulate", self.menu)
+        self.about_action.triggered.connect(self._show_about)
+        self.menu.addAction(self.about_action)
+
+        # Autostart Action (only if installed via DEB), probed when the menu first opens
+        self.autostart_action = None
+        self._autostart_anchor = self.menu.addSeparator()
+        self.menu.aboutToShow.connect(self._update_autostart_action)
+
+        # Quit Action
+        self.quit_action = QAction("Quit", self.menu)
+        self.quit_action.triggered.connect(self.app.quit)
+        self.menu.addAction(self.quit_action)
+
+        self.tray_icon.setContextMenu(self.menu)
+        self.tray_icon.show()
+
+        # Startup Notification
+        self.tray_icon.showMessage(
+            "Kapsulate",
+            "Service Started Successfully",
+            QSystemTrayIcon.MessageIcon.Information,
+            3000
+        )
+
+    def _open_config(self):
+        # Resolved once at startup by the keyd manager
+        config_path = self.keyd.path
+        if config_path and os.path.exists(config_path):
+            self.logger.info("Opening config: %s", config_path)
+            QDesktopServices.openUrl(QUrl.fromLocalFile(config_path))
+        else:
+            self.logger.error("Config file not found: %s", config_path)
+            self._show_error("Error", "Config file not found!")
+
+    def _reload_config(self):
+        """Validate the keyd configuration and have keyd reload it."""
+        self.logger.info("Reloading keyd configuration...")
+        self.keyd.reload()
+
+    def _on_keyd_reloaded(self, message):
+        self.tray_icon.showMessage(
+            "Kapsulate",
+            message,
+            QSystemTrayIcon.MessageIcon.Information,
+            2000
+        )
+
+    def _icon_path(self, is_dark):
+        """Return the icon path for a theme variant."""
+        icon_variant = "hicolor-dark" if is_dark else "hicolor-light"
+
+        # Try system icon paths first (installed package)
+        system_icon_path = f"/usr/share/icons/{icon_variant}/scalable/apps/kapsulate.svg"
+        if os.path.exists(system_icon_path):
+            return system_icon_path
+        # Fall back to local assets (development mode)
+        return os.path.join(BASE_DIR, "assets", icon_variant, "scalable", "apps", "kapsulate.svg")
+
+    def _load_icon(self, is_dark):
+        path = self._icon_path(is_dark)
+        if os.path.exists(path):
+            return QIcon(path)
+        self.logger.warning("Icon not found at %s, using fallback", path)
+        return self.app.style().standardIcon(self.app.style().StandardPixmap.SP_ComputerIcon)
+
+    def _apply_icon_to_tray(self, is_dark):
+        """Apply the cached icon for the current theme to the tray."""
+        self.tray_icon.setIcon(self._icons[is_dark])
+
+    def _setup_theme_listener(self):
+        """Follow theme changes through the portal's SettingChanged signal."""
+        # Default to dark theme (most common for KDE) until the portal answers
+        self.theme = ThemeWatcher(default_dark=True)
+        self._apply_icon_to_tray(self.theme.is_dark)
+        self.theme.changed.connect(self._on_theme_changed)
+        self.theme.start()
+
+    def _on_theme_changed(self, is_dark):
+        self.logger.info("Theme changed to: %s", "dark" if is_dark else "light")
+        self._apply_icon_to_tray(is_dark)
+
+    def _show_error(self, title, message):
+        """Show error notification via tray icon."""
+        self.logger.error("%s: %s", title, message)
+        if hasattr(self, 'tray_icon') and self.tray_icon:
+            self.tray_icon.showMessage(
+                title,
+                message,
+                QSystemTrayIcon.MessageIcon.Warning,
+                5000
+            )
+
+    def _show_about(self):
+        """Show the About dialog."""
+        about_text = f"""<h2>Kapsulate</h2>
+<p><b>Version:</b> {APP_VERSION}</p>
+<p><b>Author:</b> {APP_AUTHOR}</p>
+<p>A keyboard-driven productivity utility for KDE Plasma.</p>
+<p><a href="{APP_WEBSITE}">GitHub Repository</a></p>
+<hr>
+<p><small>Built with PyQt6 and keyd</small></p>"""
+
+        about_box = QMessageBox()
+        about_box.setWindowTitle("About Kapsulate")
+        about_box.setTextFormat(Qt.TextFormat.RichText)
+        about_box.setText(about_text)
+        about_box.setIcon(QMessageBox.Icon.Information)
+        about_box.exec()
+
+    def _update_autostart_action(self):
+        """Create the autostart toggle on first use and sync it with the filesystem."""
+        if self.autostart_action is None:
+            if not self._is_autostart_available():
+                self.logger.debug("Autostart not available (not installed via DEB)")
+                self.menu.aboutToShow.disconnect(self._update_autostart_action)
+                return
+            self.autostart_action = QAction("Start with system", self.menu)
+            self.autostart_action.setCheckable(True)
+            self.autostart_action.triggered.connect(self._toggle_autostart)
+            self.menu.insertAction(self._autostart_anchor, self.autostart_action)
+            self.logger.debug("Autostart option available")
+        self.autostart_action.setChecked(self._is_autostart_enabled())
+
+    def _is_autostart_available(self):
+        """Check if autostart is available (DEB installed)."""
+        system_desktop = "/usr/share/applications/kapsulate.desktop"
+        return os.path.exists(system_desktop)
+
+    def _is_autostart_enabled(self):
+        """Check if autostart is enabled for current user."""
+        autostart_path = os.path.expanduser("~/.config/autostart/kapsulate.desktop")
+        return os.path.exists(autostart_path)
+
+    def _toggle_autostart(self, enabled):
+        """Enable or disable autostart for current user."""
+        autostart_dir = os.path.expanduser("~/.config/autostart")
+        autostart_path = os.path.join(autostart_dir, "kapsulate.desktop")
+        system_desktop = "/usr/share/applications/kapsulate.desktop"
+
+        if enabled:
+            os.makedirs(autostart_dir, exist_ok=True)
+            try:
+                os.symlink(system_desktop, autostart_path)
+                self.logger.info("Autostart enabled")
+                self.tray_icon.showMessage(
+                    "Kapsulate",
+                    "Autostart enabled",
+                    QSystemTrayIcon.MessageIcon.Information,
+                    2000
+                )
+            except OSError as e:
+                self.logger.error("Failed to enable autostart: %s", e)
+                self._show_error("Error", f"Failed to enable autostart: {e}")
+                # Revert the checkbox state
+                self.autostart_action.setChecked(False)
+        else:
+            if os.path.exists(autostart_path):
+                try:
+                    os.remove(autostart_path)
+                    self.logger.info("Autostart disabled")
+                    self.tray_icon.showMessage(
+                        "Kapsulate",
+                        "Autostart disabled",
+                        QSystemTrayIcon.MessageIcon.Information,
+                        2000
+                    )
+                except OSError as e:
+                    self.logger.error("Failed to disable autostart: %s", e)
+                    self._show_error("Error", f"Failed to disable autostart: {e}")
+                    # Revert the checkbox state
+                    self.autostart_action.setChecked(True)
+
+    def run(self):
+        self.logger.info("Starting event loop...")
+        sys.exit(self.app.exec())
@@ -1,7 +1,23 @@
 import sys
 import argparse
-from PyQt6.QtCore import QCoreApplication
-from PyQt6.QtDBus import QDBusConnection, QDBusMessage, QDBusInterface
+from core.dbus_client import DBusError, SessionBusClient
+from features.transforms import CHAIN_SEPARATOR, UnknownModeError, available_modes, parse_chain
+
+SERVICE_NAME = "org.kapsulate.service"
+SERVICE_PATH = "/org/kapsulate/Service"
+SERVICE_INTERFACE = "local.py.main.KapsulateService"
+
+def call_service(method, *args):
+    """Call a KapsulateService method over the session bus and return its reply values.
+
+    Uses the stdlib bus client so a shortcut press does not boot Qt.
+    """
+    try:
+        with SessionBusClient() as bus:
+            return bus.call(SERVICE_NAME, SERVICE_PATH, SERVICE_INTERFACE, method, *args)
+    except DBusError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
 
 def trigger_action(action_name, extra_args=None):
     # Map friendly names to DBus methods
@@ -10,47 +26,160 @@ def trigger_action(action_name, extra_args=None):
         "color-picker": "TriggerColorPicker",
         "password": "TriggerPassword",
         "expand": "TriggerExpand",
-        "transform": "TriggerTransform"
+        "transform": "TriggerTransform",
+        "undo": "UndoTransform",
+        "cycle": "CycleTransform",
+        "cancel": "CancelTransform"
     }
 
     if action_name not in methods:
         print(f"Unknown action: {action_name}")
         sys.exit(1)
 
-    method = methods[action_name]
-    interface_name = "local.py.main.KapsulateService"
-    
-    msg = QDBusMessage.createMethodCall(
-        "org.kapsulate.service",
-        "/org/kapsulate/Service",
-        interface_name,
-        method
-    )
-    
-    if action_name == "transform" and extra_args:
-        # Pass the mode (upper, lower, etc)
-        msg.setArguments([extra_args[0]])
-
-    reply = QDBusConnection.sessionBus().call(msg)
-    if reply.type() == QDBusMessage.MessageType.ErrorMessage:
-        print(f"Error: {reply.errorMessage()}")
+    chain = None
+    if action_name == "transform":
+        try:
+            chain = CHAIN_SEPARATOR.join(parse_chain(CHAIN_SEPARATOR.join(extra_args or [])))
+        except UnknownModeError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+
+    # Pass the mode (upper, lower, etc); several modes form a chain
+    # applied in a single copy/paste round-trip
+    call_service(methods[action_name], *([chain] if chain else []))
+    print(f"Triggered {action_name}")
+
+def show_stats(raw=False):
+    payload = call_service("GetStats")[0]
+    if raw:
+        print(payload)
+        return
+
+    import json
+    stats = json.loads(payload)
+    queue = stats["queue"]
+    print(f"Uptime: {stats['uptime_s']:.0f} s")
+    print(f"Queue: depth {queue['queue_depth']}, {queue['jobs_done']} jobs, "
+          f"wait avg {queue['avg_wait_ms']:.1f} ms / max {queue['max_wait_ms']:.1f} ms")
+    cache = queue.get("cache")
+    if cache:
+        print(f"Transform cache: {cache['selections']} selections, {cache['bytes'] / 1024:.0f} KB, "
+              f"{cache['hits']} hits / {cache['misses']} misses")
+    if not stats["spans"]:
+        print("No timings recorded yet")
+        return
+    print(f"{'span':<28} {'count':>6} {'errors':>6} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}")
+    for name, h in stats["spans"].items():
+        cols = "".join(f" {h[k]:9.2f}" if k in h else f" {'-':>9}" for k in ("p50", "p95", "p99", "max"))
+        print(f"{name:<28} {h['count']:6} {h['errors']:6}{cols}")
+    if stats.get("apps"):
+        print()
+        print(f"{'application':<28} {'copies':>6} {'misses':>6} {'mean':>9} {'wait':>9} {'hold':>9}")
+        for app, t in stats["apps"].items():
+            print(f"{app:<28} {t['samples']:6} {t['timeouts']:6} {t['mean_ms']:9.1f} {t['wait_ms']:9.1f} {t['hold_ms']:9}")
+
+def show_history(query="", restore=None, raw=False):
+    if restore:
+        if not call_service("RestoreHistory", restore)[0]:
+            print(f"No history entry {restore}")
+            sys.exit(1)
+        print(f"Restored {restore}")
+        return
+
+    payload = call_service("SearchHistory", query)[0]
+    if raw:
+        print(payload)
+        return
+
+    import json
+    import time
+    entries = json.loads(payload)
+    if not entries:
+        print("No matching entries")
+        return
+    for entry in entries:
+        stamp = time.strftime("%Y-%m-%d %H:%M", time.localtime(entry["timestamp"]))
+        print(f"{entry['id']}  {stamp}  {entry['size']:>8}  {entry['preview']}")
+
+def run_transform(chain, paths, jobs=None, in_place=False):
+    """Apply a mode chain to files or stdin locally; does not need the service."""
+    import io
+    from features import batch
+
+    try:
+        chain = CHAIN_SEPARATOR.join(parse_chain(chain))
+    except UnknownModeError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    files = [p for p in paths if p != "-"]
+    if in_place and (not files or len(files) != len(paths)):
+        print("Error: --in-place needs file arguments", file=sys.stderr)
+        sys.exit(1)
+
+    try:
+        if in_place:
+            batch.transform_in_place(files, chain, jobs)
+        elif not paths or paths == ["-"]:
+            src = io.TextIOWrapper(sys.stdin.buffer, encoding=batch.ENCODING,
+                                   errors=batch.ENCODING_ERRORS, newline="")
+            dst = io.TextIOWrapper(sys.stdout.buffer, encoding=batch.ENCODING,
+                                   errors=batch.ENCODING_ERRORS, newline="")
+            batch.transform_stream(chain, src, dst)
+            dst.flush()
+        elif len(files) != len(paths):
+            print("Error: stdin ('-') cannot be mixed with files", file=sys.stderr)
+            sys.exit(1)
+        else:
+            batch.transform_files(files, chain, sys.stdout.buffer, jobs)
+            sys.stdout.buffer.flush()
+    except BrokenPipeError:
+        # The reader went away (e.g. `| head`); stop quietly
+        sys.stderr.close()
+        sys.exit(1)
+    except OSError as e:
+        print(f"Error: {e}", file=sys.stderr)
         sys.exit(1)
-    else:
-        print(f"Triggered {action_name}")
 
 def main():
-    app = QCoreApplication(sys.argv)
     parser = argparse.ArgumentParser(description="Kapsulate CLI Controller")
     subparsers = parser.add_subparsers(dest="command", help="Command to execute")
 
     trigger_parser = subparsers.add_parser("trigger", help="Trigger an action")
-    trigger_parser.add_argument("action", choices=["task-manager", "color-picker", "password", "expand", "transform"], help="Action to trigger")
-    trigger_parser.add_argument("args", nargs="*", help="Extra arguments for the action")
+    trigger_parser.add_argument("action", choices=["task-manager", "color-picker", "password", "expand", "transform", "undo", "cycle", "cancel"], help="Action to trigger")
+    trigger_parser.add_argument(
+        "args", nargs="*",
+        help=f"Extra arguments for the action (transform modes: {', '.join(available_modes())})"
+    )
+
+    stats_parser = subparsers.add_parser("stats", help="Show per-phase timing statistics (milliseconds)")
+    stats_parser.add_argument("--json", action="store_true", help="Print the raw JSON")
+
+    history_parser = subparsers.add_parser("history", help="Search the clipboard history")
+    history_parser.add_argument("query", nargs="?", default="", help="Text to search for (case-insensitive)")
+    history_parser.add_argument("--restore", metavar="ID", help="Put the entry with this id back on the clipboard")
+    history_parser.add_argument("--json", action="store_true", help="Print the raw JSON")
+
+    transform_parser = subparsers.add_parser(
+        "transform", help="Transform files or stdin locally (no running service needed)"
+    )
+    transform_parser.add_argument(
+        "--mode", required=True,
+        help=f"Mode or chain such as lower{CHAIN_SEPARATOR}camel (available: {', '.join(available_modes())})"
+    )
+    transform_parser.add_argument("files", nargs="*", help="Files to transform (default: stdin)")
+    transform_parser.add_argument("-j", "--jobs", type=int, help="Worker processes (default: one per CPU)")
+    transform_parser.add_argument("-i", "--in-place", action="store_true", help="Rewrite the files instead of printing them")
 
     args = parser.parse_args()
 
     if args.command == "trigger":
         trigger_action(args.action, args.args)
+    elif args.command == "stats":
+        show_stats(args.json)
+    elif args.command == "history":
+        show_history(args.query, args.restore, args.json)
+    elif args.command == "transform":
+        run_transform(args.mode, args.files, args.jobs, args.in_place)
     else:
         parser.print_help()
 
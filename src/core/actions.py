@@ -1,53 +1,65 @@
-import subprocess
-import shutil
 import secrets
 import string
+from .clipboard import get_clipboard
+from .launcher import get_launcher
 from .logger import get_logger
+from .metrics import get_metrics
+from .process_runner import get_process_runner
+from features.history import get_clipboard_history
 
 class Actions:
     @staticmethod
-    def run_command(cmd: list):
-        logger = get_logger()
-        try:
-            logger.debug(f"Running command: {cmd}")
-            subprocess.Popen(cmd)
-        except FileNotFoundError:
-            logger.error(f"Command not found: {cmd[0] if cmd else 'empty command'}")
-        except PermissionError:
-            logger.error(f"Permission denied executing command: {cmd}")
-        except OSError as e:
-            logger.error(f"OS error running command {cmd}: {e}")
-        except Exception as e:
-            logger.exception(f"Unexpected error running command {cmd}: {e}")
+    def run_command(cmd: list, on_finished=None, key=None):
+        """Start `cmd` in the background; `on_finished(ProcessResult)` reports if it started.
+
+        With a `key`, a second call while the program runs raises its window instead.
+        """
+        if not cmd:
+            get_logger().error("Command not found: empty command")
+            return
+        get_launcher().launch(cmd, key, on_finished)
 
     @staticmethod
     def open_task_manager():
         # Try ksysguard, then plasma-systemmonitor, then gnome-system-monitor
         monitors = ["plasma-systemmonitor", "ksysguard", "gnome-system-monitor", "htop"]
-        for m in monitors:
-            if shutil.which(m):
-                if m == "htop":
-                    Actions.run_command(["konsole", "-e", "htop"])
-                else:
-                    Actions.run_command([m])
-                return
+        with get_metrics().span("action.task_manager"):
+            for m in monitors:
+                if get_launcher().which(m):
+                    if m == "htop":
+                        Actions.run_command(["konsole", "-e", "htop"], key="task-manager")
+                    else:
+                        Actions.run_command([m], key="task-manager")
+                    return
 
     @staticmethod
     def open_color_picker():
         # kcolorchooser is standard in KDE
-        Actions.run_command(["kcolorchooser"])
+        with get_metrics().span("action.color_picker"):
+            Actions.run_command(["kcolorchooser"], key="color-picker")
 
     @staticmethod
-    def open_password_gen():
+    def open_password_gen(on_finished):
+        """Generate a password and copy it in the background.
+
+        `on_finished` receives the password, or None if the clipboard write failed.
+        """
         logger = get_logger()
         chars = string.ascii_letters + string.digits + "!@#$%^&*"
         pwd = "".join(secrets.choice(chars) for _ in range(16))
 
-        # We need a way to copy to clipboard (wl-copy)
-        try:
-            subprocess.run(["wl-copy", pwd], check=True)
-            logger.debug("Password generated and copied to clipboard")
-            return pwd
-        except Exception as e:
-            logger.error(f"Clipboard error (is wl-clipboard installed?): {e}")
-            return None
+        # Passwords must not end up in the clipboard history
+        get_clipboard_history().exclude(pwd.encode("utf-8"))
+
+        def copy():
+            metrics = get_metrics()
+            try:
+                with metrics.span("action.password"):
+                    get_clipboard().set_text(pwd)
+                logger.debug("Password generated and copied to clipboard")
+                return pwd
+            except Exception as e:
+                logger.error("Clipboard error (is wl-clipboard installed?): %s", e)
+                return None
+
+        get_process_runner().submit(copy, on_finished)
@@ -0,0 +1,554 @@
+import base64
+import io
+import subprocess
+import tempfile
+import threading
+import time
+from PyQt6.QtDBus import QDBus, QDBusConnection, QDBusMessage
+from .logger import get_logger
+
+# Largest selection mirrored through the watcher pipe; bigger ones are read with wl-paste
+MIRROR_LIMIT_BYTES = 8 * 1024 * 1024
+# How long reading the primary selection on demand may take
+PRIMARY_READ_TIMEOUT_S = 1
+
+# Timeout for calls to Klipper's DBus interface (milliseconds)
+KLIPPER_TIMEOUT_MS = 1000
+# After a failed call (e.g. a timeout while Klipper is busy) wl-copy is used for this long
+KLIPPER_RETRY_S = 30
+
+# Saved clipboard contents stay in memory up to this size and spill to a temporary file beyond it
+SNAPSHOT_MEMORY_BYTES = 4 * 1024 * 1024
+# Offers larger than this are not saved
+SNAPSHOT_MAX_BYTES = 64 * 1024 * 1024
+# How long the application owning the clipboard may take to hand over all offers
+SNAPSHOT_TIMEOUT_S = 2
+SNAPSHOT_CHUNK_BYTES = 1024 * 1024
+
+# Names applications offer the same plain text under; only one of them is read
+TEXT_ALIASES = ("text/plain;charset=utf-8", "text/plain", "UTF8_STRING", "TEXT", "STRING")
+
+
+class ClipboardWatcher:
+    """Tracks clipboard ownership changes through one long-running `wl-paste --watch`.
+
+    Every new selection offer bumps a sequence number, so callers can wait for
+    the clipboard to actually change instead of sleeping for a guessed time.
+    For the clipboard, the watch command lists the MIME types of each offer
+    and, when it holds text, streams the text back over the same pipe
+    (base64, one line per offer). That keeps an in-process mirror for the
+    history and for reads after Ctrl+C; images and other binary offers are
+    only read when a snapshot needs them.
+
+    The primary selection changes on every mouse drag, so its watcher only
+    counts changes (one `echo` per change) and reads the selected text with
+    wl-paste when offer() asks for it, at most once per change.
+    """
+
+    def __init__(self, primary=False):
+        self.logger = get_logger()
+        self._primary = primary
+        self._cond = threading.Condition()
+        self._seq = 0
+        self._data = None
+        self._types = ()
+        self._fetched = True  # False while the primary selection's data is still to be read
+        self._changed_at = None
+        self._proc = None
+        self._thread = None
+        self._listeners = []
+
+    @property
+    def available(self):
+        return self._proc is not None and self._proc.poll() is None
+
+    def start(self):
+        """Spawn the watch process. Returns False if it cannot be started."""
+        if self.available:
+            return True
+        if self._primary:
+            cmd = ["wl-paste", "--primary", "--watch", "echo"]
+        else:
+            # Tab-separated types (printf is a builtin), then the text if there is any, on one line
+            script = (
+                "set -f; types=$(wl-paste --list-types); printf '%s\\t' $types; "
+                "case $types in *text/plain*|*STRING*|*TEXT*) "
+                f"printf ' '; head -c {MIRROR_LIMIT_BYTES + 1} | base64 -w0;; esac; echo"
+            )
+            cmd = ["wl-paste", "--watch", "sh", "-c", script]
+        try:
+            self._proc = subprocess.Popen(
+                cmd,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+            )
+        except OSError as e:
+            self.logger.warning("Clipboard watcher unavailable, using fixed delays: %s", e)
+            self._proc = None
+            return False
+
+        self._thread = threading.Thread(target=self._read_events, name="clipboard-watcher", daemon=True)
+        self._thread.start()
+        self.logger.debug("Clipboard watcher started (%s)", "primary" if self._primary else "clipboard")
+        return True
+
+    def stop(self):
+        if self._proc is not None:
+            self._proc.terminate()
+            try:
+                self._proc.wait(timeout=1)
+            except subprocess.TimeoutExpired:
+                self._proc.kill()
+            self._proc = None
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
+
+    def add_listener(self, callback):
+        """Call `callback(data)` on the watcher thread with every offer; `data` is None if not mirrored."""
+        self._listeners.append(callback)
+
+    def sequence(self):
+        """Return the number of clipboard changes seen so far."""
+        with self._cond:
+            return self._seq
+
+    def mirror(self):
+        """Return the mirrored bytes of the current offer, or None if not mirrored."""
+        return self.offer()[1]
+
+    def offer(self):
+        """Return (sequence, mirrored bytes or None, monotonic time of the change) atomically.
+
+        The primary selection is read here, on the first call after it changed.
+        """
+        if not self.available:
+            return self.sequence(), None, None
+        with self._cond:
+            seq, data, changed_at, fetched = self._seq, self._data, self._changed_at, self._fetched
+        if not fetched:
+            data = self._read_primary()
+            with self._cond:
+                if self._seq == seq:
+                    self._data = data
+                    self._fetched = True
+        return seq, data, changed_at
+
+    def offer_types(self):
+        """Return (sequence, MIME types offered, mirrored bytes or None) atomically."""
+        if not self.available:
+            return self.sequence(), (), None
+        with self._cond:
+            return self._seq, self._types, self._data
+
+    def wait_for_change(self, since, timeout_ms):
+        """Block until the sequence moves past `since` or the deadline passes.
+
+        Returns the time waited in milliseconds, or None on timeout.
+        """
+        start = time.monotonic()
+        deadline = start + timeout_ms / 1000
+        with self._cond:
+            while self._seq == since:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self.available:
+                    return None
+                self._cond.wait(remaining)
+        return (time.monotonic() - start) * 1000
+
+    def _read_primary(self):
+        """Read the primary selection with wl-paste. Returns None if empty, too big or unreadable."""
+        try:
+            proc = subprocess.Popen(["wl-paste", "--primary", "--no-newline"],
+                                    stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        except OSError as e:
+            self.logger.debug("Cannot read primary selection: %s", e)
+            return None
+        # An application that stops answering must not hold up the transformation
+        watchdog = threading.Timer(PRIMARY_READ_TIMEOUT_S, proc.kill)
+        watchdog.start()
+        try:
+            data = proc.stdout.read(MIRROR_LIMIT_BYTES + 1)
+            if len(data) > MIRROR_LIMIT_BYTES:
+                proc.kill()
+        finally:
+            watchdog.cancel()
+            proc.stdout.close()
+        # Non-zero when there is no selection, or killed
+        return data if proc.wait() == 0 else None
+
+    def _read_events(self):
+        # The watch command prints exactly one line per new offer
+        for line in self._proc.stdout:
+            types = ()
+            data = None
+            if not self._primary:
+                listed, mirrored, line = line.partition(b" ")
+                types = tuple(t for t in listed.decode("utf-8", errors="replace").strip().split("\t") if t)
+                if mirrored:
+                    try:
+                        data = base64.b64decode(line)
+                    except ValueError:
+                        pass
+            if data is not None and len(data) > MIRROR_LIMIT_BYTES:
+                data = None
+            with self._cond:
+                self._seq += 1
+                self._data = data
+                self._types = types
+                self._fetched = not self._primary
+                self._changed_at = time.monotonic()
+                self._cond.notify_all()
+            for callback in self._listeners:
+                try:
+                    callback(data)
+                except Exception as e:
+                    self.logger.exception("Clipboard listener failed: %s", e)
+        with self._cond:
+            self._data = None
+            self._cond.notify_all()
+        self.logger.debug("Clipboard watcher exited")
+
+
+def preferred_type(types):
+    """Return the type to offer when only one can be: an image, a file list, else plain text."""
+    for t in types:
+        if t.startswith("image/"):
+            return t
+    if "text/uri-list" in types:
+        return "text/uri-list"
+    return next((t for t in types if t in TEXT_ALIASES), types[0] if types else None)
+
+
+class ClipboardSnapshot:
+    """Raw bytes of a clipboard offer, kept to be offered again.
+
+    All types share one spooled buffer that stays in memory up to
+    SNAPSHOT_MEMORY_BYTES and moves to a temporary file beyond that.
+    Payloads are never decoded.
+    """
+
+    def __init__(self):
+        self.types = []  # MIME types in the order they were offered
+        self.size = 0
+        self._entries = {}  # MIME type -> (offset, size); text aliases share one entry
+        self._buffer = tempfile.SpooledTemporaryFile(max_size=SNAPSHOT_MEMORY_BYTES, prefix="kapsulate-clipboard-")
+
+    def __contains__(self, mime_type):
+        return mime_type in self._entries
+
+    @property
+    def spilled(self):
+        return self.size > SNAPSHOT_MEMORY_BYTES
+
+    def add(self, mime_type, stream, limit=SNAPSHOT_MAX_BYTES):
+        """Append what `stream` yields as `mime_type`. Returns False, keeping nothing, past `limit` bytes."""
+        start = self.size
+        self._buffer.seek(start)
+        while True:
+            chunk = stream.read(SNAPSHOT_CHUNK_BYTES)
+            if not chunk:
+                break
+            if self.size + len(chunk) > limit:
+                self._buffer.truncate(start)
+                self.size = start
+                return False
+            self._buffer.write(chunk)
+            self.size += len(chunk)
+        self._entries[mime_type] = (start, self.size - start)
+        return True
+
+    def remove(self, mime_type):
+        offset, size = self._entries.pop(mime_type)
+        if offset + size == self.size:
+            self._buffer.truncate(offset)
+            self.size = offset
+
+    def alias(self, mime_type, other):
+        """Offer `mime_type` with the same bytes as `other`."""
+        self._entries[mime_type] = self._entries[other]
+
+    def preferred_type(self):
+        """Return the type to offer when only one can be (see preferred_type())."""
+        return preferred_type(self.types)
+
+    def read_chunks(self, mime_type):
+        """Yield the saved bytes of `mime_type` in chunks."""
+        offset, remaining = self._entries[mime_type]
+        while remaining > 0:
+            self._buffer.seek(offset)
+            chunk = self._buffer.read(min(remaining, SNAPSHOT_CHUNK_BYTES))
+            if not chunk:
+                break
+            offset += len(chunk)
+            remaining -= len(chunk)
+            yield chunk
+
+    def close(self):
+        self._buffer.close()
+
+
+class ClipboardReader:
+    """Streams the clipboard contents out of a wl-paste process."""
+
+    def __init__(self, proc):
+        self._proc = proc
+
+    def read(self, size=-1):
+        return self._proc.stdout.read(size)
+
+    def close(self):
+        self._proc.stdout.close()
+        if self._proc.poll() is None:
+            self._proc.kill()
+        self._proc.wait()
+
+
+class ClipboardWriter:
+    """Streams new clipboard contents into a wl-copy process.
+
+    wl-copy only takes the selection once its input is complete, so
+    `abort()` leaves the clipboard untouched.
+    """
+
+    def __init__(self, proc):
+        self._proc = proc
+
+    def write(self, data):
+        self._proc.stdin.write(data)
+
+    def commit(self):
+        self._proc.stdin.close()
+        if self._proc.wait() != 0:
+            raise OSError(f"wl-copy exited with status {self._proc.returncode}")
+
+    def abort(self):
+        self._proc.kill()
+        try:
+            self._proc.stdin.close()
+        except OSError:
+            pass
+        self._proc.wait()
+
+
+class WlClipboardBackend:
+    """Clipboard access through one wl-paste / wl-copy process per operation."""
+    name = "wl-clipboard"
+
+    def __init__(self):
+        self.logger = get_logger()
+
+    def get_bytes(self, primary=False):
+        cmd = ["wl-paste", "-n"]
+        if primary:
+            cmd.append("--primary")
+        return subprocess.check_output(cmd, stderr=subprocess.DEVNULL)
+
+    def set_bytes(self, data, mime_type=None):
+        cmd = ["wl-copy"]
+        if mime_type:
+            cmd += ["--type", mime_type]
+        p = subprocess.Popen(cmd, stdin=subprocess.PIPE)
+        p.communicate(input=data)
+        if p.returncode != 0:
+            raise OSError(f"wl-copy exited with status {p.returncode}")
+
+    def get_text(self, primary=False):
+        return self.get_bytes(primary).decode("utf-8", errors="replace")
+
+    def open_reader(self):
+        """Return a file-like object streaming the clipboard contents."""
+        proc = subprocess.Popen(["wl-paste", "-n"], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        return ClipboardReader(proc)
+
+    def open_writer(self, mime_type=None):
+        """Return a writer that replaces the clipboard once committed."""
+        cmd = ["wl-copy"]
+        if mime_type:
+            cmd += ["--type", mime_type]
+        return ClipboardWriter(subprocess.Popen(cmd, stdin=subprocess.PIPE))
+
+    def set_text(self, text):
+        self.set_bytes(text.encode("utf-8"))
+
+    def snapshot(self, limit=SNAPSHOT_MAX_BYTES, offered=None):
+        """Save the clipboard offer restore() can put back. Returns a ClipboardSnapshot, or None if empty.
+
+        Only preferred_type() of the offered types is read; plain text is
+        kept under all its offered names. `offered` lists the types when
+        already known, saving a wl-paste call.
+        """
+        if not offered:
+            try:
+                listed = subprocess.run(["wl-paste", "--list-types"], capture_output=True, timeout=SNAPSHOT_TIMEOUT_S)
+            except (OSError, subprocess.TimeoutExpired) as e:
+                self.logger.debug("Cannot list clipboard types: %s", e)
+                return None
+            if listed.returncode != 0:
+                return None
+            offered = listed.stdout.decode("utf-8", errors="replace").split("\n")
+        offered = [t for t in dict.fromkeys(offered) if t.strip()]
+        if not offered:
+            return None
+
+        # restore() can only offer one type, so only that one is read
+        mime_type = preferred_type(offered)
+        try:
+            proc = subprocess.Popen(
+                ["wl-paste", "--no-newline", "--type", mime_type],
+                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            )
+        except OSError as e:
+            self.logger.debug("Cannot read clipboard: %s", e)
+            return None
+        # An application that stops answering must not hold up the transformation
+        watchdog = threading.Timer(SNAPSHOT_TIMEOUT_S, proc.kill)
+        watchdog.start()
+        snapshot = ClipboardSnapshot()
+        try:
+            if not snapshot.add(mime_type, proc.stdout, limit):
+                self.logger.info("Not saving %s clipboard offer over %d MB", mime_type, limit // (1024 * 1024))
+                proc.kill()
+            elif proc.wait() != 0:
+                # Refused, or cut off by the watchdog
+                snapshot.remove(mime_type)
+        finally:
+            watchdog.cancel()
+            if proc.poll() is None:
+                proc.kill()
+            proc.stdout.close()
+            proc.wait()
+        if mime_type in snapshot and mime_type in TEXT_ALIASES:
+            for other in offered:
+                if other in TEXT_ALIASES and other != mime_type:
+                    snapshot.alias(other, mime_type)
+        snapshot.types = [t for t in offered if t in snapshot]
+        if not snapshot.types:
+            snapshot.close()
+            return None
+        return snapshot
+
+    def restore(self, snapshot):
+        """Offer the contents of `snapshot` again.
+
+        wl-copy serves a single type, so snapshot.preferred_type() is
+        offered (plain text under all its usual names).
+        """
+        mime_type = snapshot.preferred_type()
+        writer = self.open_writer(None if mime_type in TEXT_ALIASES else mime_type)
+        try:
+            for chunk in snapshot.read_chunks(mime_type):
+                writer.write(chunk)
+        except BaseException:
+            writer.abort()
+            raise
+        writer.commit()
+
+
+class PersistentClipboardBackend(WlClipboardBackend):
+    """Clipboard access over connections that stay open for the whole session.
+
+    Reads come from the watcher's in-process mirror and text writes go to
+    Klipper over the session bus. Both fall back to wl-clipboard processes
+    when the watcher or Klipper is unavailable, or the selection is too big
+    to mirror.
+    """
+    name = "persistent"
+
+    def __init__(self, watcher):
+        super().__init__()
+        self._watcher = watcher
+        self._klipper_ok = True  # False once Klipper turns out not to run at all
+        self._klipper_retry_at = 0.0
+
+    def get_bytes(self, primary=False):
+        if not primary:
+            data = self._watcher.mirror()
+            if data is not None:
+                return data
+        return super().get_bytes(primary)
+
+    def open_reader(self):
+        data = self._watcher.mirror()
+        if data is not None:
+            return io.BytesIO(data)
+        return super().open_reader()
+
+    def snapshot(self, limit=SNAPSHOT_MAX_BYTES, offered=None):
+        _seq, types, data = self._watcher.offer_types()
+        first = preferred_type(types)
+        if data is not None and first in TEXT_ALIASES:
+            # Plain text is what restore() offers, and the mirror holds it
+            snapshot = ClipboardSnapshot()
+            if not snapshot.add(first, io.BytesIO(data), limit):
+                snapshot.close()
+                return None
+            snapshot.types = [t for t in dict.fromkeys(types) if t in TEXT_ALIASES]
+            for mime_type in snapshot.types:
+                if mime_type != first:
+                    snapshot.alias(mime_type, first)
+            return snapshot
+        return super().snapshot(limit, offered or types)
+
+    def _klipper_usable(self):
+        return self._klipper_ok and time.monotonic() >= self._klipper_retry_at
+
+    def set_bytes(self, data, mime_type=None):
+        if mime_type is None and self._klipper_usable():
+            try:
+                if self._klipper_set(data.decode("utf-8")):
+                    return
+            except UnicodeDecodeError:
+                pass
+        super().set_bytes(data, mime_type)
+
+    def set_text(self, text):
+        if self._klipper_usable() and self._klipper_set(text):
+            return
+        super().set_bytes(text.encode("utf-8"))
+
+    def _klipper_set(self, text):
+        msg = QDBusMessage.createMethodCall(
+            "org.kde.klipper",
+            "/klipper",
+            "org.kde.klipper.klipper",
+            "setClipboardContents"
+        )
+        msg.setArguments([text])
+        reply = QDBusConnection.sessionBus().call(msg, QDBus.CallMode.Block, KLIPPER_TIMEOUT_MS)
+        if reply.type() == QDBusMessage.MessageType.ErrorMessage:
+            if reply.errorName() == "org.freedesktop.DBus.Error.ServiceUnknown":
+                self.logger.info("Klipper not running, writing clipboard with wl-copy: %s", reply.errorMessage())
+                self._klipper_ok = False
+            else:
+                self.logger.info("Klipper call failed, using wl-copy for %d s: %s",
+                                 KLIPPER_RETRY_S, reply.errorMessage())
+                self._klipper_retry_at = time.monotonic() + KLIPPER_RETRY_S
+            return False
+        return True
+
+
+_watcher_instance = None
+_primary_watcher_instance = None
+_clipboard_instance = None
+
+def get_clipboard_watcher():
+    global _watcher_instance
+    if _watcher_instance is None:
+        _watcher_instance = ClipboardWatcher()
+    return _watcher_instance
+
+def get_primary_watcher():
+    """Return the watcher mirroring the primary selection (the currently selected text)."""
+    global _primary_watcher_instance
+    if _primary_watcher_instance is None:
+        _primary_watcher_instance = ClipboardWatcher(primary=True)
+    return _primary_watcher_instance
+
+def get_clipboard():
+    """Return the shared clipboard backend."""
+    global _clipboard_instance
+    if _clipboard_instance is None:
+        _clipboard_instance = PersistentClipboardBackend(get_clipboard_watcher())
+    return _clipboard_instance
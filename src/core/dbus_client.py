@@ -0,0 +1,336 @@
+"""
+Minimal session bus client speaking the DBus wire protocol directly.
+
+The CLI runs on every keyboard shortcut, so it must not pay for a Qt boot
+just to send one method call. This module only uses the standard library
+and supports what the CLI needs: EXTERNAL authentication over a Unix
+socket and method calls taking strings or string arrays and returning
+basic types or string arrays. Calls can be pipelined: send several, then
+collect the replies.
+"""
+import os
+import socket
+import struct
+
+# Timeout for connecting, authenticating and waiting for the reply (seconds)
+DEFAULT_TIMEOUT_S = 5.0
+
+_METHOD_CALL = 1
+_METHOD_RETURN = 2
+_ERROR = 3
+
+_FIELD_PATH = 1
+_FIELD_INTERFACE = 2
+_FIELD_MEMBER = 3
+_FIELD_ERROR_NAME = 4
+_FIELD_REPLY_SERIAL = 5
+_FIELD_DESTINATION = 6
+_FIELD_SIGNATURE = 8
+
+_FIELD_TYPES = {
+    _FIELD_PATH: "o",
+    _FIELD_INTERFACE: "s",
+    _FIELD_MEMBER: "s",
+    _FIELD_DESTINATION: "s",
+    _FIELD_SIGNATURE: "g",
+}
+
+
+class DBusError(Exception):
+    """Raised when the bus cannot be reached or a call returns an error."""
+
+    def __init__(self, message, name=None):
+        super().__init__(message)
+        self.name = name
+
+
+def session_bus_address():
+    """Return the session bus address from the environment."""
+    address = os.environ.get("DBUS_SESSION_BUS_ADDRESS")
+    if address:
+        return address
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR", f"/run/user/{os.getuid()}")
+    return f"unix:path={os.path.join(runtime_dir, 'bus')}"
+
+
+def _connect(address, timeout):
+    errors = []
+    for entry in address.split(";"):
+        transport, _, params = entry.partition(":")
+        if transport != "unix":
+            continue
+        options = dict(p.split("=", 1) for p in params.split(",") if "=" in p)
+        if "path" in options:
+            target = options["path"]
+        elif "abstract" in options:
+            target = "\0" + options["abstract"]
+        else:
+            continue
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        try:
+            sock.connect(target)
+            return sock
+        except OSError as e:
+            sock.close()
+            errors.append(str(e))
+    raise DBusError(f"Cannot connect to the session bus at {address}: {'; '.join(errors) or 'no usable address'}")
+
+
+# --- Marshalling -------------------------------------------------------------
+
+class _Writer:
+    def __init__(self):
+        self.buf = bytearray()
+
+    def align(self, n):
+        self.buf += b"\0" * (-len(self.buf) % n)
+
+    def byte(self, value):
+        self.buf.append(value)
+
+    def uint32(self, value):
+        self.align(4)
+        self.buf += struct.pack("<I", value)
+
+    def string(self, value):
+        data = value.encode("utf-8")
+        self.uint32(len(data))
+        self.buf += data + b"\0"
+
+    def signature(self, value):
+        data = value.encode("ascii")
+        self.buf.append(len(data))
+        self.buf += data + b"\0"
+
+    def string_array(self, values):
+        self.uint32(0)
+        length_at = len(self.buf) - 4
+        start = len(self.buf)
+        for value in values:
+            self.string(value)
+        struct.pack_into("<I", self.buf, length_at, len(self.buf) - start)
+
+
+class _Reader:
+    def __init__(self, data, little_endian):
+        self.data = data
+        self.pos = 0
+        self.prefix = "<" if little_endian else ">"
+
+    def align(self, n):
+        self.pos += -self.pos % n
+
+    def byte(self):
+        value = self.data[self.pos]
+        self.pos += 1
+        return value
+
+    def uint32(self):
+        self.align(4)
+        (value,) = struct.unpack_from(self.prefix + "I", self.data, self.pos)
+        self.pos += 4
+        return value
+
+    def string(self):
+        length = self.uint32()
+        value = self.data[self.pos:self.pos + length].decode("utf-8", errors="replace")
+        self.pos += length + 1
+        return value
+
+    def signature(self):
+        length = self.byte()
+        value = self.data[self.pos:self.pos + length].decode("ascii")
+        self.pos += length + 1
+        return value
+
+    def value(self, sig):
+        if sig in ("s", "o"):
+            return self.string()
+        if sig == "g":
+            return self.signature()
+        if sig == "u":
+            return self.uint32()
+        if sig == "b":
+            return bool(self.uint32())
+        if sig == "y":
+            return self.byte()
+        if sig == "as":
+            end = self.uint32() + self.pos
+            values = []
+            while self.pos < end:
+                values.append(self.string())
+            return values
+        raise DBusError(f"Unsupported type '{sig}' in reply")
+
+
+# Reply types _Reader.value() understands
+_SUPPORTED_TYPES = {"s", "o", "g", "u", "b", "y", "as"}
+
+
+def _split_signature(sig):
+    """Split a body signature into single complete types ("sas" -> ["s", "as"])."""
+    types = []
+    i = 0
+    while i < len(sig):
+        end = i + 2 if sig[i] == "a" else i + 1
+        types.append(sig[i:end])
+        i = end
+    return types
+
+
+def _method_call(serial, destination, path, interface, member, args):
+    body = _Writer()
+    arg_sig = ""
+    for arg in args:
+        if isinstance(arg, (list, tuple)):
+            body.string_array(arg)
+            arg_sig += "as"
+        else:
+            body.string(arg)
+            arg_sig += "s"
+
+    fields = {
+        _FIELD_PATH: path,
+        _FIELD_MEMBER: member,
+        _FIELD_DESTINATION: destination,
+    }
+    if interface:
+        fields[_FIELD_INTERFACE] = interface
+    if args:
+        fields[_FIELD_SIGNATURE] = arg_sig
+
+    msg = _Writer()
+    msg.buf += struct.pack("<cBBBII", b"l", _METHOD_CALL, 0, 1, len(body.buf), serial)
+    array = _Writer()
+    for code, value in fields.items():
+        sig = _FIELD_TYPES[code]
+        # Header fields are (code, variant) structs; offsets count from the message start
+        array.align(8)
+        array.byte(code)
+        array.signature(sig)
+        if sig == "g":
+            array.signature(value)
+        else:
+            array.string(value)
+    # The fixed header is 16 bytes, so offsets inside the array line up with the message
+    msg.uint32(len(array.buf))
+    msg.buf += array.buf
+    msg.align(8)
+    return bytes(msg.buf + body.buf)
+
+
+def _parse_message(data):
+    """Return (type, header fields, body values) of one complete message."""
+    little_endian = data[0:1] == b"l"
+    r = _Reader(data, little_endian)
+    r.pos = 1
+    msg_type = r.byte()
+    r.pos = 12
+    fields_len = r.uint32()
+    end = r.pos + fields_len
+    fields = {}
+    while r.pos < end:
+        r.align(8)
+        code = r.byte()
+        sig = r.signature()
+        fields[code] = r.value(sig)
+    r.align(8)
+    values = []
+    body_types = _split_signature(fields.get(_FIELD_SIGNATURE, ""))
+    if body_types and set(body_types) <= _SUPPORTED_TYPES:
+        values = [r.value(sig) for sig in body_types]
+    return msg_type, fields, values
+
+
+class SessionBusClient:
+    """One short-lived connection to the session bus."""
+
+    def __init__(self, address=None, timeout=DEFAULT_TIMEOUT_S):
+        self._sock = _connect(address or session_bus_address(), timeout)
+        self._buf = b""
+        self._serial = 0
+        self._pending = set()  # serials of calls sent through send() and not yet answered
+        self._replies = {}  # serial -> (type, fields, values) read ahead while waiting for another
+        try:
+            self._authenticate()
+            # The bus refuses everything until Hello; its reply is read lazily
+            # together with the first real call
+            self._send_call("org.freedesktop.DBus", "/org/freedesktop/DBus",
+                            "org.freedesktop.DBus", "Hello", ())
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self):
+        self._sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def call(self, destination, path, interface, member, *args):
+        """Call a method taking string (or list of strings) arguments. Returns the reply values."""
+        return self.reply(self.send(destination, path, interface, member, *args))
+
+    def send(self, destination, path, interface, member, *args):
+        """Send a method call without waiting; pass the returned serial to reply()."""
+        serial = self._send_call(destination, path, interface, member, args)
+        self._pending.add(serial)
+        return serial
+
+    def reply(self, serial):
+        """Wait for the reply to call `serial` and return its values."""
+        while serial not in self._replies:
+            msg_type, fields, values = _parse_message(self._read_message())
+            reply_serial = fields.get(_FIELD_REPLY_SERIAL)
+            # Hello reply, NameAcquired and other signals are dropped
+            if msg_type in (_METHOD_RETURN, _ERROR) and reply_serial in self._pending:
+                self._replies[reply_serial] = (msg_type, fields, values)
+        self._pending.discard(serial)
+        msg_type, fields, values = self._replies.pop(serial)
+        if msg_type == _ERROR:
+            name = fields.get(_FIELD_ERROR_NAME)
+            raise DBusError(values[0] if values else name, name)
+        return values
+
+    def _send_call(self, destination, path, interface, member, args):
+        self._serial += 1
+        self._sock.sendall(_method_call(self._serial, destination, path, interface, member, args))
+        return self._serial
+
+    def _authenticate(self):
+        uid = str(os.getuid()).encode("ascii").hex()
+        self._sock.sendall(b"\0AUTH EXTERNAL " + uid.encode("ascii") + b"\r\n")
+        line = self._read_line()
+        if not line.startswith(b"OK "):
+            raise DBusError(f"Session bus authentication failed: {line.decode(errors='replace')}")
+        self._sock.sendall(b"BEGIN\r\n")
+
+    def _read_line(self):
+        while b"\r\n" not in self._buf:
+            self._recv()
+        line, _, self._buf = self._buf.partition(b"\r\n")
+        return line
+
+    def _read_message(self):
+        while len(self._buf) < 16:
+            self._recv()
+        fmt = "<" if self._buf[0:1] == b"l" else ">"
+        body_len, _, fields_len = struct.unpack_from(fmt + "III", self._buf, 4)
+        total = 16 + fields_len + (-fields_len % 8) + body_len
+        while len(self._buf) < total:
+            self._recv()
+        data, self._buf = self._buf[:total], self._buf[total:]
+        return data
+
+    def _recv(self):
+        try:
+            chunk = self._sock.recv(65536)
+        except socket.timeout:
+            raise DBusError("Timed out waiting for the session bus") from None
+        if not chunk:
+            raise DBusError("Session bus closed the connection")
+        self._buf += chunk
@@ -0,0 +1,163 @@
+import os
+import tempfile
+import threading
+from PyQt6.QtDBus import QDBus, QDBusConnection, QDBusMessage
+from .logger import get_logger
+from .process_runner import get_process_runner
+
+KWIN_SERVICE = "org.kde.KWin"
+KWIN_SCRIPTING_PATH = "/Scripting"
+KWIN_SCRIPTING = "org.kde.kwin.Scripting"
+KWIN_SCRIPT = "org.kde.kwin.Script"
+SCRIPT_NAME = "kapsulate-focus"
+ACTIVATE_SCRIPT_NAME = "kapsulate-activate"
+
+# Timeout for the calls that load and unload the script (milliseconds)
+KWIN_TIMEOUT_MS = 2000
+
+# Reports the resource class of every activated window to SetActiveWindow.
+# Plasma 6 renamed clientActivated/activeClient to windowActivated/activeWindow.
+FOCUS_SCRIPT = """
+function report(window) {
+    callDBus("org.kapsulate.service", "/org/kapsulate/Service",
+             "local.py.main.KapsulateService", "SetActiveWindow",
+             window ? String(window.resourceClass) : "");
+}
+if (workspace.windowActivated) {
+    workspace.windowActivated.connect(report);
+    report(workspace.activeWindow);
+} else {
+    workspace.clientActivated.connect(report);
+    report(workspace.activeClient);
+}
+"""
+
+# Raises the first window owned by PID (substituted before loading)
+ACTIVATE_SCRIPT = """
+var windows = workspace.windowList ? workspace.windowList() : workspace.clientList();
+for (var i = 0; i < windows.length; i++) {
+    if (windows[i].pid === PID) {
+        if (workspace.windowList) {
+            workspace.activeWindow = windows[i];
+        } else {
+            workspace.activeClient = windows[i];
+        }
+        break;
+    }
+}
+"""
+
+
+class FocusTracker:
+    """Knows which application has keyboard focus, as reported by a KWin script.
+
+    Outside KWin the application stays unknown and callers fall back to
+    their defaults.
+    """
+
+    def __init__(self):
+        self.logger = get_logger()
+        self.active_app = ""
+        self._loaded = False
+        self._script_paths = {}
+        # Scripts are written, loaded, run and unloaded from pool threads;
+        # one sequence at a time, or overlapping activations unload each other's script
+        self._lock = threading.Lock()
+
+    def start(self):
+        # Loading a script is a few blocking round-trips to KWin; keep them off the GUI thread
+        get_process_runner().submit(self._load_script)
+
+    def stop(self):
+        with self._lock:
+            if self._loaded:
+                self._unload_script(SCRIPT_NAME)
+                self._loaded = False
+
+    def set_active(self, app):
+        if app != self.active_app:
+            self.logger.debug("Focused application: %s", app or "unknown")
+        self.active_app = app
+
+    def activate_window(self, pid):
+        """Raise and focus the window of process `pid`. Blocks on KWin; call it off the GUI thread.
+
+        Returns False if KWin scripting is unavailable.
+        """
+        with self._lock:
+            ok = self._run_script(ACTIVATE_SCRIPT_NAME, ACTIVATE_SCRIPT.replace("PID", str(int(pid))))
+            # The script has done its work once run() returns
+            self._unload_script(ACTIVATE_SCRIPT_NAME)
+        return ok
+
+    def _load_script(self):
+        with self._lock:
+            if self._run_script(SCRIPT_NAME, FOCUS_SCRIPT):
+                self._loaded = True
+                self.logger.info("Tracking the focused application through KWin")
+            else:
+                self._unload_script(SCRIPT_NAME)
+                self.logger.info("KWin scripting unavailable; timings are not tracked per application")
+
+    def _run_script(self, name, source):
+        """Load `source` into KWin as script `name` and run it. Returns False on failure."""
+        # mkstemp picks an unpredictable name and creates it 0600, so nobody
+        # else can plant or swap the script in a shared /tmp before KWin loads it
+        try:
+            fd, path = tempfile.mkstemp(prefix=f"{name}-", suffix=".js",
+                                        dir=os.environ.get("XDG_RUNTIME_DIR") or None)
+        except OSError as e:
+            self.logger.warning("Cannot create KWin script %s: %s", name, e)
+            return False
+        self._remove_script_file(name)
+        self._script_paths[name] = path
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(source)
+        except OSError as e:
+            self.logger.warning("Cannot write KWin script %s: %s", path, e)
+            self._remove_script_file(name)
+            return False
+
+        # A script left behind by a crashed instance would run twice
+        self._call(KWIN_SCRIPTING_PATH, KWIN_SCRIPTING, "unloadScript", name)
+        reply = self._call(KWIN_SCRIPTING_PATH, KWIN_SCRIPTING, "loadScript", path, name)
+        if reply is None or not reply.arguments() or reply.arguments()[0] < 0:
+            return False
+        script_id = reply.arguments()[0]
+        # Plasma 6 exports scripts under /Scripting/Script<id>, Plasma 5 under /<id>
+        for script_path in (f"{KWIN_SCRIPTING_PATH}/Script{script_id}", f"/{script_id}"):
+            if self._call(script_path, KWIN_SCRIPT, "run") is not None:
+                return True
+        self.logger.warning("Could not start KWin script %s", name)
+        return False
+
+    def _unload_script(self, name):
+        self._call(KWIN_SCRIPTING_PATH, KWIN_SCRIPTING, "unloadScript", name)
+        self._remove_script_file(name)
+
+    def _remove_script_file(self, name):
+        path = self._script_paths.pop(name, None)
+        if path is not None:
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+    def _call(self, path, interface, method, *args):
+        msg = QDBusMessage.createMethodCall(KWIN_SERVICE, path, interface, method)
+        msg.setArguments(list(args))
+        reply = QDBusConnection.sessionBus().call(msg, QDBus.CallMode.Block, KWIN_TIMEOUT_MS)
+        if reply.type() == QDBusMessage.MessageType.ErrorMessage:
+            self.logger.debug("KWin %s failed: %s", method, reply.errorMessage())
+            return None
+        return reply
+
+
+_focus_instance = None
+
+def get_focus_tracker():
+    global _focus_instance
+    if _focus_instance is None:
+        _focus_instance = FocusTracker()
+    return _focus_instance
@@ -0,0 +1,179 @@
+"""
+In-memory model of the keyd configuration (kapsulate.conf).
+
+The file is parsed into its device ids and layers ([main], [kap],
+[kap_transform], ...) and validated before keyd is asked to reload it, so
+a typo does not leave the keyboard without its mappings. Parsed models are
+cached by inode, size and mtime; an unchanged file costs one stat.
+
+Only the structure keyd needs to load a file is checked: section and
+binding syntax, balanced parentheses, duplicate keys and references to
+layers that do not exist. Key and action names are left to keyd.
+
+This module only uses the standard library.
+"""
+import os
+import re
+
+# Candidate locations, in order; the first one that exists is used
+KEYD_CONFIG_PATHS = (
+    "/etc/keyd/kapsulate.conf",           # the file keyd loads
+    "/etc/kapsulate/kapsulate.conf",      # installed package default
+    "~/.config/kapsulate/kapsulate.conf",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                 "config", "kapsulate.conf"),  # development checkout
+)
+
+# Sections that hold settings rather than key bindings
+OPTION_SECTIONS = {"global", "aliases"}
+# Layers keyd defines itself
+BUILTIN_LAYERS = {"main", "control", "shift", "meta", "alt", "altgr"}
+
+_SECTION_RE = re.compile(r"\[([^\]]+)\]")
+_BINDING_RE = re.compile(r"([^=\s][^=]*?)\s*=\s*(.*)")
+# Actions whose first argument names a layer
+_LAYER_REF_RE = re.compile(
+    r"\b(?:layer|oneshot|toggle|swap|overload|overloadt|overloadt2|lettermod"
+    r"|layerm|oneshotm|togglem|swapm)\(\s*([^,()\s]+)"
+)
+
+
+class KeydConfigError(ValueError):
+    """A problem found in the keyd configuration; `line` is 1-based, or None."""
+
+    def __init__(self, message, line=None):
+        super().__init__(f"line {line}: {message}" if line else message)
+        self.line = line
+
+
+class KeydConfig:
+    """Device ids, option sections and layer bindings of one config file."""
+
+    def __init__(self):
+        self.ids = []
+        self.options = {}  # section -> {name: value}
+        self.layers = {}   # layer name -> {key: action}
+        self.includes = []
+
+    def __eq__(self, other):
+        return isinstance(other, KeydConfig) and self._sections() == other._sections()
+
+    def changed_sections(self, other):
+        """Return the names of sections that differ between `other` and this config."""
+        old = other._sections() if other is not None else {}
+        new = self._sections()
+        return sorted(name for name in old.keys() | new.keys() if old.get(name) != new.get(name))
+
+    def _sections(self):
+        sections = {"ids": sorted(self.ids), "include": self.includes}
+        sections.update(self.options)
+        sections.update(self.layers)
+        return sections
+
+
+def layer_name(header):
+    """Return the layer name of a section header such as "nav:C"."""
+    return header.split(":", 1)[0].strip()
+
+
+def parse_config(text):
+    """Parse keyd configuration text. Returns (KeydConfig, [KeydConfigError])."""
+    config = KeydConfig()
+    errors = []
+    section = None
+    bindings = None
+    binding_lines = []  # (line, layer, action) checked once every layer is known
+
+    for lineno, raw in enumerate(text.splitlines(), 1):
+        line = raw.strip()
+        if not line or line.startswith("#"):
+            continue
+        if line.startswith("include "):
+            config.includes.append(line[len("include "):].strip())
+            continue
+        match = _SECTION_RE.fullmatch(line)
+        if match:
+            section = layer_name(match.group(1))
+            if not section:
+                errors.append(KeydConfigError("empty section name", lineno))
+                section = bindings = None
+            elif section == "ids":
+                bindings = None
+            elif section in OPTION_SECTIONS:
+                bindings = config.options.setdefault(section, {})
+            elif section in config.layers:
+                errors.append(KeydConfigError(f"layer [{section}] is defined twice", lineno))
+                bindings = config.layers[section]
+            else:
+                bindings = config.layers[section] = {}
+            continue
+        if section is None:
+            errors.append(KeydConfigError(f"'{line}' is outside of any section", lineno))
+            continue
+        if section == "ids":
+            config.ids.append(line)
+            continue
+        if bindings is None:
+            continue
+
+        match = _BINDING_RE.fullmatch(line)
+        if not match or not match.group(2):
+            errors.append(KeydConfigError(f"expected 'key = action' in [{section}], got '{line}'", lineno))
+            continue
+        key, action = match.group(1).strip(), match.group(2).strip()
+        if key in bindings:
+            errors.append(KeydConfigError(f"'{key}' is bound twice in [{section}]", lineno))
+        bindings[key] = action
+        if section not in OPTION_SECTIONS:
+            if action.count("(") != action.count(")"):
+                errors.append(KeydConfigError(f"unbalanced parentheses in '{action}'", lineno))
+            binding_lines.append((lineno, section, action))
+
+    if not config.ids:
+        errors.append(KeydConfigError("no [ids] section (use '*' to match every keyboard)"))
+    known = BUILTIN_LAYERS | set(config.layers)
+    for lineno, section, action in binding_lines:
+        for ref in _LAYER_REF_RE.findall(action):
+            # Composite layers such as control+alt are made of known layers
+            if not all(part in known for part in ref.split("+")):
+                errors.append(KeydConfigError(f"[{section}] refers to unknown layer '{ref}'", lineno))
+    errors.sort(key=lambda e: e.line or 0)
+    return config, errors
+
+
+def find_keyd_config():
+    """Return the first existing kapsulate.conf from KEYD_CONFIG_PATHS, or None."""
+    for path in KEYD_CONFIG_PATHS:
+        path = os.path.expanduser(path)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+class KeydConfigStore:
+    """Parsed keyd configuration, re-read only when the file changes."""
+
+    def __init__(self, path):
+        self.path = path
+        self._stat = None
+        self._result = (None, [])
+
+    def load(self):
+        """Return (KeydConfig or None, [KeydConfigError]) for the current file contents."""
+        try:
+            st = os.stat(self.path)
+            key = (st.st_ino, st.st_size, st.st_mtime_ns)
+        except OSError:
+            key = None
+        if key == self._stat and self._stat is not None:
+            return self._result
+        if key is None:
+            self._result = (None, [KeydConfigError(f"{self.path} does not exist")])
+        else:
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    self._result = parse_config(f.read())
+            except (OSError, UnicodeDecodeError) as e:
+                self._result = (None, [KeydConfigError(f"cannot read {self.path}: {e}")])
+        self._stat = key
+        return self._result
@@ -0,0 +1,166 @@
+import os
+from PyQt6.QtCore import QObject, QFileSystemWatcher, QTimer, pyqtSignal, pyqtSlot
+from .keyd_config import KeydConfigStore, find_keyd_config
+from .logger import get_logger
+from .process_runner import get_process_runner
+
+# Editors often write a file in several steps; wait for them to finish before reloading
+RELOAD_DEBOUNCE_MS = 300
+
+# `keyd reload` re-reads the config files without recreating the virtual devices;
+# it needs access to the keyd socket (root or the keyd group)
+KEYD_RELOAD_CMD = ["keyd", "reload"]
+KEYD_RELOAD_TIMEOUT_S = 10
+# Interactive fallback when the socket is not accessible
+PKEXEC_RELOAD_TIMEOUT_S = 60
+
+
+class KeydManager(QObject):
+    """Validates kapsulate.conf and has keyd reload it when it changes.
+
+    A changed file is parsed and checked first; keyd is only asked to
+    reload when the file is valid and its bindings actually changed.
+    """
+
+    # Emitted with a message for the user after a reload, or when one is refused
+    reloaded = pyqtSignal(str)
+    failed = pyqtSignal(str)
+
+    def __init__(self, path=None):
+        super().__init__()
+        self.logger = get_logger()
+        self.path = path or find_keyd_config()
+        self.store = KeydConfigStore(self.path) if self.path else None
+        self._applied = None  # the model keyd was last asked to load
+        self._checked = None  # last load() result looked at by an automatic reload
+        self._busy = False
+        self._pending = None  # reload requested while one was running (True = interactive)
+
+        # The directory is watched too: editors that save by renaming a new
+        # file over the old one drop the file watch
+        self._watcher = QFileSystemWatcher(self)
+        self._watcher.fileChanged.connect(self._schedule_reload)
+        self._watcher.directoryChanged.connect(self._schedule_reload)
+        self._reload_timer = QTimer(self)
+        self._reload_timer.setSingleShot(True)
+        self._reload_timer.timeout.connect(self._on_file_changed)
+
+    def start(self):
+        if self.store is None:
+            self.logger.warning("No kapsulate.conf found; keyd config is not watched")
+            return
+        self._checked = self.store.load()
+        config, errors = self._checked
+        for error in errors:
+            self.logger.warning("%s: %s", self.path, error)
+        # keyd loaded the file on its own at boot
+        self._applied = config if not errors else None
+        directory = os.path.dirname(self.path)
+        if os.path.isdir(directory):
+            self._watcher.addPath(directory)
+        self._watch_file()
+        self.logger.info("Watching keyd config %s", self.path)
+
+    def reload(self, interactive=True):
+        """Validate the config and have keyd reload it.
+
+        An interactive reload (from the tray) always reloads and may ask for
+        a password if the keyd socket is not accessible; an automatic one
+        only runs when the bindings changed and never prompts.
+        """
+        if self.store is None:
+            self.failed.emit("Config file not found!")
+            return
+        if self._busy:
+            self._pending = interactive or bool(self._pending)
+            return
+
+        loaded = self.store.load()
+        if not interactive and loaded is self._checked:
+            # A directory event for another file; this one is unchanged
+            return
+        self._checked = loaded
+        config, errors = loaded
+        if errors:
+            for error in errors:
+                self.logger.error("%s: %s", self.path, error)
+            more = f" (+{len(errors) - 1} more)" if len(errors) > 1 else ""
+            self.failed.emit(f"Config not applied: {errors[0]}{more}")
+            return
+        changed = config.changed_sections(self._applied)
+        if not changed and not interactive:
+            self.logger.debug("keyd config saved without binding changes")
+            return
+
+        self.logger.info("Reloading keyd config (changed: %s)", ", ".join(changed) or "nothing")
+        self._busy = True
+        get_process_runner().run(
+            KEYD_RELOAD_CMD,
+            on_finished=lambda result: self._on_reload_finished(result, config, changed, interactive),
+            timeout=KEYD_RELOAD_TIMEOUT_S,
+        )
+
+    def _on_reload_finished(self, result, config, changed, interactive, elevated=False):
+        if result is not None and result.ok:
+            self._applied = config
+            self.logger.info("keyd reloaded in %.0f ms", result.duration_ms)
+            self.reloaded.emit(f"keyd config reloaded ({', '.join(changed)})" if changed else "keyd config reloaded")
+            self._finish()
+            return
+
+        detail = self._describe(result)
+        if interactive and not elevated and result is not None and result.error != "not_found":
+            # Usually no access to the keyd socket; reloading as root still keeps devices up
+            self.logger.info("keyd reload failed (%s), retrying through pkexec", detail)
+            get_process_runner().run(
+                ["pkexec"] + KEYD_RELOAD_CMD,
+                on_finished=lambda r: self._on_reload_finished(r, config, changed, interactive, elevated=True),
+                timeout=PKEXEC_RELOAD_TIMEOUT_S,
+            )
+            return
+
+        self.logger.error("keyd reload failed: %s", detail)
+        if interactive:
+            self.failed.emit(f"Failed to reload keyd: {detail}")
+        else:
+            self.failed.emit("keyd config changed; use Reload Config to apply it")
+        self._finish()
+
+    def _finish(self):
+        self._busy = False
+        if self._pending is not None:
+            interactive, self._pending = self._pending, None
+            self.reload(interactive)
+
+    @staticmethod
+    def _describe(result):
+        if result is None:
+            return "unexpected error"
+        if result.error == "not_found":
+            return "keyd not found (keyd 2.4 or newer is needed)"
+        if result.error:
+            return result.error
+        return result.stderr.strip() or f"exit status {result.returncode}"
+
+    def _watch_file(self):
+        if os.path.exists(self.path) and self.path not in self._watcher.files():
+            self._watcher.addPath(self.path)
+
+    @pyqtSlot(str)
+    def _schedule_reload(self, _path):
+        self._reload_timer.start(RELOAD_DEBOUNCE_MS)
+
+    @pyqtSlot()
+    def _on_file_changed(self):
+        self._watch_file()
+        # The store compares inode, size and mtime, so unrelated directory changes cost one stat
+        self.reload(interactive=False)
+
+
+_keyd_manager_instance = None
+
+def get_keyd_manager():
+    global _keyd_manager_instance
+    if _keyd_manager_instance is None:
+        _keyd_manager_instance = KeydManager()
+    return _keyd_manager_instance
@@ -0,0 +1,170 @@
+import os
+import shutil
+import subprocess
+import threading
+from PyQt6.QtCore import QObject, QSocketNotifier, pyqtSignal, pyqtSlot
+from .focus import get_focus_tracker
+from .logger import get_logger
+from .process_runner import ProcessResult, error_result, get_process_runner
+
+
+class ExecutableCache:
+    """`shutil.which()` results, kept until PATH or one of its directories changes.
+
+    Installing or removing a program updates its directory's mtime, so one
+    stat per PATH entry tells whether the cached answers still hold.
+    """
+
+    def __init__(self):
+        self._path = None
+        self._signature = None
+        self._resolved = {}
+
+    def which(self, name):
+        path = os.environ.get("PATH", os.defpath)
+        signature = self._signature_of(path)
+        if path != self._path or signature != self._signature:
+            self._path = path
+            self._signature = signature
+            self._resolved.clear()
+        if name not in self._resolved:
+            self._resolved[name] = shutil.which(name, path=path)
+        return self._resolved[name]
+
+    @staticmethod
+    def _signature_of(path):
+        signature = []
+        for directory in path.split(os.pathsep):
+            try:
+                signature.append(os.stat(directory or os.curdir).st_mtime_ns)
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+
+
+class Child:
+    """A program started by the launcher and the notifier that reaps it."""
+
+    def __init__(self, proc, key):
+        self.proc = proc
+        self.key = key
+        self.pidfd = None
+        self.notifier = None
+
+
+class Launcher(QObject):
+    """Starts desktop programs, reaps them when they exit and avoids duplicates.
+
+    A program launched under a `key` (e.g. "task-manager") is started once;
+    while it runs, launching the same key raises its window instead. Exits
+    are noticed through a pidfd on the event loop, so finished programs are
+    reaped right away without polling.
+    """
+
+    _exited = pyqtSignal(int)
+
+    def __init__(self):
+        super().__init__()
+        self.logger = get_logger()
+        self._exited.connect(self._reap)
+        self.executables = ExecutableCache()
+        self._children = {}  # pid -> Child
+        self._starting = set()  # keys whose program is being started in the pool
+
+    def which(self, name):
+        return self.executables.which(name)
+
+    def running(self, key):
+        """Return the running Child launched under `key`, or None."""
+        for child in self._children.values():
+            if child.key == key and child.proc.poll() is None:
+                return child
+        return None
+
+    def launch(self, cmd, key=None, on_finished=None):
+        """Start `cmd`, or raise the program already running under `key`.
+
+        `on_finished(ProcessResult)` reports whether it could be started.
+        """
+        if key is not None:
+            if key in self._starting:
+                self.logger.debug("%s is still starting, ignoring", key)
+                return
+            child = self.running(key)
+            if child is not None:
+                self.logger.info("%s already running (pid %d), activating it", key, child.proc.pid)
+                get_process_runner().submit(
+                    lambda: get_focus_tracker().activate_window(child.proc.pid),
+                    lambda ok: ok or self.logger.info("Could not raise the %s window", key),
+                )
+                return
+
+        path = self.which(cmd[0]) if cmd else None
+        if path is None:
+            self.logger.error("Command not found: %s", cmd[0] if cmd else "empty command")
+            if on_finished is not None:
+                on_finished(ProcessResult(cmd, error="not_found"))
+            return
+
+        if key is not None:
+            self._starting.add(key)
+
+        def started(outcome):
+            self._starting.discard(key)
+            result, proc = outcome if outcome is not None else (ProcessResult(cmd, error="failed"), None)
+            if proc is not None:
+                self._track(proc, key)
+            if on_finished is not None:
+                on_finished(result)
+
+        # Forking a large Qt process takes a few milliseconds; keep it off the GUI thread
+        get_process_runner().submit(lambda: self._start(cmd, [path] + list(cmd[1:])), started)
+
+    def child_count(self):
+        return len(self._children)
+
+    def _start(self, cmd, argv):
+        self.logger.debug("Starting program: %s", cmd)
+        try:
+            proc = subprocess.Popen(argv, stdin=subprocess.DEVNULL, start_new_session=True)
+        except OSError as e:
+            return error_result(cmd, e), None
+        return ProcessResult(cmd, returncode=0), proc
+
+    def _track(self, proc, key):
+        child = Child(proc, key)
+        self._children[proc.pid] = child
+        try:
+            child.pidfd = os.pidfd_open(proc.pid)
+        except (AttributeError, OSError):
+            # No pidfd support (Linux < 5.3): wait in a thread instead
+            threading.Thread(target=self._wait_in_thread, args=(child,), daemon=True).start()
+            return
+        child.notifier = QSocketNotifier(child.pidfd, QSocketNotifier.Type.Read, self)
+        child.notifier.activated.connect(lambda _fd, pid=proc.pid: self._reap(pid))
+
+    def _wait_in_thread(self, child):
+        child.proc.wait()
+        self._exited.emit(child.proc.pid)
+
+    @pyqtSlot(int)
+    def _reap(self, pid):
+        child = self._children.get(pid)
+        if child is None or child.proc.poll() is None:
+            return
+        del self._children[pid]
+        if child.notifier is not None:
+            child.notifier.setEnabled(False)
+            child.notifier.deleteLater()
+        if child.pidfd is not None:
+            os.close(child.pidfd)
+        self.logger.debug("%s (pid %d) exited with %s", child.proc.args[0], pid, child.proc.returncode)
+
+
+_launcher_instance = None
+
+def get_launcher():
+    global _launcher_instance
+    if _launcher_instance is None:
+        _launcher_instance = Launcher()
+    return _launcher_instance
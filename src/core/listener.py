@@ -1,9 +1,26 @@
-from PyQt6.QtCore import QObject, pyqtSlot
-from PyQt6.QtDBus import QDBusConnection
+import json
+from PyQt6.QtCore import QMetaType, QObject, QCoreApplication, QTimer, pyqtSlot
+from PyQt6.QtDBus import QDBusArgument, QDBusConnection, QDBusMessage
 from .actions import Actions
+from .clipboard import get_clipboard, get_clipboard_watcher
+from .focus import get_focus_tracker
 from .logger import get_logger
-from features.text_engine import TextEngine
-from ui.overlay import get_osd
+from .metrics import get_metrics
+from .process_runner import ProcessRunner, get_process_runner
+from features.calibration import get_delay_calibrator
+from features.expander import get_text_expander
+from features.history import get_clipboard_history
+from features.text_engine import TransformScheduler, get_text_engine
+from features.transforms import CHAIN_SEPARATOR, UnknownModeError, apply_chain, parse_chain
+from ui.overlay import get_osd, prewarm_osd
+
+# Error names of TransformText/TransformTexts replies
+INVALID_ARGS_ERROR = "org.freedesktop.DBus.Error.InvalidArgs"
+FAILED_ERROR = "org.freedesktop.DBus.Error.Failed"
+
+# TransformText/TransformTexts run on their own pool so large calls never hold up
+# launches or keyd reloads; transforms are CPU-bound, more threads would not help
+TRANSFORM_API_WORKERS = 2
 
 class KapsulateServiceError(Exception):
     """Raised when the Kapsulate DBus service fails to initialize."""
@@ -32,6 +49,29 @@ class KapsulateService(QObject):
         
         self.logger.info("DBus service 'org.kapsulate.service' registered.")
 
+        # Start the resident transformation worker so its virtual keyboard is
+        # warmed up before the first trigger arrives
+        self.text_engine = get_text_engine()
+        self.text_engine.start()
+        # Keystroke and clipboard timings are calibrated per focused application
+        self.focus = get_focus_tracker()
+        self.focus.start()
+        app = QCoreApplication.instance()
+        if app is not None:
+            app.aboutToQuit.connect(self.text_engine.shutdown)
+            app.aboutToQuit.connect(self.focus.stop)
+        self.scheduler = TransformScheduler(self.text_engine, self._on_transform_finished)
+        self._transform_runner = ProcessRunner(max_workers=TRANSFORM_API_WORKERS)
+        self.text_expander = get_text_expander()
+        self.text_expander.start()
+
+        # Record every clipboard offer the watcher mirrors
+        self.history = get_clipboard_history()
+        get_clipboard_watcher().add_listener(self.history.add)
+
+        # Build the OSD once the event loop runs, before the first trigger needs it
+        QTimer.singleShot(0, prewarm_osd)
+
     @pyqtSlot()
     def TriggerTaskManager(self):
         self.logger.info("Triggering Task Manager")
@@ -45,30 +85,131 @@ class KapsulateService(QObject):
     @pyqtSlot()
     def TriggerPassword(self):
         self.logger.info("Triggering Password generation")
-        pwd = Actions.open_password_gen()
-        if pwd:
-            get_osd().show_message("Password copied!")
-        else:
-            get_osd().show_message("Failed to generate password")
+        Actions.open_password_gen(self._on_password_copied)
 
     @pyqtSlot()
     def TriggerExpand(self):
         self.logger.info("Triggering Text Expansion snippet")
-        get_osd().show_message("Expanding...")
-        # TODO: Implement full expansion logic later
+        self.text_expander.expand()
         
     @pyqtSlot(str)
     def TriggerTransform(self, mode):
-        self.logger.info(f"Triggering Text Transformation: {mode}")
-        
-        def on_finished(res):
-            if res:
-                self.logger.debug(f"Transformation to {mode} successful")
-                get_osd().show_message(f"Converted to {mode}")
+        """Queue a transform; `mode` may be a chain such as "lower|camel"."""
+        self.logger.info("Triggering Text Transformation: %s", mode)
+        try:
+            self.scheduler.request(mode)
+        except UnknownModeError as e:
+            self.logger.warning("%s", e)
+            get_osd().show_message("Unknown transform mode")
+
+    @pyqtSlot(str, str, QDBusMessage, result=str)
+    def TransformText(self, text, mode, message):
+        """Return `text` transformed by `mode`, without touching the clipboard.
+
+        The work runs in the background and the reply is sent when it is
+        done, so a caller can pipeline many calls over one connection.
+        """
+        self._reply_later(message, mode, lambda: apply_chain(text, mode), "api.transform_text")
+        return ""
+
+    @pyqtSlot("QStringList", str, QDBusMessage, result="QStringList")
+    def TransformTexts(self, texts, mode, message):
+        """Batched TransformText: return every string of `texts` transformed by `mode`."""
+        def work():
+            arg = QDBusArgument()
+            arg.add([apply_chain(text, mode) for text in texts], QMetaType.Type.QStringList.value)
+            return arg
+        self._reply_later(message, mode, work, "api.transform_texts")
+        return []
+
+    @pyqtSlot()
+    def UndoTransform(self):
+        """Put back the text the last transformation replaced (again to redo)."""
+        self.logger.info("Undoing the last Text Transformation")
+        self.text_engine.replace_last("undo", self._on_replace_finished)
+
+    @pyqtSlot()
+    def CycleTransform(self):
+        """Replace the last transformation's result with the next cycle mode."""
+        self.logger.info("Cycling the last Text Transformation")
+        self.text_engine.replace_last("cycle", self._on_replace_finished)
+
+    @pyqtSlot()
+    def CancelTransform(self):
+        self.logger.info("Cancelling Text Transformation")
+        self.text_engine.cancel()
+
+    @pyqtSlot(result=str)
+    def GetStats(self):
+        """Return timing histograms and queue statistics as JSON."""
+        stats = get_metrics().snapshot()
+        stats["queue"] = self.text_engine.stats()
+        stats["apps"] = get_delay_calibrator().snapshot()
+        return json.dumps(stats)
+
+    @pyqtSlot(str)
+    def SetActiveWindow(self, app):
+        """Called by the KWin focus script with the resource class of the active window."""
+        self.focus.set_active(app)
+
+    @pyqtSlot(str, result=str)
+    def SearchHistory(self, query):
+        """Return clipboard history entries containing `query` (newest first) as JSON."""
+        return json.dumps(self.history.search(query))
+
+    @pyqtSlot(str, result=bool)
+    def RestoreHistory(self, entry_id):
+        """Put a clipboard history entry back on the clipboard."""
+        text = self.history.get(entry_id) if entry_id else None
+        if text is None:
+            self.logger.warning("No clipboard history entry %s", entry_id)
+            return False
+        get_process_runner().submit(lambda: get_clipboard().set_text(text))
+        get_osd().show_message("Restored from history")
+        return True
+
+    def _reply_later(self, message, mode, work, span):
+        """Answer `message` with the result of `work()`, run on the transform API's own pool."""
+        message.setDelayedReply(True)
+        bus = QDBusConnection.sessionBus()
+        try:
+            parse_chain(mode)
+        except UnknownModeError as e:
+            bus.send(message.createErrorReply(INVALID_ARGS_ERROR, str(e)))
+            return
+        metrics = get_metrics()
+
+        def run():
+            with metrics.span(span):
+                return work()
+
+        def done(result):
+            if result is None:
+                bus.send(message.createErrorReply(FAILED_ERROR, "Transformation failed"))
             else:
-                self.logger.warning(f"Transformation to {mode} failed or no change")
-                get_osd().show_message("Transformation Failed")
+                bus.send(message.createReply([result]))
+
+        self._transform_runner.submit(run, done)
 
-        TextEngine.process_selection(mode, on_finished)
+    def _on_password_copied(self, pwd):
+        if pwd:
+            get_osd().show_message("Password copied!")
+        else:
+            get_osd().show_message("Failed to generate password")
 
+    def _on_replace_finished(self, res):
+        if res is None:
+            get_osd().show_message("Transformation Failed")
+        elif res:
+            get_osd().show_message(f"Converted to {res.replace(CHAIN_SEPARATOR, ' → ')}")
+        else:
+            get_osd().show_message("Restored original")
 
+    def _on_transform_finished(self, chain, res):
+        label = chain.replace(CHAIN_SEPARATOR, " → ")
+        if res:
+            self.logger.debug("Transformation to %s successful", chain)
+            get_osd().show_message(f"Converted to {label}")
+        else:
+            self.logger.warning("Transformation to %s failed or no change", chain)
+            get_osd().show_message("Transformation Failed")
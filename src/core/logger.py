@@ -1,35 +1,99 @@
+import atexit
+import collections
 import logging
+import logging.handlers
 import os
+import queue
 import sys
 
+# kapsulate.log is rotated at this size, keeping this many old files
+LOG_MAX_BYTES = 1024 * 1024
+LOG_BACKUP_COUNT = 3
+
+# Recent DEBUG records kept in memory; they are written out when an error is logged
+DEBUG_RING_SIZE = 500
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+_listener = None
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """Hands records to the writer thread as they are.
+
+    The stock QueueHandler merges the message with its arguments in the
+    calling thread; here that is left to the writer, so a log call costs
+    the caller little more than a queue put.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+class DebugRingHandler(logging.Handler):
+    """Passes INFO and above to `target` and keeps DEBUG records in a ring.
+
+    An ERROR first writes out the ring, so the log has the full context of
+    a failure without paying for every DEBUG line on every trigger.
+    """
+
+    def __init__(self, target, capacity=DEBUG_RING_SIZE, flush_level=logging.ERROR):
+        super().__init__(logging.DEBUG)
+        self.target = target
+        self.flush_level = flush_level
+        self._ring = collections.deque(maxlen=capacity)
+
+    def emit(self, record):
+        if record.levelno < logging.INFO:
+            self._ring.append(record)
+            return
+        if record.levelno >= self.flush_level:
+            while self._ring:
+                self.target.handle(self._ring.popleft())
+        self.target.handle(record)
+
+    def close(self):
+        self.target.close()
+        super().close()
+
+
 def setup_logging(base_dir):
+    """Route the "kapsulate" logger through a queue to a background writer thread."""
+    global _listener
+    logger = logging.getLogger("kapsulate")
+    logger.setLevel(logging.DEBUG)
+    if _listener is not None:
+        return logger
+
     # Use XDG user data directory for logs (writable by regular users)
     xdg_data_home = os.environ.get('XDG_DATA_HOME', os.path.expanduser('~/.local/share'))
     log_dir = os.path.join(xdg_data_home, 'kapsulate', 'logs')
     os.makedirs(log_dir, exist_ok=True)
     log_file = os.path.join(log_dir, "kapsulate.log")
 
-    logger = logging.getLogger("kapsulate")
-    logger.setLevel(logging.DEBUG)
+    formatter = logging.Formatter(LOG_FORMAT)
 
     # Console handler
     c_handler = logging.StreamHandler(sys.stdout)
     c_handler.setLevel(logging.INFO)
+    c_handler.setFormatter(formatter)
 
-    # File handler
-    f_handler = logging.FileHandler(log_file)
+    # File handler, rotated by size; DEBUG records reach it only through the ring
+    f_handler = logging.handlers.RotatingFileHandler(
+        log_file, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8"
+    )
     f_handler.setLevel(logging.DEBUG)
+    f_handler.setFormatter(formatter)
 
-    # Create formatters and add it to handlers
-    format_str = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    c_format = logging.Formatter(format_str)
-    f_format = logging.Formatter(format_str)
-    c_handler.setFormatter(c_format)
-    f_handler.setFormatter(f_format)
-
-    # Add handlers to the logger
-    logger.addHandler(c_handler)
-    logger.addHandler(f_handler)
+    # Call sites only enqueue; formatting and disk writes happen on the listener thread
+    log_queue = queue.SimpleQueue()
+    logger.addHandler(DeferredQueueHandler(log_queue))
+    _listener = logging.handlers.QueueListener(
+        log_queue, c_handler, DebugRingHandler(f_handler), respect_handler_level=True
+    )
+    _listener.start()
+    # Drain the queue before the interpreter exits
+    atexit.register(_listener.stop)
 
     return logger
 
@@ -0,0 +1,95 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Number of most recent samples kept per span for percentiles
+ROLLING_WINDOW = 512
+
+
+class Histogram:
+    """Rolling window of durations (milliseconds) with running totals."""
+
+    def __init__(self, window=ROLLING_WINDOW):
+        self._samples = deque(maxlen=window)
+        self.count = 0
+        self.errors = 0
+
+    def record(self, ms):
+        self._samples.append(ms)
+        self.count += 1
+
+    def record_error(self):
+        self.errors += 1
+
+    def summary(self):
+        total = self.count + self.errors
+        result = {
+            "count": self.count,
+            "errors": self.errors,
+            "error_rate": round(self.errors / total, 4) if total else 0.0,
+        }
+        if self._samples:
+            s = sorted(self._samples)
+            result.update({
+                "p50": round(_rank(s, 50), 3),
+                "p95": round(_rank(s, 95), 3),
+                "p99": round(_rank(s, 99), 3),
+                "max": round(s[-1], 3),
+                "mean": round(sum(s) / len(s), 3),
+            })
+        return result
+
+
+def _rank(sorted_samples, pct):
+    """Nearest-rank percentile."""
+    index = int(round(pct / 100 * len(sorted_samples))) - 1
+    return sorted_samples[min(len(sorted_samples) - 1, max(0, index))]
+
+
+class Metrics:
+    """In-memory timing spans, keyed by name (e.g. "transform.clipboard_read")."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._started = time.time()
+
+    @contextmanager
+    def span(self, name):
+        """Time the enclosed block; exceptions count as errors for `name`."""
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.record_error(name)
+            raise
+        self.record(name, (time.perf_counter() - start) * 1000)
+
+    def record(self, name, ms):
+        with self._lock:
+            self._histogram(name).record(ms)
+
+    def record_error(self, name):
+        with self._lock:
+            self._histogram(name).record_error()
+
+    def snapshot(self):
+        with self._lock:
+            spans = {name: h.summary() for name, h in sorted(self._histograms.items())}
+        return {"uptime_s": round(time.time() - self._started, 1), "spans": spans}
+
+    def _histogram(self, name):
+        h = self._histograms.get(name)
+        if h is None:
+            h = self._histograms[name] = Histogram()
+        return h
+
+
+_metrics_instance = None
+
+def get_metrics():
+    global _metrics_instance
+    if _metrics_instance is None:
+        _metrics_instance = Metrics()
+    return _metrics_instance
@@ -0,0 +1,118 @@
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from PyQt6.QtCore import QObject, QCoreApplication, pyqtSignal, pyqtSlot
+from .logger import get_logger
+
+# External commands running at the same time; further requests wait their turn
+MAX_CONCURRENT_PROCESSES = 4
+
+# Default timeout for commands that are waited for (seconds)
+DEFAULT_TIMEOUT_S = 30
+
+
+class ProcessResult:
+    """Outcome of a command run by ProcessRunner."""
+
+    def __init__(self, cmd, returncode=None, stdout="", stderr="", error=None, duration_ms=0.0):
+        self.cmd = cmd
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+        # "timeout", "not_found", "permission" or an OS error message
+        self.error = error
+        self.duration_ms = duration_ms
+
+    @property
+    def ok(self):
+        return self.error is None and self.returncode == 0
+
+
+def error_result(cmd, e):
+    """Log why `cmd` could not be started and return the matching ProcessResult."""
+    logger = get_logger()
+    if isinstance(e, FileNotFoundError):
+        logger.error("Command not found: %s", cmd[0] if cmd else "empty command")
+        return ProcessResult(cmd, error="not_found")
+    if isinstance(e, PermissionError):
+        logger.error("Permission denied executing command: %s", cmd)
+        return ProcessResult(cmd, error="permission")
+    logger.error("OS error running command %s: %s", cmd, e)
+    return ProcessResult(cmd, error=str(e))
+
+
+class ProcessRunner(QObject):
+    """Runs external commands and other blocking calls off the Qt main thread.
+
+    Work is handed to a small thread pool so the event loop keeps serving
+    DBus triggers and the OSD while e.g. a pkexec dialog is open. Completion
+    callbacks are always invoked on the main thread.
+    """
+
+    _completed = pyqtSignal(object, object)
+
+    def __init__(self, max_workers=MAX_CONCURRENT_PROCESSES):
+        super().__init__()
+        self.logger = get_logger()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="process-runner")
+        self._completed.connect(self._on_completed)
+        app = QCoreApplication.instance()
+        if app is not None:
+            app.aboutToQuit.connect(self.shutdown)
+
+    def run(self, cmd, on_finished=None, timeout=DEFAULT_TIMEOUT_S, input=None):
+        """Run `cmd` to completion in the background.
+
+        `on_finished(ProcessResult)` is called on the main thread; a command
+        still running after `timeout` seconds is killed.
+        """
+        return self.submit(lambda: self._run(cmd, timeout, input), on_finished)
+
+    def submit(self, func, on_finished=None):
+        """Call `func()` in the pool and pass its return value to `on_finished` on the main thread."""
+        future = self._executor.submit(func)
+        if on_finished is not None:
+            future.add_done_callback(lambda f: self._completed.emit(on_finished, f))
+        return future
+
+    def shutdown(self):
+        # Queued work is dropped; running commands finish (or time out) on their own
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, cmd, timeout, input):
+        self.logger.debug("Running command: %s", cmd)
+        start = time.monotonic()
+        try:
+            proc = subprocess.run(cmd, input=input, capture_output=True, text=True, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            self.logger.error("Command timed out after %s s: %s", timeout, cmd)
+            return ProcessResult(cmd, error="timeout", duration_ms=(time.monotonic() - start) * 1000)
+        except OSError as e:
+            return error_result(cmd, e)
+        result = ProcessResult(cmd, proc.returncode, proc.stdout, proc.stderr,
+                               duration_ms=(time.monotonic() - start) * 1000)
+        self.logger.debug("Command %s exited with %s after %.0f ms", cmd[0], proc.returncode, result.duration_ms)
+        return result
+
+    @pyqtSlot(object, object)
+    def _on_completed(self, on_finished, future):
+        if future.cancelled():
+            return
+        ex = future.exception()
+        if ex is not None:
+            self.logger.error("Background task failed: %s", ex)
+            on_finished(None)
+            return
+        try:
+            on_finished(future.result())
+        except Exception as ex:
+            self.logger.exception("Error in completion callback: %s", ex)
+
+
+_runner_instance = None
+
+def get_process_runner():
+    global _runner_instance
+    if _runner_instance is None:
+        _runner_instance = ProcessRunner()
+    return _runner_instance
@@ -0,0 +1,85 @@
+import configparser
+import os
+from .logger import get_logger
+
+# Built-in defaults; users override them in ~/.config/kapsulate/settings.ini
+DEFAULTS = {
+    "transform": {
+        # Selections larger than this are refused
+        "max_selection_mb": "256",
+        # Selections larger than this are transformed in chunks
+        "stream_threshold_mb": "1",
+        # Take the selection from the primary selection instead of pressing Ctrl+C
+        "use_primary": "true",
+        # Older primary selections are ignored; the text may no longer be selected
+        "primary_max_age_s": "10",
+        # Modes the cycle action steps through, in order
+        "cycle_modes": "upper lower title camel snake",
+        # How results replace the selection: "paste" (clipboard and Ctrl+V), "type"
+        # (keystrokes, when every character can be typed) or "auto" (type short results)
+        "output": "auto",
+        # Longest result typed in auto mode
+        "type_max_chars": "64",
+        # Put back what was on the clipboard before a transformation once the result is pasted
+        "restore_clipboard": "true",
+    },
+    "expand": {
+        # Snippet file; empty means ~/.config/kapsulate/snippets.txt
+        "snippets_file": "",
+    },
+    "history": {
+        # Number of entries and total size kept
+        "capacity": "1000",
+        "max_mb": "64",
+        # Keep the history across restarts (~/.local/share/kapsulate/clipboard-history.log)
+        "persist": "false",
+    },
+}
+
+
+def get_config_dir():
+    xdg_config_home = os.environ.get('XDG_CONFIG_HOME', os.path.expanduser('~/.config'))
+    return os.path.join(xdg_config_home, 'kapsulate')
+
+
+class Settings:
+    """Kapsulate's own settings (the keyd mapping lives in kapsulate.conf)."""
+
+    def __init__(self, path=None):
+        self.logger = get_logger()
+        self.path = path or os.path.join(get_config_dir(), "settings.ini")
+        self._parser = configparser.ConfigParser()
+        self._parser.read_dict(DEFAULTS)
+        try:
+            self._parser.read(self.path)
+        except configparser.Error as e:
+            self.logger.error("Invalid settings file %s: %s", self.path, e)
+
+    def get(self, section, key):
+        return self._parser.get(section, key)
+
+    def getint(self, section, key):
+        return self._typed(self._parser.getint, int, section, key)
+
+    def getfloat(self, section, key):
+        return self._typed(self._parser.getfloat, float, section, key)
+
+    def getboolean(self, section, key):
+        return self._typed(self._parser.getboolean, lambda v: v == "true", section, key)
+
+    def _typed(self, getter, convert, section, key):
+        try:
+            return getter(section, key)
+        except ValueError:
+            default = DEFAULTS[section][key]
+            self.logger.warning("Invalid value for [%s] %s, using default %s", section, key, default)
+            return convert(default)
+
+
+_settings_instance = None
+
+def get_settings():
+    global _settings_instance
+    if _settings_instance is None:
+        _settings_instance = Settings()
+    return _settings_instance
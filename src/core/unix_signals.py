@@ -0,0 +1,40 @@
+import signal
+import socket
+from PyQt6.QtCore import QObject, QSocketNotifier, pyqtSignal, pyqtSlot
+from .logger import get_logger
+
+
+class UnixSignalNotifier(QObject):
+    """Delivers Unix signals (e.g. Ctrl+C) to the Qt event loop.
+
+    Python only runs signal handlers when the interpreter gets control,
+    which never happens while Qt sleeps in its event loop. Instead of a
+    timer waking the loop periodically, the signal number is written to a
+    socket pair (signal.set_wakeup_fd) that a QSocketNotifier watches.
+    """
+
+    received = pyqtSignal(int)
+
+    def __init__(self, signals=(signal.SIGINT, signal.SIGTERM)):
+        super().__init__()
+        self.logger = get_logger()
+        self._read_sock, self._write_sock = socket.socketpair()
+        self._read_sock.setblocking(False)
+        self._write_sock.setblocking(False)
+        signal.set_wakeup_fd(self._write_sock.fileno(), warn_on_full_buffer=False)
+        for sig in signals:
+            # The handler itself has nothing to do; the wakeup fd carries the signal
+            signal.signal(sig, lambda *_: None)
+
+        self._notifier = QSocketNotifier(self._read_sock.fileno(), QSocketNotifier.Type.Read, self)
+        self._notifier.activated.connect(self._on_activated)
+
+    @pyqtSlot()
+    def _on_activated(self):
+        try:
+            data = self._read_sock.recv(64)
+        except BlockingIOError:
+            return
+        for signum in data:
+            self.logger.info("Received %s", signal.Signals(signum).name)
+            self.received.emit(signum)
@@ -0,0 +1,194 @@
+"""
+Offline batch transformation of files and streams.
+
+`cli.py transform` applies the same mode chains as the interactive path
+(features/transforms.py) to files and standard input, without the service
+or Qt. Standard input is streamed through StreamTransformer in constant
+memory. Files are cut into pieces after a newline and spread over a
+process pool; pieces are written out in input order, so the output does
+not depend on the number of workers.
+
+This module only uses the standard library.
+"""
+import collections
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from features.transforms import StreamTransformer, apply_chain, get_mode, parse_chain
+
+MB = 1024 * 1024
+
+# Files are read as UTF-8; undecodable bytes are carried through unchanged
+ENCODING = "utf-8"
+ENCODING_ERRORS = "surrogateescape"
+
+# Streams are read and transformed in chunks of this many characters
+STREAM_CHUNK_CHARS = 1 * MB
+# Files are cut into pieces of about this size for the process pool
+PIECE_BYTES = 4 * MB
+# Inputs smaller than this in total are transformed without starting a pool
+MIN_POOL_BYTES = 8 * MB
+# Pieces in flight per worker; bounds memory while keeping every worker busy
+PIECES_PER_WORKER = 2
+# Read size when looking for the newline that ends a piece
+SCAN_BYTES = 64 * 1024
+
+
+def open_text(path, mode="r"):
+    """Open `path` as text the way the batch transform reads and writes it."""
+    # newline="" keeps CRLF endings as they are; the modes handle "\r" themselves
+    return open(path, mode, encoding=ENCODING, errors=ENCODING_ERRORS, newline="")
+
+
+def iter_transformed(chain, src, chunk_chars=STREAM_CHUNK_CHARS):
+    """Yield `chain` applied to text stream `src`, reading it chunk by chunk."""
+    stream = StreamTransformer(chain)
+    while True:
+        chunk = src.read(chunk_chars)
+        if not chunk:
+            break
+        out = stream.feed(chunk)
+        if out:
+            yield out
+    tail = stream.flush()
+    if tail:
+        yield tail
+
+
+def transform_stream(chain, src, dst, chunk_chars=STREAM_CHUNK_CHARS):
+    """Apply `chain` to text stream `src` and write the result to `dst` in constant memory."""
+    for out in iter_transformed(chain, src, chunk_chars):
+        dst.write(out)
+
+
+def line_splittable(chain):
+    """Return True if input cut after a newline transforms the same as in one piece.
+
+    Every mode keeps newlines where they are, so a newline that is a
+    boundary of each step stays a boundary through the whole chain. A
+    boundary promises the mode looks at nothing before it: title case
+    judges shouting per line, the word modes per word. Sentence case is the
+    exception: a sentence may continue on the next line.
+    """
+    return all(get_mode(step).boundary.fullmatch("\n") for step in parse_chain(chain))
+
+
+def split_file(path, piece_bytes=PIECE_BYTES):
+    """Return (start, end) byte ranges covering `path`, each ending just after a newline."""
+    size = os.path.getsize(path)
+    ranges = []
+    start = 0
+    with open(path, "rb") as f:
+        while size - start > piece_bytes:
+            f.seek(start + piece_bytes)
+            end = size
+            while True:
+                block = f.read(SCAN_BYTES)
+                if not block:
+                    break
+                newline = block.find(b"\n")
+                if newline >= 0:
+                    # A newline byte never occurs inside a UTF-8 sequence
+                    end = f.tell() - len(block) + newline + 1
+                    break
+            ranges.append((start, end))
+            start = end
+    if start < size or not ranges:
+        ranges.append((start, size))
+    return ranges
+
+
+def transform_range(path, start, end, chain):
+    """Transform bytes `start`..`end` of `path` and return them encoded. Runs in the pool."""
+    with open(path, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+    return apply_chain(data.decode(ENCODING, ENCODING_ERRORS), chain).encode(ENCODING, ENCODING_ERRORS)
+
+
+def transform_file_in_place(path, chain):
+    """Rewrite `path` with `chain` applied, streaming through a temporary file. Runs in the pool."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".kapsulate-", dir=directory)
+    try:
+        with open(fd, "w", encoding=ENCODING, errors=ENCODING_ERRORS, newline="") as dst, \
+                open_text(path) as src:
+            transform_stream(chain, src, dst)
+        shutil.copymode(path, tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return path
+
+
+def _plan(paths, chain, piece_bytes):
+    """Yield (path, start, end) pieces in output order; start is None for a file to stream."""
+    splittable = line_splittable(chain)
+    for path in paths:
+        size = os.path.getsize(path)
+        if size <= piece_bytes:
+            yield path, 0, size
+        elif splittable:
+            for start, end in split_file(path, piece_bytes):
+                yield path, start, end
+        else:
+            # Cannot be cut safely; stream it in this process so memory stays bounded
+            yield path, None, None
+
+
+def _stream_file(path, chain, dst):
+    with open_text(path) as src:
+        for out in iter_transformed(chain, src):
+            dst.write(out.encode(ENCODING, ENCODING_ERRORS))
+
+
+def transform_files(paths, chain, dst, jobs=None, piece_bytes=PIECE_BYTES):
+    """Apply `chain` to `paths` and write the results to binary stream `dst` in input order.
+
+    With `jobs` other than 1 and enough input, pieces are transformed in a
+    process pool of `jobs` workers (default: one per CPU).
+    """
+    parse_chain(chain)
+    jobs = jobs or os.cpu_count() or 1
+    if jobs == 1 or sum(os.path.getsize(p) for p in paths) < MIN_POOL_BYTES:
+        for path, start, end in _plan(paths, chain, piece_bytes):
+            if start is None:
+                _stream_file(path, chain, dst)
+            else:
+                dst.write(transform_range(path, start, end, chain))
+        return
+
+    pieces = _plan(paths, chain, piece_bytes)
+    pending = collections.deque()
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        while True:
+            # Keep a bounded window of pieces in flight and write them in order
+            while len(pending) < jobs * PIECES_PER_WORKER:
+                piece = next(pieces, None)
+                if piece is None:
+                    break
+                path, start, end = piece
+                future = None if start is None else pool.submit(transform_range, path, start, end, chain)
+                pending.append((path, future))
+            if not pending:
+                break
+            path, future = pending.popleft()
+            if future is None:
+                _stream_file(path, chain, dst)
+            else:
+                dst.write(future.result())
+
+
+def transform_in_place(paths, chain, jobs=None):
+    """Rewrite every file in `paths` with `chain` applied, one file per pool task."""
+    parse_chain(chain)
+    jobs = jobs or os.cpu_count() or 1
+    if jobs == 1 or len(paths) == 1:
+        for path in paths:
+            transform_file_in_place(path, chain)
+        return
+    with ProcessPoolExecutor(max_workers=min(jobs, len(paths))) as pool:
+        for _ in pool.map(transform_file_in_place, paths, [chain] * len(paths)):
+            pass
@@ -0,0 +1,194 @@
+"""
+Per-application keystroke and clipboard timing.
+
+Applications answer a synthesized Ctrl+C at very different speeds: native
+Qt and GTK apps publish the selection within a few milliseconds, Electron
+apps and remote sessions can take hundreds, and some drop key presses that
+are released too quickly. Every copy is timed and folded into a running
+estimate per application, the same way TCP estimates its retransmission
+timeout: a smoothed mean plus four times the smoothed deviation.
+
+That bound is how long the worker waits before it presses Ctrl+C again with
+a longer key hold, and the fixed delay used when the clipboard cannot be
+watched. Copies that time out double the deviation and the key hold.
+
+Estimates are stored in ~/.local/state/kapsulate/timings.json.
+
+This module only uses the standard library.
+"""
+import json
+import os
+import threading
+import time
+from core.logger import get_logger
+
+# Smoothing gains for the mean and the deviation (RFC 6298)
+ALPHA = 1 / 8
+BETA = 1 / 4
+DEVIATION_FACTOR = 4
+# Added on top of the estimate; covers scheduling noise on a busy machine
+SAFETY_MARGIN_MS = 30
+
+# Estimates are only trusted after this many copies
+MIN_SAMPLES = 3
+# Bounds of the wait before pressing Ctrl+C again
+MIN_COPY_WAIT_MS = 60
+MAX_COPY_WAIT_MS = 1000
+
+# Key hold time: starts at the default, is lowered by one millisecond per
+# successful copy until a copy is missed, then doubled and kept
+DEFAULT_HOLD_MS = 15
+MIN_HOLD_MS = 5
+MAX_HOLD_MS = 60
+
+# Estimates are written at most this often (and on shutdown)
+SAVE_INTERVAL_S = 30
+
+UNKNOWN_APP = "unknown"
+
+
+class AppTiming:
+    __slots__ = ("mean_ms", "dev_ms", "samples", "timeouts", "hold_ms", "hold_settled")
+
+    def __init__(self, mean_ms=0.0, dev_ms=0.0, samples=0, timeouts=0,
+                 hold_ms=DEFAULT_HOLD_MS, hold_settled=False):
+        self.mean_ms = mean_ms
+        self.dev_ms = dev_ms
+        self.samples = samples
+        self.timeouts = timeouts
+        self.hold_ms = hold_ms
+        self.hold_settled = hold_settled
+
+    def copy_wait_ms(self):
+        bound = self.mean_ms + DEVIATION_FACTOR * self.dev_ms + SAFETY_MARGIN_MS
+        return min(MAX_COPY_WAIT_MS, max(MIN_COPY_WAIT_MS, bound))
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class DelayCalibrator:
+    """Running copy-latency estimates and key hold times per application."""
+
+    def __init__(self, path=None):
+        self.logger = get_logger()
+        self.path = path
+        self._lock = threading.Lock()
+        self._apps = {}
+        self._dirty = False
+        self._saved_at = time.monotonic()
+        if path:
+            self._load()
+
+    def key_hold_ms(self, app):
+        """How long synthesized keys stay pressed for `app`."""
+        with self._lock:
+            timing = self._apps.get(app or UNKNOWN_APP)
+            return timing.hold_ms if timing else DEFAULT_HOLD_MS
+
+    def copy_wait_ms(self, app, default):
+        """How long `app` may take to publish the clipboard after Ctrl+C, or `default` if unknown."""
+        with self._lock:
+            timing = self._apps.get(app or UNKNOWN_APP)
+            if timing is None or timing.samples < MIN_SAMPLES:
+                return default
+            return timing.copy_wait_ms()
+
+    def record_copy(self, app, waited_ms):
+        """Fold a measured Ctrl+C -> clipboard change delay into the estimate."""
+        with self._lock:
+            timing = self._timing(app)
+            if timing.samples == 0:
+                timing.mean_ms = waited_ms
+                timing.dev_ms = waited_ms / 2
+            else:
+                timing.dev_ms += BETA * (abs(waited_ms - timing.mean_ms) - timing.dev_ms)
+                timing.mean_ms += ALPHA * (waited_ms - timing.mean_ms)
+            timing.samples += 1
+            if not timing.hold_settled:
+                timing.hold_ms = max(MIN_HOLD_MS, timing.hold_ms - 1)
+            self._dirty = True
+
+    def record_timeout(self, app):
+        """Note that `app` did not publish the clipboard within the estimated time."""
+        with self._lock:
+            timing = self._timing(app)
+            timing.timeouts += 1
+            timing.dev_ms = max(timing.dev_ms * 2, MIN_COPY_WAIT_MS / DEVIATION_FACTOR)
+            timing.hold_ms = min(MAX_HOLD_MS, timing.hold_ms * 2)
+            timing.hold_settled = True
+            self._dirty = True
+
+    def snapshot(self):
+        """Return {app: {wait_ms, hold_ms, samples, timeouts}} for the stats output."""
+        with self._lock:
+            return {
+                app: {
+                    "wait_ms": round(t.copy_wait_ms(), 1),
+                    "mean_ms": round(t.mean_ms, 1),
+                    "hold_ms": t.hold_ms,
+                    "samples": t.samples,
+                    "timeouts": t.timeouts,
+                }
+                for app, t in self._apps.items()
+            }
+
+    def maybe_save(self):
+        """Write the estimates if they changed and the last write is old enough."""
+        if self._dirty and time.monotonic() - self._saved_at >= SAVE_INTERVAL_S:
+            self.save()
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {app: t.to_dict() for app, t in self._apps.items()}
+            self._dirty = False
+            self._saved_at = time.monotonic()
+        tmp_path = self.path + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(tmp_path, "w") as f:
+                json.dump(data, f, indent=1, sort_keys=True)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            self.logger.warning("Could not save timing estimates to %s: %s", self.path, e)
+
+    def _timing(self, app):
+        app = app or UNKNOWN_APP
+        timing = self._apps.get(app)
+        if timing is None:
+            timing = self._apps[app] = AppTiming()
+        return timing
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            self.logger.warning("Ignoring unreadable timing estimates %s: %s", self.path, e)
+            return
+        for app, values in data.items():
+            try:
+                self._apps[app] = AppTiming(**values)
+            except TypeError:
+                self.logger.debug("Ignoring timing estimate for %s: %r", app, values)
+        self.logger.debug("Loaded timing estimates for %s applications", len(self._apps))
+
+
+def get_timings_path():
+    xdg_state_home = os.environ.get('XDG_STATE_HOME', os.path.expanduser('~/.local/state'))
+    return os.path.join(xdg_state_home, 'kapsulate', 'timings.json')
+
+
+_calibrator_instance = None
+
+def get_delay_calibrator():
+    global _calibrator_instance
+    if _calibrator_instance is None:
+        _calibrator_instance = DelayCalibrator(get_timings_path())
+    return _calibrator_instance
@@ -0,0 +1,76 @@
+import os
+from PyQt6.QtCore import QObject, QFileSystemWatcher, QTimer, pyqtSlot
+from core.logger import get_logger
+from core.settings import get_config_dir, get_settings
+from features.snippets import SnippetStore
+from features.text_engine import get_text_engine
+from ui.overlay import get_osd
+
+# Editors often write a file in several steps; wait for them to finish before reloading
+RELOAD_DEBOUNCE_MS = 200
+
+
+def get_snippets_path():
+    path = get_settings().get("expand", "snippets_file")
+    return os.path.expanduser(path) if path else os.path.join(get_config_dir(), "snippets.txt")
+
+
+class TextExpander(QObject):
+    """Expands abbreviations from the snippet file and keeps its index up to date."""
+
+    def __init__(self, path=None):
+        super().__init__()
+        self.logger = get_logger()
+        self.store = SnippetStore(path or get_snippets_path())
+
+        # The directory is watched too: editors that save by renaming a new
+        # file over the old one drop the file watch
+        self._watcher = QFileSystemWatcher(self)
+        self._watcher.fileChanged.connect(self._schedule_reload)
+        self._watcher.directoryChanged.connect(self._schedule_reload)
+        self._reload_timer = QTimer(self)
+        self._reload_timer.setSingleShot(True)
+        self._reload_timer.timeout.connect(self._reload)
+
+    def start(self):
+        self.store.reload()
+        directory = os.path.dirname(self.store.path)
+        if os.path.isdir(directory):
+            self._watcher.addPath(directory)
+        self._watch_file()
+
+    def expand(self):
+        if not len(self.store):
+            get_osd().show_message("No snippets defined")
+            return
+        get_text_engine().expand_abbreviation(self.store.find, self._on_expanded)
+
+    def _on_expanded(self, abbr):
+        if abbr:
+            self.logger.debug("Expanded snippet '%s'", abbr)
+            get_osd().show_message(f"Expanded {abbr}")
+        else:
+            get_osd().show_message("No snippet found")
+
+    def _watch_file(self):
+        if os.path.exists(self.store.path) and self.store.path not in self._watcher.files():
+            self._watcher.addPath(self.store.path)
+
+    @pyqtSlot(str)
+    def _schedule_reload(self, _path):
+        self._reload_timer.start(RELOAD_DEBOUNCE_MS)
+
+    @pyqtSlot()
+    def _reload(self):
+        # reload() compares inode, size and mtime, so unrelated directory changes cost one stat
+        self.store.reload()
+        self._watch_file()
+
+
+_expander_instance = None
+
+def get_text_expander():
+    global _expander_instance
+    if _expander_instance is None:
+        _expander_instance = TextExpander()
+    return _expander_instance
@@ -0,0 +1,383 @@
+"""
+Clipboard history.
+
+Entries are kept in recency order and keyed by a content hash, so copying
+the same text again only moves it to the front. The history is bounded
+by an entry count and a byte budget; when over budget, the least recently
+used large entries go first.
+
+A trigram index over the start of every entry narrows substring searches
+down to a few candidates before any text is compared. Only that prefix is
+indexed, so a few multi-megabyte entries do not blow up the index; entries
+longer than it are always candidates and are checked against their full
+text.
+
+With persistence enabled, entries are appended to a log file that is
+memory-mapped on startup; entry data is then read from the map instead of
+being held in memory. The log is compacted once it is mostly dead records.
+
+This module only uses the standard library.
+"""
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+from core.logger import get_logger
+from core.settings import get_settings
+
+MB = 1024 * 1024
+
+# Entries at least this big are evicted first when over the byte budget
+LARGE_ENTRY_BYTES = 1 * MB
+# Only this much of each entry is indexed. Every distinct trigram costs a string
+# and a set entry, far more than the text it comes from, so this stays small
+INDEX_PREFIX_CHARS = 4 * 1024
+NGRAM = 3
+# Estimated memory per indexed trigram of an entry (string, set and dict overhead),
+# counted against the byte budget together with the text
+INDEX_BYTES_PER_NGRAM = 104
+SEARCH_LIMIT = 50
+
+# Log record: magic, type, timestamp, payload length, content hash
+RECORD = struct.Struct("<2sBdI16s")
+RECORD_MAGIC = b"KH"
+RECORD_ADD = 1
+RECORD_TOUCH = 2
+RECORD_DELETE = 3
+# Compact once the log is this many times bigger than the live entries (plus some slack)
+COMPACT_FACTOR = 2
+COMPACT_MIN_BYTES = 1 * MB
+
+
+class HistoryEntry:
+    __slots__ = ("key", "size", "timestamp", "data", "offset", "index_bytes")
+
+    def __init__(self, key, size, timestamp, data=None, offset=None):
+        self.key = key
+        self.size = size
+        self.index_bytes = 0
+        self.timestamp = timestamp
+        # Either the bytes themselves or their offset in the log file
+        self.data = data
+        self.offset = offset
+
+    @property
+    def id(self):
+        return self.key.hex()[:12]
+
+
+def _ngrams(text):
+    return {text[i:i + NGRAM] for i in range(len(text) - NGRAM + 1)}
+
+
+class ClipboardHistory:
+    """Deduplicating, size-bounded clipboard history with substring search."""
+
+    def __init__(self, capacity=1000, max_bytes=64 * MB, path=None):
+        self.logger = get_logger()
+        self.capacity = capacity
+        self.max_bytes = max_bytes
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> HistoryEntry, oldest first
+        self._bytes = 0
+        self._index_bytes = 0
+        self._ngrams = {}  # trigram -> set of keys
+        self._excluded = set()
+        self._log = None
+        self._map = None
+        self._log_size = 0
+        if path:
+            self._open_log()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def total_bytes(self):
+        return self._bytes
+
+    def exclude(self, data):
+        """Never record `data` (e.g. a generated password)."""
+        with self._lock:
+            self._excluded.add(hashlib.blake2b(data, digest_size=16).digest())
+
+    def add(self, data, timestamp=None):
+        """Record clipboard contents; returns the entry, or None if it was not recorded."""
+        if not data:
+            return None
+        try:
+            text = data.decode("utf-8")
+        except UnicodeDecodeError:
+            return None  # images and other binary offers are not kept
+        key = hashlib.blake2b(data, digest_size=16).digest()
+        timestamp = timestamp or time.time()
+        with self._lock:
+            if key in self._excluded:
+                return None
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.timestamp = timestamp
+                self._entries.move_to_end(key)
+                self._append_record(RECORD_TOUCH, key, timestamp)
+                return entry
+            if len(data) > self.max_bytes:
+                self.logger.debug("Not keeping %s byte clipboard entry in history (over budget)", len(data))
+                return None
+            entry = HistoryEntry(key, len(data), timestamp)
+            offset = self._append_record(RECORD_ADD, key, timestamp, data)
+            if offset is None:
+                entry.data = data
+            else:
+                entry.offset = offset
+            self._insert(entry, text)
+            self._evict(keep=key)
+            self._maybe_compact()
+            return entry
+
+    def get(self, entry_id):
+        """Return the text of the entry whose id starts with `entry_id`, or None."""
+        with self._lock:
+            for entry in reversed(self._entries.values()):
+                if entry.id.startswith(entry_id):
+                    return self._text(entry)
+        return None
+
+    def search(self, query="", limit=SEARCH_LIMIT):
+        """Return up to `limit` entries containing `query` (case-insensitive), newest first.
+
+        Each result is a dict with id, timestamp, size and a short preview.
+        """
+        needle = query.lower()
+        with self._lock:
+            candidates = None
+            if len(needle) >= NGRAM:
+                sets = [self._ngrams.get(g) for g in _ngrams(needle)]
+                # Entries past the indexed prefix may still match further on
+                candidates = set.intersection(*sorted(sets, key=len)) if all(sets) else set()
+            results = []
+            for entry in reversed(self._entries.values()):
+                indexed = entry.size <= INDEX_PREFIX_CHARS
+                if indexed and candidates is not None and entry.key not in candidates:
+                    continue
+                text = self._prefix(entry)
+                if needle and needle not in text.lower():
+                    if indexed or needle not in self._text(entry).lower():
+                        continue
+                results.append({
+                    "id": entry.id,
+                    "timestamp": entry.timestamp,
+                    "size": entry.size,
+                    "preview": " ".join(text[:120].split())[:80],
+                })
+                if len(results) >= limit:
+                    break
+            return results
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._entries):
+                self._append_record(RECORD_DELETE, key, time.time())
+            self._entries.clear()
+            self._ngrams.clear()
+            self._bytes = 0
+            self._index_bytes = 0
+            self._maybe_compact()
+
+    def close(self):
+        with self._lock:
+            self._close_log()
+
+    # --- Index ---------------------------------------------------------------
+
+    def _insert(self, entry, text):
+        self._entries[entry.key] = entry
+        self._bytes += entry.size
+        grams = _ngrams(text[:INDEX_PREFIX_CHARS].lower())
+        entry.index_bytes = len(grams) * INDEX_BYTES_PER_NGRAM
+        self._index_bytes += entry.index_bytes
+        for gram in grams:
+            keys = self._ngrams.get(gram)
+            if keys is None:
+                self._ngrams[gram] = {entry.key}
+            else:
+                keys.add(entry.key)
+
+    def _remove(self, entry):
+        text = self._prefix(entry)
+        del self._entries[entry.key]
+        self._bytes -= entry.size
+        self._index_bytes -= entry.index_bytes
+        for gram in _ngrams(text[:INDEX_PREFIX_CHARS].lower()):
+            keys = self._ngrams.get(gram)
+            if keys is not None:
+                keys.discard(entry.key)
+                if not keys:
+                    del self._ngrams[gram]
+
+    def _evict(self, keep=None):
+        while len(self._entries) > self.capacity:
+            self._drop(next(iter(self._entries.values())))
+        if self._used() > self.max_bytes:
+            # Large entries cost the most and are rarely pasted again; drop those first
+            large = [e for e in self._entries.values() if e.size >= LARGE_ENTRY_BYTES and e.key != keep]
+            for entry in large:
+                if self._used() <= self.max_bytes:
+                    break
+                self._drop(entry)
+        while self._used() > self.max_bytes:
+            self._drop(next(iter(self._entries.values())))
+
+    def _used(self):
+        # Entry text plus its share of the trigram index
+        return self._bytes + self._index_bytes
+
+    def _drop(self, entry):
+        self._remove(entry)
+        self._append_record(RECORD_DELETE, entry.key, time.time())
+
+    def _text(self, entry):
+        return self._raw(entry).decode("utf-8")
+
+    def _prefix(self, entry):
+        """Return the indexed start of the entry's text without decoding all of it."""
+        if entry.size <= INDEX_PREFIX_CHARS:
+            return self._text(entry)
+        # A UTF-8 character is at most 4 bytes; a cut character at the end is dropped
+        raw = self._raw_slice(entry, 4 * INDEX_PREFIX_CHARS)
+        return raw.decode("utf-8", errors="ignore")[:INDEX_PREFIX_CHARS]
+
+    def _raw(self, entry):
+        return self._raw_slice(entry, entry.size)
+
+    def _raw_slice(self, entry, length):
+        length = min(length, entry.size)
+        if entry.data is not None:
+            return entry.data[:length]
+        if self._map is None or entry.offset + entry.size > len(self._map):
+            self._remap()
+        return self._map[entry.offset:entry.offset + length]
+
+    # --- Log -----------------------------------------------------------------
+
+    def _open_log(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._log = open(self.path, "a+b")
+        self._log_size = os.fstat(self._log.fileno()).st_size
+        self._remap()
+        valid = self._replay()
+        if valid < self._log_size:
+            self.logger.warning("Discarding %s bytes of torn history log", self._log_size - valid)
+            self._log.truncate(valid)
+            self._log_size = valid
+            self._remap()
+        self._evict()
+        self._maybe_compact()
+        self.logger.info("Clipboard history loaded: %s entries, %.1f MB", len(self._entries), self._bytes / MB)
+
+    def _close_log(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+
+    def _remap(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._log_size:
+            self._map = mmap.mmap(self._log.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _replay(self):
+        """Rebuild the entries from the log; returns the length of its valid part."""
+        data = self._map
+        pos = 0
+        size = self._log_size
+        while pos + RECORD.size <= size:
+            magic, kind, timestamp, length, key = RECORD.unpack_from(data, pos)
+            if magic != RECORD_MAGIC or pos + RECORD.size + length > size:
+                break
+            payload_at = pos + RECORD.size
+            if kind == RECORD_ADD:
+                old = self._entries.get(key)
+                if old is not None:
+                    self._remove(old)
+                try:
+                    text = data[payload_at:payload_at + length].decode("utf-8")
+                except UnicodeDecodeError:
+                    break
+                self._insert(HistoryEntry(key, length, timestamp, offset=payload_at), text)
+            elif kind == RECORD_TOUCH:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    entry.timestamp = timestamp
+                    self._entries.move_to_end(key)
+            elif kind == RECORD_DELETE:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._remove(entry)
+            else:
+                break
+            pos = payload_at + length
+        return pos
+
+    def _append_record(self, kind, key, timestamp, payload=b""):
+        """Append a record and return the payload offset, or None without a log."""
+        if self._log is None:
+            return None
+        self._log.write(RECORD.pack(RECORD_MAGIC, kind, timestamp, len(payload), key))
+        self._log.write(payload)
+        self._log.flush()
+        offset = self._log_size + RECORD.size
+        self._log_size = offset + len(payload)
+        return offset
+
+    def _maybe_compact(self):
+        if self._log is None or self._log_size <= COMPACT_FACTOR * self._bytes + COMPACT_MIN_BYTES:
+            return
+        tmp_path = self.path + ".tmp"
+        offsets = {}
+        with open(tmp_path, "wb") as out:
+            pos = 0
+            for entry in self._entries.values():
+                data = self._raw(entry)
+                out.write(RECORD.pack(RECORD_MAGIC, RECORD_ADD, entry.timestamp, len(data), entry.key))
+                out.write(data)
+                offsets[entry.key] = pos + RECORD.size
+                pos += RECORD.size + len(data)
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(tmp_path, self.path)
+        old_size = self._log_size
+        self._close_log()
+        self._log = open(self.path, "a+b")
+        self._log_size = pos
+        self._remap()
+        for entry in self._entries.values():
+            entry.offset = offsets[entry.key]
+            entry.data = None
+        self.logger.debug("Compacted clipboard history log from %s to %s bytes", old_size, pos)
+
+
+def get_history_path():
+    xdg_data_home = os.environ.get('XDG_DATA_HOME', os.path.expanduser('~/.local/share'))
+    return os.path.join(xdg_data_home, 'kapsulate', 'clipboard-history.log')
+
+
+_history_instance = None
+
+def get_clipboard_history():
+    global _history_instance
+    if _history_instance is None:
+        settings = get_settings()
+        _history_instance = ClipboardHistory(
+            capacity=settings.getint("history", "capacity"),
+            max_bytes=settings.getint("history", "max_mb") * MB,
+            path=get_history_path() if settings.getboolean("history", "persist") else None,
+        )
+    return _history_instance
@@ -0,0 +1,150 @@
+"""
+Character to key code table for typing text through the virtual keyboard.
+
+The compositor turns key codes from every keyboard, virtual ones included,
+into characters with its own XKB layout, so a table is only valid for the
+layout it was written for. The table here is the US layout; `build_keymap()`
+returns an empty table when the configured layout is anything else, and
+typing then falls back to pasting.
+
+The layout is read from KDE's kxkbrc, then XKB_DEFAULT_LAYOUT and the
+system keyboard configuration. With several layouts configured the active
+one cannot be known, so typing is disabled too.
+
+This module only uses the standard library.
+"""
+import configparser
+import os
+import struct
+
+# Layout the tables below are written for, as an XKB (layout, variant)
+SUPPORTED_LAYOUT = ("us", "")
+
+# System keyboard configuration (Debian's and localectl's), read when the desktop sets none
+SYSTEM_KEYBOARD_FILES = ("/etc/default/keyboard", "/etc/vconsole.conf")
+
+# Characters typed without and with Shift, by key name (see linux/input-event-codes.h).
+# Enter and Tab are left out on purpose: editors auto-indent, complete or move
+# focus on them, so typing them does not reproduce the text the way a paste does
+_US_KEYS = {
+    "KEY_1": "1!", "KEY_2": "2@", "KEY_3": "3#", "KEY_4": "4$", "KEY_5": "5%",
+    "KEY_6": "6^", "KEY_7": "7&", "KEY_8": "8*", "KEY_9": "9(", "KEY_0": "0)",
+    "KEY_MINUS": "-_", "KEY_EQUAL": "=+", "KEY_LEFTBRACE": "[{", "KEY_RIGHTBRACE": "]}",
+    "KEY_BACKSLASH": "\\|", "KEY_SEMICOLON": ";:", "KEY_APOSTROPHE": "'\"",
+    "KEY_GRAVE": "`~", "KEY_COMMA": ",<", "KEY_DOT": ".>", "KEY_SLASH": "/?",
+    "KEY_SPACE": "  ",
+}
+_US_KEYS.update({f"KEY_{c}": c.lower() + c for c in "ABCDEFGHIJKLMNOPQRSTUVWXYZ"})
+
+# struct input_event: a timeval (ignored by uinput) followed by type, code and value
+INPUT_EVENT = struct.Struct("llHHi")
+
+# evdev gives every reader of a device a 64-event buffer and drops events
+# beyond it, so text is written in batches that fit, split between frames
+TYPE_BATCH_EVENTS = 48
+
+
+def _first(value):
+    return (value or "").split(",")[0].strip()
+
+
+def _read_kxkbrc():
+    config_home = os.environ.get("XDG_CONFIG_HOME", os.path.expanduser("~/.config"))
+    parser = configparser.ConfigParser(interpolation=None)
+    try:
+        parser.read(os.path.join(config_home, "kxkbrc"), encoding="utf-8")
+    except (configparser.Error, UnicodeDecodeError):
+        return None
+    if not parser.getboolean("Layout", "Use", fallback=False):
+        return None
+    return parser.get("Layout", "LayoutList", fallback=""), parser.get("Layout", "VariantList", fallback="")
+
+
+def _read_system_keyboard():
+    for path in SYSTEM_KEYBOARD_FILES:
+        values = {}
+        try:
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    name, sep, value = line.strip().partition("=")
+                    if sep:
+                        values[name.strip()] = value.strip().strip("\"'")
+        except (OSError, UnicodeDecodeError):
+            continue
+        layout = values.get("XKBLAYOUT") or values.get("XKB_LAYOUT")
+        if layout:
+            return layout, values.get("XKBVARIANT") or values.get("XKB_VARIANT") or ""
+    return None
+
+
+def configured_layouts():
+    """Return the configured XKB layouts and variants as two comma-separated strings."""
+    found = _read_kxkbrc()
+    if found is None and os.environ.get("XKB_DEFAULT_LAYOUT"):
+        found = os.environ["XKB_DEFAULT_LAYOUT"], os.environ.get("XKB_DEFAULT_VARIANT", "")
+    if found is None:
+        found = _read_system_keyboard()
+    # Nothing configured means the XKB default, which is US
+    return found or ("us", "")
+
+
+def build_keymap(ecodes, layouts=None):
+    """Return {char: (keycode, shift)} for the configured layout, or {} if it is not supported.
+
+    `ecodes` is evdev's ecodes module; `layouts` overrides configured_layouts().
+    """
+    layout, variant = layouts if layouts is not None else configured_layouts()
+    if "," in layout.strip(",") or (_first(layout) or "us", _first(variant)) != SUPPORTED_LAYOUT:
+        return {}
+    keymap = {}
+    for name, chars in _US_KEYS.items():
+        code = getattr(ecodes, name, None)
+        if code is None:
+            continue
+        plain, shifted = chars
+        keymap[plain] = (code, False)
+        keymap.setdefault(shifted, (code, True))
+    return keymap
+
+
+def can_type(text, keymap):
+    """Return True if every character of `text` is in `keymap`."""
+    return all(c in keymap for c in text)
+
+
+def encode_text(text, keymap, ecodes, batch_events=TYPE_BATCH_EVENTS):
+    """Return the key events that type `text` as a list of packed input_event batches.
+
+    Each key press and release is its own frame (one SYN_REPORT each);
+    Shift is pressed with the first shifted character and held until an
+    unshifted one. Every batch ends on a frame boundary and holds at most
+    `batch_events` events. All characters must be in `keymap`.
+    """
+    pack = INPUT_EVENT.pack
+    ev_key, shift = ecodes.EV_KEY, ecodes.KEY_LEFTSHIFT
+    syn = pack(0, 0, ecodes.EV_SYN, ecodes.SYN_REPORT, 0)
+    batches = []
+    batch = []
+    count = 0
+    shifted = False
+    for char in text:
+        code, needs_shift = keymap[char]
+        frames = []
+        if needs_shift != shifted:
+            frames.append(pack(0, 0, ev_key, shift, int(needs_shift)))
+            shifted = needs_shift
+        frames += (pack(0, 0, ev_key, code, 1), syn, pack(0, 0, ev_key, code, 0), syn)
+        if count + len(frames) > batch_events and batch:
+            batches.append(b"".join(batch))
+            batch = []
+            count = 0
+        batch += frames
+        count += len(frames)
+    if shifted:
+        if count + 2 > batch_events:
+            batches.append(b"".join(batch))
+            batch = []
+        batch += (pack(0, 0, ev_key, shift, 0), syn)
+    if batch:
+        batches.append(b"".join(batch))
+    return batches
@@ -0,0 +1,262 @@
+"""
+Snippet store for text expansion.
+
+The snippet file lists abbreviations and their bodies:
+
+    # Lines before the first snippet are comments
+    ::sig
+    Best regards,
+    Darko
+    ::addr
+    Street 1, City
+
+A line starting with "::" begins a snippet; the rest of the line is the
+abbreviation and the following lines up to the next header are its body.
+Body lines that must start with "::" are written as "\\::".
+
+Only the abbreviations are kept in memory. They are indexed in a trie of
+reversed abbreviations, so the snippet ending at the cursor is found in
+time proportional to its length, and every entry points at its body's
+byte range in a memory map of the file. Reloading diffs the new file
+against the index and only touches the entries that changed.
+
+This module only uses the standard library.
+"""
+import mmap
+import os
+import threading
+from core.logger import get_logger
+
+HEADER = b"::"
+ESCAPED_HEADER = "\\::"
+
+
+class SnippetTrie:
+    """Trie of reversed keys with single-branch tails stored as (rest, value) leaves.
+
+    A node is a dict mapping one character to a child node or a leaf; the
+    empty string marks a key ending at that node.
+    """
+
+    def __init__(self):
+        self._root = {}
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def insert(self, key, value):
+        """Add `key` or replace its value."""
+        rkey = key[::-1]
+        node = self._root
+        i = 0
+        while True:
+            if i == len(rkey):
+                if "" not in node:
+                    self._size += 1
+                node[""] = value
+                return
+            c = rkey[i]
+            child = node.get(c)
+            if child is None:
+                node[c] = (rkey[i + 1:], value)
+                self._size += 1
+                return
+            if isinstance(child, tuple):
+                rest, old_value = child
+                if rest == rkey[i + 1:]:
+                    node[c] = (rest, value)
+                    return
+                # Two keys share this branch now; turn the leaf into a node
+                child = {"": old_value} if not rest else {rest[0]: (rest[1:], old_value)}
+                node[c] = child
+            node = child
+            i += 1
+
+    def remove(self, key):
+        """Delete `key`; returns False if it was not present."""
+        rkey = key[::-1]
+        path = []
+        node = self._root
+        i = 0
+        while i < len(rkey):
+            child = node.get(rkey[i])
+            if child is None:
+                return False
+            if isinstance(child, tuple):
+                if child[0] != rkey[i + 1:]:
+                    return False
+                del node[rkey[i]]
+                break
+            path.append((node, rkey[i]))
+            node = child
+            i += 1
+        else:
+            if "" not in node:
+                return False
+            del node[""]
+        self._size -= 1
+        # Drop nodes left without any key
+        while path:
+            parent, c = path.pop()
+            if parent[c]:
+                break
+            del parent[c]
+        return True
+
+    def suffixes(self, text):
+        """Yield (length, value) for every key that `text` ends with, shortest first."""
+        node = self._root
+        n = len(text)
+        k = 0
+        while True:
+            if "" in node:
+                yield k, node[""]
+            if k == n:
+                return
+            child = node.get(text[n - 1 - k])
+            if child is None:
+                return
+            k += 1
+            if isinstance(child, tuple):
+                rest, value = child
+                m = len(rest)
+                if m <= n - k and text[n - k - m:n - k][::-1] == rest:
+                    yield k + m, value
+                return
+            node = child
+
+
+def _is_word_char(c):
+    return c.isalnum() or c == "_"
+
+
+def parse_index(data):
+    """Return {abbreviation: (body start, body end)} for the snippet file bytes in `data`."""
+    index = {}
+    size = len(data)
+    if data[:2] == HEADER:
+        pos = 0
+    else:
+        pos = data.find(b"\n" + HEADER)
+        if pos == -1:
+            return index
+        pos += 1
+    while True:
+        eol = data.find(b"\n", pos)
+        if eol == -1:
+            eol = size
+        abbr = data[pos + len(HEADER):eol].decode("utf-8", errors="replace").strip()
+        nxt = data.find(b"\n" + HEADER, eol) if eol < size else -1
+        end = nxt if nxt != -1 else size
+        if abbr and not any(c.isspace() for c in abbr):
+            index[abbr] = (min(eol + 1, end), end)
+        if nxt == -1:
+            return index
+        pos = nxt + 1
+
+
+class SnippetStore:
+    """Abbreviation index over a memory-mapped snippet file."""
+
+    def __init__(self, path):
+        self.logger = get_logger()
+        self.path = path
+        self._lock = threading.Lock()
+        self._trie = SnippetTrie()
+        self._index = {}
+        self._map = None
+        self._file = None
+        self._stat = None
+
+    def __len__(self):
+        return len(self._index)
+
+    def reload(self):
+        """Bring the index up to date with the file. Returns the number of changed entries."""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            st = None
+        key = (st.st_ino, st.st_size, st.st_mtime_ns) if st else None
+        if key == self._stat:
+            return 0
+
+        new_file = new_map = None
+        new_index = {}
+        if st is not None and st.st_size > 0:
+            try:
+                new_file = open(self.path, "rb")
+                new_map = mmap.mmap(new_file.fileno(), 0, access=mmap.ACCESS_READ)
+            except (OSError, ValueError) as e:
+                if new_file is not None:
+                    new_file.close()
+                self.logger.error("Cannot read snippet file %s: %s", self.path, e)
+                return 0
+            new_index = parse_index(new_map)
+
+        with self._lock:
+            changed = 0
+            for abbr in self._index.keys() - new_index.keys():
+                self._trie.remove(abbr)
+                changed += 1
+            for abbr, span in new_index.items():
+                if self._index.get(abbr) != span:
+                    self._trie.insert(abbr, span)
+                    changed += 1
+            old_map, old_file = self._map, self._file
+            self._index, self._map, self._file, self._stat = new_index, new_map, new_file, key
+        if old_map is not None:
+            old_map.close()
+            old_file.close()
+        self.logger.info("Snippets loaded from %s: %s entries, %s changed", self.path, len(new_index), changed)
+        return changed
+
+    def close(self):
+        with self._lock:
+            if self._map is not None:
+                self._map.close()
+                self._file.close()
+            self._map = self._file = None
+            self._index = {}
+            self._trie = SnippetTrie()
+            self._stat = None
+
+    def find(self, text):
+        """Return (abbreviation, body) for the longest snippet `text` ends with, or None.
+
+        The abbreviation must start at a word boundary, so "sig" does not
+        fire at the end of "consig" but does after "(" or a space.
+        """
+        with self._lock:
+            best = None
+            for length, span in self._trie.suffixes(text):
+                start = len(text) - length
+                if start == 0 or not _is_word_char(text[start - 1]) or not _is_word_char(text[start]):
+                    best = (text[start:], span)
+            if best is None:
+                return None
+            abbr, (start, end) = best
+            return abbr, self._decode_body(self._map[start:end])
+
+    def body(self, abbr):
+        """Return the body of `abbr`, or None if there is no such snippet."""
+        with self._lock:
+            span = self._index.get(abbr)
+            if span is None:
+                return None
+            return self._decode_body(self._map[span[0]:span[1]])
+
+    @staticmethod
+    def _decode_body(data):
+        body = data.decode("utf-8", errors="replace")
+        # The newline ending the last body line belongs to the file, not the snippet
+        if body.endswith("\n"):
+            body = body[:-1]
+        if body.endswith("\r"):
+            body = body[:-1]
+        if ESCAPED_HEADER in body:
+            if body.startswith(ESCAPED_HEADER):
+                body = body[1:]
+            body = body.replace("\n" + ESCAPED_HEADER, "\n" + ESCAPED_HEADER[1:])
+        return body
@@ -1,147 +1,933 @@
-import subprocess
-from PyQt6.QtCore import QObject, pyqtSignal, QThread
+import codecs
+import io
+import os
+import queue
+import threading
+import time
+import unicodedata
+from PyQt6.QtCore import QObject, pyqtSignal, pyqtSlot, QThread, QTimer
 from evdev import UInput, ecodes as e
+from core.clipboard import get_clipboard, get_clipboard_watcher, get_primary_watcher
+from core.focus import get_focus_tracker
 from core.logger import get_logger
+from core.metrics import get_metrics
+from core.settings import get_settings
+from features.calibration import get_delay_calibrator
+from features.keymap import TYPE_BATCH_EVENTS, build_keymap, can_type, configured_layouts, encode_text
+from features.transform_cache import TransformCache, selection_key
+from features.transforms import CHAIN_SEPARATOR, StreamTransformer, UnknownModeError, apply_chain, parse_chain, tokenize
 from ui.overlay import get_osd
 
 # Constants for delays (in milliseconds)
-KEY_PRESS_DELAY_MS = 50
+# Key hold time and copy wait are calibrated per application (features/calibration.py);
+# these are used until an application has been measured.
+
+# How long an application may take to publish the clipboard after Ctrl+C
+CLIPBOARD_TIMEOUT_MS = 2000
+# How long our own clipboard write may take to become visible before Ctrl+V
+CLIPBOARD_SET_TIMEOUT_MS = 500
+# Fixed wait used only when the clipboard watcher is not available
 CLIPBOARD_SYNC_DELAY_MS = 100
 
-# Maximum number of active threads to keep in memory
-MAX_ACTIVE_THREADS = 10
+# Requests arriving while a job is queued or running are held this long and
+# merged into one copy/transform/paste cycle
+TRANSFORM_DEBOUNCE_MS = 150
 
-class TransformationWorker(QObject):
-    finished = pyqtSignal(str)  # Emits the transformed text or None
-    error = pyqtSignal(str)
+MB = 1024 * 1024
 
-    def __init__(self, mode):
-        super().__init__()
+# Large selections are read, transformed and written in chunks of this size
+STREAM_CHUNK_BYTES = 1 * MB
+# Report streaming progress to the OSD every this many bytes
+PROGRESS_STEP_BYTES = 4 * MB
+
+# Time given to the compositor to pick up the virtual keyboard before first use
+UINPUT_WARMUP_MS = 300
+
+# Name of the virtual keyboard, as shown by libinput / the compositor
+UINPUT_DEVICE_NAME = "kapsulate-virtual-keyboard"
+
+# Longest word copied back for abbreviation lookup; anything longer is not a snippet
+EXPAND_MAX_WORD_BYTES = 4096
+
+# Undo and cycling re-select the pasted text with Shift+Left, one press per character:
+# only within this long after the paste, and only up to this many presses
+REPLACE_WINDOW_S = 120
+REPLACE_MAX_STEPS = 5000
+# Pause briefly after this many presses (four events each) so the compositor drains
+# the device's 64-event buffer before more arrive (see features/keymap.py)
+SELECT_BATCH = TYPE_BATCH_EVENTS // 4
+# How long the application may take to publish the re-selected text as primary selection
+SELECT_CHECK_TIMEOUT_MS = 150
+
+# Give the application this long to read a pasted result before the clipboard
+# contents from before the transformation are put back (longer for streamed results)
+RESTORE_DELAY_MS = 500
+RESTORE_DELAY_STREAM_MS = 3000
+
+# Pause between batches of typed keystrokes so the compositor can drain the
+# device's event buffer (see features/keymap.py)
+TYPE_BATCH_PAUSE_MS = 1
+
+
+class TransformAborted(Exception):
+    """Raised when a transformation is cancelled or refused; the message is shown to the user."""
+    pass
+
+
+class TransformJob:
+    """A single queued transformation request."""
+
+    def __init__(self, mode, on_finished):
         self.mode = mode
+        self.on_finished = on_finished
+        self.enqueued_at = time.monotonic()
+        self.wait_ms = 0.0
+
+
+class ExpandJob(TransformJob):
+    """Expand the abbreviation before the cursor; `lookup(text)` returns (abbreviation, body) or None."""
+
+    def __init__(self, lookup, on_finished):
+        super().__init__("expand", on_finished)
+        self.lookup = lookup
+
+
+class ReplaceJob(TransformJob):
+    """Replace the text the last transformation pasted.
+
+    Mode "undo" toggles between the original and the last result, "cycle"
+    moves on to the next of the configured cycle modes.
+    """
+    pass
+
+
+class PastedText:
+    """What the last transformation pasted, and where, for undo and cycling."""
+    __slots__ = ("key", "chain", "text", "app", "clipboard_seq", "at", "undone")
+
+    def __init__(self, key, chain, text, app, clipboard_seq, undone=None):
+        self.key = key
+        self.chain = chain  # None when the original text is in place
+        self.text = text
+        self.app = app
+        self.clipboard_seq = clipboard_seq
+        self.at = time.monotonic()
+        self.undone = undone  # chain an undo took back, so the next undo redoes it
+
+
+def caret_steps(text):
+    """Return how many Left presses move the caret over `text`.
+
+    Toolkits step over whole grapheme clusters; combining marks, joined
+    emoji sequences, variation selectors and skin tones add no step. CRLF
+    counts as one.
+    """
+    if text.isascii():
+        return len(text) - text.count("\r\n")
+    steps = 0
+    joined = False
+    for ch in text.replace("\r\n", "\n"):
+        if joined:
+            joined = False
+        elif ch == "\u200d":
+            joined = True
+        elif not (unicodedata.combining(ch) or "\ufe00" <= ch <= "\ufe0f" or "\U0001f3fb" <= ch <= "\U0001f3ff"):
+            steps += 1
+    return steps
+
+
+class TransformationWorker(QThread):
+    """Resident worker thread that owns one virtual keyboard and runs queued jobs."""
+    job_finished = pyqtSignal(object, object)  # Emits the job and the transformed text, True if streamed, or None
+    error = pyqtSignal(object, str)
+    aborted = pyqtSignal(object, str)
+    progress = pyqtSignal(object, int)  # Emits the job and the number of bytes processed so far
+
+    def __init__(self):
+        super().__init__()
         self.logger = get_logger()
+        self._jobs = queue.Queue()
+        self._ui = None
+        self._device_error = None
+        self._watcher = get_clipboard_watcher()
+        self._primary = get_primary_watcher()
+        self._primary_taken = None  # sequence of the primary selection last transformed
+        # (sequence, focused application) of the latest primary selection
+        self._primary_owner = (None, "")
+        self._primary.add_listener(self._on_primary_changed)
+        self._clipboard = get_clipboard()
+        self._cancel = threading.Event()
+        self._metrics = get_metrics()
+        self._focus = get_focus_tracker()
+        self._timings = get_delay_calibrator()
+        # Focused application and its key hold time, set at the start of each job
+        self._app = ""
+        self._hold_ms = self._timings.key_hold_ms("")
+        # Recent selections and their results; the last paste can be undone or cycled
+        self.cache = TransformCache()
+        self._last = None
+        # Characters that can be typed instead of pasted, built once in run()
+        self._keymap = {}
+        # Clipboard contents from before the last transformation (ClipboardSnapshot), still
+        # the user's as long as the clipboard sequence is _saved_seq, and when to put them back
+        self._saved = None
+        self._saved_seq = None
+        self._restore_at = None
+        self._saving = False  # the running job saved (or kept) the clipboard
+
+    def submit(self, job):
+        """Queue a job and return the resulting queue depth."""
+        self._jobs.put(job)
+        return self._jobs.qsize()
+
+    def queue_depth(self):
+        return self._jobs.qsize()
+
+    def cancel(self):
+        """Abort the running job at the next chunk boundary."""
+        self._cancel.set()
+
+    def stop(self):
+        """Ask the worker to exit once the queued jobs are done and wait for it."""
+        self._jobs.put(None)
+        self.wait()
 
     def run(self):
+        # Open and warm up the device before the first job arrives
+        self._watcher.start()
+        if get_settings().getboolean("transform", "use_primary"):
+            self._primary.start()
+        tokenize("")  # compiles the tokenizer off the trigger path
+        self._keymap = build_keymap(e)
+        if not self._keymap:
+            self.logger.info("Keyboard layout %s cannot be typed, results are always pasted",
+                             "/".join(filter(None, configured_layouts())))
+        self._open_device()
+        while True:
+            try:
+                job = self._jobs.get(timeout=self._restore_timeout())
+            except queue.Empty:
+                # Idle after a paste: put the previous clipboard contents back
+                self._restore_clipboard()
+                continue
+            if job is None:
+                break
+            job.wait_ms = (time.monotonic() - job.enqueued_at) * 1000
+            self.logger.debug(
+                "Running %s job after %.1f ms in queue (%d still queued)",
+                job.mode, job.wait_ms, self._jobs.qsize()
+            )
+            self._cancel.clear()
+            self._run_job(job)
+        if self._restore_at is not None:
+            self._restore_clipboard()
+        self._drop_saved()
+        self._close_device()
+        self._watcher.stop()
+        self._primary.stop()
+        self._timings.save()
+
+    def _open_device(self):
+        if self._ui is not None:
+            return True
+        try:
+            self._ui = UInput(name=UINPUT_DEVICE_NAME)
+        except PermissionError:
+            self.logger.error("Permission denied for UInput. User must be in 'input' group.")
+            self._device_error = "Permission denied for UInput (check 'input' group)"
+            return False
+        except Exception as ex:
+            self.logger.exception("Failed to create UInput device: %s", ex)
+            self._device_error = f"Error: {ex}"
+            return False
+
+        self._device_error = None
+        # Let the compositor register the new device so the first keystrokes are not dropped
+        QThread.msleep(UINPUT_WARMUP_MS)
+        self.logger.info("Virtual keyboard '%s' ready", UINPUT_DEVICE_NAME)
+        return True
+
+    def _close_device(self):
+        if self._ui is not None:
+            try:
+                self._ui.close()
+            except Exception as ex:
+                self.logger.debug("UInput close note: %s", ex)
+            self._ui = None
+
+    def _run_job(self, job):
+        if not self._open_device():
+            self.error.emit(job, self._device_error)
+            return
+
+        self._app = self._focus.active_app
+        self._hold_ms = self._timings.key_hold_ms(self._app)
+        result = None
         try:
-            with UInput() as ui:
-                self.logger.debug(f"Simulating Ctrl+C for {self.mode} transform")
-                # 1. Simulate Ctrl+C
-                ui.write(e.EV_KEY, e.KEY_LEFTCTRL, 1)
-                ui.write(e.EV_KEY, e.KEY_C, 1)
+            if isinstance(job, ReplaceJob):
+                with self._metrics.span(f"{job.mode}.total"):
+                    result = self._replace_last(job)
+            elif isinstance(job, ExpandJob):
+                self._last = None
+                with self._metrics.span("expand.total"):
+                    result = self._expand_before_cursor(job)
+            else:
+                self._last = None
+                with self._metrics.span("transform.total"):
+                    result = self._transform_selection(job)
+            self.job_finished.emit(job, result)
+        except TransformAborted as ex:
+            self.logger.warning("Transformation aborted: %s", ex)
+            self.aborted.emit(job, str(ex))
+        except Exception as ex:
+            self.logger.exception("Unexpected error in TransformationWorker: %s", ex)
+            self.error.emit(job, f"Error: {ex}")
+        if self._saving:
+            self._saving = False
+            self._schedule_restore(RESTORE_DELAY_STREAM_MS if result is True else RESTORE_DELAY_MS)
+        self._timings.maybe_save()
+
+    def _press_combo(self, *keys):
+        """Press `keys` in order (modifiers first) and release them in reverse."""
+        ui = self._ui
+        try:
+            for key in keys:
+                ui.write(e.EV_KEY, key, 1)
+            ui.syn()
+            QThread.msleep(self._hold_ms)
+            for key in reversed(keys):
+                ui.write(e.EV_KEY, key, 0)
+            ui.syn()
+        except OSError:
+            # The device went away (e.g. uinput reloaded); recreate it on the next job
+            self._close_device()
+            raise
+
+    def _press_repeated(self, key, count, modifier):
+        """Press `key` `count` times while holding `modifier`, without a hold per press."""
+        ui = self._ui
+        try:
+            ui.write(e.EV_KEY, modifier, 1)
+            ui.syn()
+            for i in range(1, count + 1):
+                ui.write(e.EV_KEY, key, 1)
                 ui.syn()
-                QThread.msleep(KEY_PRESS_DELAY_MS)
-                ui.write(e.EV_KEY, e.KEY_C, 0)
-                ui.write(e.EV_KEY, e.KEY_LEFTCTRL, 0)
+                ui.write(e.EV_KEY, key, 0)
                 ui.syn()
+                if i % SELECT_BATCH == 0:
+                    QThread.msleep(TYPE_BATCH_PAUSE_MS)
+            QThread.msleep(self._hold_ms)
+            ui.write(e.EV_KEY, modifier, 0)
+            ui.syn()
+        except OSError:
+            self._close_device()
+            raise
 
-                # Give it a moment to copy
-                QThread.msleep(CLIPBOARD_SYNC_DELAY_MS)
-
-                original = self._get_clipboard()
-                if not original:
-                    self.logger.warning("Clipboard empty after Ctrl+C simulation")
-                    self.finished.emit(None)
-                    return
-
-                transformed = self._transform_case(original, self.mode)
-                if transformed != original:
-                    self._set_clipboard(transformed)
-                    # Give it a moment to set clipboard
-                    QThread.msleep(KEY_PRESS_DELAY_MS)
-
-                    self.logger.debug("Simulating Ctrl+V for paste")
-                    # 2. Simulate Ctrl+V
-                    ui.write(e.EV_KEY, e.KEY_LEFTCTRL, 1)
-                    ui.write(e.EV_KEY, e.KEY_V, 1)
-                    ui.syn()
-                    QThread.msleep(KEY_PRESS_DELAY_MS)
-                    ui.write(e.EV_KEY, e.KEY_V, 0)
-                    ui.write(e.EV_KEY, e.KEY_LEFTCTRL, 0)
-                    ui.syn()
-
-                    self.finished.emit(transformed)
-                else:
-                    self.logger.debug("Text already in target case, skipping paste")
-                    self.finished.emit(None)
+    def _type_text(self, text):
+        """Type `text` on the virtual keyboard, writing the events in a few large batches."""
+        batches = encode_text(text, self._keymap, e)
+        fd = self._ui.fd
+        try:
+            for i, batch in enumerate(batches):
+                if i:
+                    QThread.msleep(TYPE_BATCH_PAUSE_MS)
+                os.write(fd, batch)
+        except OSError:
+            self._close_device()
+            raise
 
-        except PermissionError:
-            self.logger.error("Permission denied for UInput. User must be in 'input' group.")
-            self.error.emit("Permission denied for UInput (check 'input' group)")
+    def _save_clipboard(self):
+        """Snapshot the clipboard before the running job first changes it."""
+        if self._saving or not self._watcher.available:
+            return
+        if not get_settings().getboolean("transform", "restore_clipboard"):
+            return
+        self._saving = True
+        seq = self._watcher.sequence()
+        if self._saved is not None and seq == self._saved_seq:
+            # The clipboard holds our last result or the contents already put back
+            return
+        self._drop_saved()
+        with self._metrics.span("clipboard.snapshot"):
+            self._saved = self._clipboard.snapshot()
+        self._saved_seq = seq
+
+    def _schedule_restore(self, delay_ms):
+        seq = self._watcher.sequence()
+        if self._saved is None or seq == self._saved_seq:
+            # The job did not change the clipboard after all
+            return
+        self._saved_seq = seq
+        self._restore_at = time.monotonic() + delay_ms / 1000
+
+    def _restore_timeout(self):
+        if self._restore_at is None:
+            return None
+        return max(0, self._restore_at - time.monotonic())
+
+    def _restore_clipboard(self):
+        """Put the clipboard contents saved before the last transformation back."""
+        self._restore_at = None
+        seq = self._watcher.sequence()
+        if self._saved is None or seq != self._saved_seq:
+            # Something else was copied since the paste; that is what the user wants now
+            self._drop_saved()
+            return
+        try:
+            with self._metrics.span("clipboard.restore"):
+                self._clipboard.restore(self._saved)
         except Exception as ex:
-            self.logger.exception(f"Unexpected error in TransformationWorker: {ex}")
-            self.error.emit(f"Error: {ex}")
+            self.logger.warning("Could not restore the clipboard: %s", ex)
+            self._drop_saved()
+            return
+        if self._watcher.wait_for_change(seq, CLIPBOARD_SET_TIMEOUT_MS) is None:
+            self._drop_saved()
+            return
+        restored = self._watcher.sequence()
+        self.logger.debug("Restored %d bytes of %s to the clipboard", self._saved.size, self._saved.preferred_type())
+        # The snapshot stays valid for the next transformation while nothing else is copied
+        self._saved_seq = restored
+        if self._last is not None and self._last.clipboard_seq == seq:
+            # Our own change; undo and cycling still apply
+            self._last.clipboard_seq = restored
+
+    def _drop_saved(self):
+        if self._saved is not None:
+            self._saved.close()
+            self._saved = None
+
+    def _wait_for_clipboard(self, since, timeout_ms, what, span, fixed_delay_ms=CLIPBOARD_SYNC_DELAY_MS):
+        """Wait until the clipboard changes after `since`. Returns False on timeout.
+
+        The wait is recorded under the metrics span `span`; timeouts count as errors.
+        Without the watcher, `fixed_delay_ms` is slept instead.
+        """
+        if not self._watcher.available:
+            fixed_delay_ms = int(fixed_delay_ms)
+            QThread.msleep(fixed_delay_ms)
+            self.logger.debug("Waited fixed %s ms for %s (no watcher)", fixed_delay_ms, what)
+            self._metrics.record(span, fixed_delay_ms)
+            return True
+
+        waited = self._watcher.wait_for_change(since, timeout_ms)
+        if waited is None:
+            self.logger.warning("Clipboard did not change within %s ms after %s", timeout_ms, what)
+            self._metrics.record_error(span)
+            return False
+        self.logger.debug("Clipboard changed %.1f ms after %s", waited, what)
+        self._metrics.record(span, waited)
+        return True
+
+    def _copy_selection(self, span_prefix):
+        """Press Ctrl+C and wait for the focused application to publish the selection.
+
+        If nothing arrives within the time this application usually needs,
+        Ctrl+C is pressed once more with a longer key hold; the whole wait is
+        still bounded by CLIPBOARD_TIMEOUT_MS. Returns False on timeout.
+        """
+        app = self._app
+        span = f"{span_prefix}.copy_wait"
+        self._save_clipboard()
+        seq = self._watcher.sequence()
+        with self._metrics.span(f"{span_prefix}.copy_keystroke"):
+            self._press_combo(e.KEY_LEFTCTRL, e.KEY_C)
+        if not self._watcher.available:
+            delay = self._timings.copy_wait_ms(app, CLIPBOARD_SYNC_DELAY_MS)
+            return self._wait_for_clipboard(seq, CLIPBOARD_TIMEOUT_MS, "Ctrl+C", span, fixed_delay_ms=delay)
+
+        first_wait = self._timings.copy_wait_ms(app, CLIPBOARD_TIMEOUT_MS)
+        waited = self._watcher.wait_for_change(seq, first_wait)
+        if waited is None and first_wait < CLIPBOARD_TIMEOUT_MS:
+            # The key press may have been too short for this application; any
+            # late answer to the first press still counts, as `seq` is unchanged
+            self._timings.record_timeout(app)
+            self._hold_ms = self._timings.key_hold_ms(app)
+            self.logger.info(
+                "No copy from %s within %.0f ms, pressing Ctrl+C again with a %d ms hold",
+                app or "unknown application", first_wait, self._hold_ms
+            )
+            self._press_combo(e.KEY_LEFTCTRL, e.KEY_C)
+            retried = self._watcher.wait_for_change(seq, CLIPBOARD_TIMEOUT_MS - first_wait)
+            if retried is not None:
+                waited = first_wait + retried
+        elif waited is None:
+            self._timings.record_timeout(app)
 
-    def _get_clipboard(self):
+        if waited is None:
+            self.logger.warning("Clipboard did not change within %s ms after Ctrl+C", CLIPBOARD_TIMEOUT_MS)
+            self._metrics.record_error(span)
+            return False
+        self.logger.debug("Clipboard changed %.1f ms after Ctrl+C (%s)", waited, app or "unknown application")
+        self._metrics.record(span, waited)
+        self._timings.record_copy(app, waited)
+        return True
+
+    def _on_primary_changed(self, _data):
+        # Runs on the watcher thread right after the change, while the selecting window has focus
+        self._primary_owner = (self._primary.sequence(), self._focus.active_app)
+
+    def _take_primary(self, settings):
+        """Return the primary selection if it is fresh, or None to fall back to Ctrl+C.
+
+        Each primary selection is used once: after the paste the application
+        usually keeps offering the old text although nothing is selected.
+        It is also only used when it was made in the window that has focus
+        now; text selected elsewhere would be pasted at the wrong place.
+        """
+        if not settings.getboolean("transform", "use_primary"):
+            return None
+        seq, data, changed_at = self._primary.offer()
+        if not data:
+            return None
+        age_s = time.monotonic() - changed_at
+        if seq == self._primary_taken or age_s > settings.getfloat("transform", "primary_max_age_s"):
+            self.logger.debug("Primary selection is stale (%.1f s old), using Ctrl+C", age_s)
+            return None
+        owner_seq, owner_app = self._primary_owner
+        if owner_seq != seq or owner_app != self._app:
+            self.logger.debug("Primary selection was made in %s, not %s; using Ctrl+C",
+                              owner_app or "an unknown window", self._app or "the focused window")
+            return None
+        self._primary_taken = seq
+        return data
+
+    def _transform_selection(self, job):
+        mode = job.mode
+        settings = get_settings()
+        stream_threshold = settings.getint("transform", "stream_threshold_mb") * MB
+
+        read_start = time.perf_counter()
+        primary = self._take_primary(settings)
+        if primary is not None:
+            self.logger.debug("Using the primary selection for %s transform", mode)
+            self._metrics.record("transform.primary_read", (time.perf_counter() - read_start) * 1000)
+            reader = io.BytesIO(primary)
+        else:
+            self.logger.debug("Simulating Ctrl+C for %s transform", mode)
+            # 1. Simulate Ctrl+C and wait for the application to publish the selection
+            if not self._copy_selection("transform"):
+                # Whatever is on the clipboard now is stale, not the selection
+                return None
+
+            read_start = time.perf_counter()
+            try:
+                reader = self._clipboard.open_reader()
+            except Exception as e:
+                self.logger.error("Failed to get clipboard: %s", e)
+                self._metrics.record_error("transform.clipboard_read")
+                return None
         try:
-            return subprocess.check_output(["wl-paste", "-n"], text=True)
-        except Exception as e:
-            self.logger.error(f"Failed to get clipboard: {e}")
-            return ""
+            head = reader.read(stream_threshold + 1)
+            if len(head) > stream_threshold:
+                with self._metrics.span("transform.stream"):
+                    return self._stream_transform(job, reader, head, settings)
+        finally:
+            reader.close()
+
+        original = head.decode("utf-8", errors="replace")
+        self._metrics.record("transform.clipboard_read", (time.perf_counter() - read_start) * 1000)
+        if not original:
+            self.logger.warning("Clipboard empty after Ctrl+C simulation")
+            return None
+
+        key = selection_key(original)
+        transformed = self.cache.get(key, mode)
+        if transformed is None:
+            with self._metrics.span("transform.transform"):
+                transformed = self._transform_case(original, mode)
+            self.cache.put(original, mode, transformed, key)
+        if transformed == original:
+            self.logger.debug("Text already in target case, skipping paste")
+            return None
+
+        if not self._output_text(transformed, "transform"):
+            return None
+        self._last = PastedText(key, mode, transformed, self._app, self._watcher.sequence())
+        return transformed
+
+    def _output_text(self, text, span_prefix):
+        """Replace the selection with `text`, typed or pasted depending on the `output` setting.
+
+        Typing leaves the clipboard alone and works where pasting is blocked,
+        but only pays off for short text. Returns False if a paste failed.
+        """
+        if self._should_type(text):
+            self.logger.debug("Typing %d characters instead of pasting", len(text))
+            with self._metrics.span(f"{span_prefix}.type_keystrokes"):
+                self._type_text(text)
+            return True
+        return self._paste_text(text, span_prefix)
+
+    def _should_type(self, text):
+        settings = get_settings()
+        output = settings.get("transform", "output")
+        if output == "paste" or not self._keymap:
+            return False
+        if output != "type" and len(text) > settings.getint("transform", "type_max_chars"):
+            return False
+        return can_type(text, self._keymap)
+
+    def _paste_text(self, text, span_prefix):
+        """Put `text` on the clipboard and press Ctrl+V. Returns False if the write did not show up."""
+        self._save_clipboard()
+        seq = self._watcher.sequence()
+        with self._metrics.span(f"{span_prefix}.clipboard_write"):
+            self._set_clipboard(text)
+        if not self._wait_for_clipboard(seq, CLIPBOARD_SET_TIMEOUT_MS, "clipboard write", f"{span_prefix}.write_wait"):
+            return False
+        self._paste()
+        return True
+
+    def _replace_last(self, job):
+        """Replace the text the last transformation pasted (see ReplaceJob).
+
+        The pasted text is re-selected with Shift+Left and replaced by a
+        cached result, without Ctrl+C. Returns the chain now in place, or
+        "" for the original.
+        """
+        last = self._last
+        if last is not None and (
+            time.monotonic() - last.at > REPLACE_WINDOW_S
+            or last.app != self._app
+            or (self._watcher.available and self._watcher.sequence() != last.clipboard_seq)
+        ):
+            # Too old, another window, or the clipboard was used since: the caret may have moved
+            last = self._last = None
+        original = self.cache.original(last.key) if last is not None else None
+        if original is None:
+            raise TransformAborted("Nothing to undo" if job.mode == "undo" else "Nothing to cycle")
+
+        if job.mode == "undo":
+            chain = last.undone if last.chain is None else None
+        else:
+            chain = self._next_cycle_mode(last, original)
+        if chain is None:
+            text = original
+        else:
+            text = self.cache.get(last.key, chain)
+            if text is None:
+                with self._metrics.span("transform.transform"):
+                    text = self._transform_case(original, chain)
+                self.cache.put(original, chain, text, last.key)
+        if text == last.text:
+            raise TransformAborted("Nothing to change")
+
+        steps = caret_steps(last.text)
+        if steps > REPLACE_MAX_STEPS:
+            self._last = None
+            raise TransformAborted("Too long to replace, use Ctrl+Z")
+        primary_seq = self._primary.sequence()
+        with self._metrics.span(f"{job.mode}.select_keystrokes"):
+            self._press_repeated(e.KEY_LEFT, steps, e.KEY_LEFTSHIFT)
+        if not self._selection_matches(primary_seq, last.text):
+            # Collapse the selection back to where the caret was
+            self._press_combo(e.KEY_RIGHT)
+            self._last = None
+            raise TransformAborted("Text changed since the paste")
+
+        if not self._output_text(text, job.mode):
+            return None
+        undone = last.chain if job.mode == "undo" and chain is None else None
+        self._last = PastedText(last.key, chain, text, self._app, self._watcher.sequence(), undone)
+        return chain or ""
+
+    def _next_cycle_mode(self, last, original):
+        modes = []
+        for name in get_settings().get("transform", "cycle_modes").split():
+            try:
+                modes.append(CHAIN_SEPARATOR.join(parse_chain(name)))
+            except UnknownModeError as ex:
+                self.logger.warning("Ignoring cycle mode: %s", ex)
+        if not modes:
+            raise TransformAborted("No cycle modes configured")
+        start = modes.index(last.chain) + 1 if last.chain in modes else 0
+        # Skip modes that would paste the same text again
+        for i in range(len(modes)):
+            chain = modes[(start + i) % len(modes)]
+            result = self.cache.get(last.key, chain)
+            if result is None:
+                result = self._transform_case(original, chain)
+                self.cache.put(original, chain, result, last.key)
+            if result != last.text:
+                return chain
+        raise TransformAborted("Nothing to change")
+
+    def _selection_matches(self, since, expected):
+        """Check the re-selected text against `expected` through the primary selection.
+
+        Returns True when it matches or cannot be checked (no primary
+        selection, or the application did not publish one in time).
+        """
+        if not self._primary.available:
+            return True
+        if self._primary.wait_for_change(since, SELECT_CHECK_TIMEOUT_MS) is None:
+            self.logger.debug("Re-selected text not published as primary selection; not checked")
+            return True
+        seq, data, _changed_at = self._primary.offer()
+        # This selection is replaced right away; never transform it from the primary selection
+        self._primary_taken = seq
+        if data is None:
+            return True
+        selected = data.decode("utf-8", errors="replace").replace("\r\n", "\n")
+        return selected == expected.replace("\r\n", "\n")
+
+    def _paste(self):
+        self.logger.debug("Simulating Ctrl+V for paste")
+        # 2. Simulate Ctrl+V
+        with self._metrics.span("transform.paste_keystroke"):
+            self._press_combo(e.KEY_LEFTCTRL, e.KEY_V)
+
+    def _stream_transform(self, job, reader, head, settings):
+        """Transform a large selection chunk by chunk straight into the clipboard writer."""
+        limit = settings.getint("transform", "max_selection_mb") * MB
+        self.logger.info("Large selection, streaming %s transform", job.mode)
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        stream = StreamTransformer(job.mode)
+        self._save_clipboard()
+        writer = self._clipboard.open_writer()
+        done = 0
+        reported = 0
+        chunk = head
+        try:
+            while chunk:
+                done += len(chunk)
+                if done > limit:
+                    raise TransformAborted(f"Selection too large (over {limit // MB} MB)")
+                if self._cancel.is_set():
+                    raise TransformAborted("Transformation cancelled")
+                writer.write(stream.feed(decoder.decode(chunk)).encode("utf-8"))
+                if done - reported >= PROGRESS_STEP_BYTES:
+                    reported = done
+                    self.progress.emit(job, done)
+                chunk = reader.read(STREAM_CHUNK_BYTES)
+            tail = stream.feed(decoder.decode(b"", final=True)) + stream.flush()
+            writer.write(tail.encode("utf-8"))
+        except BaseException:
+            # wl-copy never saw EOF, so the clipboard is left as it was
+            writer.abort()
+            raise
+
+        seq = self._watcher.sequence()
+        writer.commit()
+        self.logger.debug("Streamed %.1f MB through %s transform", done / MB, job.mode)
+        if not self._wait_for_clipboard(seq, CLIPBOARD_SET_TIMEOUT_MS, "clipboard write", "transform.write_wait"):
+            return None
+        self._paste()
+        return True
+
+    def _expand_before_cursor(self, job):
+        """Replace the abbreviation before the cursor with its snippet.
+
+        Returns the expanded abbreviation, or None if the word before the
+        cursor is not a snippet.
+        """
+        self.logger.debug("Selecting the word before the cursor for expansion")
+        with self._metrics.span("expand.select_keystrokes"):
+            self._press_combo(e.KEY_LEFTCTRL, e.KEY_LEFTSHIFT, e.KEY_LEFT)
+        if not self._copy_selection("expand"):
+            # Nothing was selected (e.g. cursor at the start of the line)
+            return None
+
+        reader = self._clipboard.open_reader()
+        try:
+            word = reader.read(EXPAND_MAX_WORD_BYTES + 1)
+        finally:
+            reader.close()
+        match = None
+        if len(word) <= EXPAND_MAX_WORD_BYTES:
+            with self._metrics.span("expand.lookup"):
+                match = job.lookup(word.decode("utf-8", errors="replace"))
+        if match is None:
+            # Collapse the selection back to where the cursor was
+            self._press_combo(e.KEY_RIGHT)
+            return None
+
+        abbr, body = match
+        text = word.decode("utf-8", errors="replace")
+        if not self._output_text(text[:len(text) - len(abbr)] + body, "expand"):
+            return None
+        return abbr
 
     def _set_clipboard(self, text):
         try:
-            p = subprocess.Popen(["wl-copy", "-n"], stdin=subprocess.PIPE, text=True)
-            p.communicate(input=text)
+            self._clipboard.set_text(text)
         except Exception as e:
-            self.logger.error(f"Failed to set clipboard: {e}")
+            self.logger.error("Failed to set clipboard: %s", e)
 
     def _transform_case(self, text, mode):
-        if mode == "upper": return text.upper()
-        if mode == "lower": return text.lower()
-        if mode == "title": return text.title()
-        if mode == "camel":
-            parts = text.replace("-", " ").replace("_", " ").split()
-            if not parts: return ""
-            return parts[0].lower() + "".join(p.capitalize() for p in parts[1:])
-        return text
-
-class TextEngine:
-    """Wrapper to run transformation in a separate thread."""
-    @staticmethod
-    def process_selection(mode, on_finished):
-        logger = get_logger()
-        logger.debug(f"Process selection triggered with mode: {mode}")
-
-        thread = QThread()
-        worker = TransformationWorker(mode)
-        worker.moveToThread(thread)
-
-        thread.started.connect(worker.run)
-        worker.finished.connect(lambda res: on_finished(res))
+        # A mode may be a chain of steps applied in order
+        return apply_chain(text, mode)
+
+
+class TextEngine(QObject):
+    """Dispatches transformations to the resident worker and tracks queue statistics."""
+
+    def __init__(self):
+        super().__init__()
+        self.logger = get_logger()
+        self._worker = TransformationWorker()
+        self._worker.job_finished.connect(self._on_job_finished)
+        self._worker.error.connect(self._on_job_error)
+        self._worker.aborted.connect(self._on_job_aborted)
+        self._worker.progress.connect(self._on_job_progress)
+        self._osd_cancel_connected = False
+
+        self._outstanding = 0  # jobs submitted and not finished yet
+        self._jobs_done = 0
+        self._total_wait_ms = 0.0
+        self._max_wait_ms = 0.0
+        self._last_wait_ms = 0.0
+
+    def start(self):
+        """Start the worker so the virtual keyboard is ready before the first trigger."""
+        if not self._worker.isRunning():
+            self.logger.debug("Starting transformation worker")
+            self._worker.start()
+
+    def shutdown(self):
+        if self._worker.isRunning():
+            self.logger.debug("Stopping transformation worker")
+            self._worker.stop()
+
+    def cancel(self):
+        """Cancel the transformation that is currently streaming, if any."""
+        self.logger.info("Cancelling current transformation")
+        self._worker.cancel()
+
+    @property
+    def idle(self):
+        """True when no job is queued or running."""
+        return self._outstanding == 0
+
+    def process_selection(self, mode, on_finished):
+        depth = self._submit(TransformJob(mode, on_finished))
+        self.logger.debug("Process selection queued with mode: %s (queue depth %s)", mode, depth)
+
+    def replace_last(self, mode, on_finished):
+        """Queue an undo ("undo") or mode cycle ("cycle") of the last transformation."""
+        depth = self._submit(ReplaceJob(mode, on_finished))
+        self.logger.debug("%s of the last transformation queued (queue depth %s)", mode, depth)
+
+    def expand_abbreviation(self, lookup, on_finished):
+        """Queue expansion of the abbreviation before the cursor (see ExpandJob)."""
+        depth = self._submit(ExpandJob(lookup, on_finished))
+        self.logger.debug("Expansion queued (queue depth %s)", depth)
+
+    def _submit(self, job):
+        self.start()
+        self._outstanding += 1
+        return self._worker.submit(job)
 
+    def stats(self):
+        """Return queue depth and per-job wait time statistics."""
+        done = self._jobs_done
+        return {
+            "queue_depth": self._worker.queue_depth(),
+            "jobs_done": done,
+            "last_wait_ms": round(self._last_wait_ms, 2),
+            "avg_wait_ms": round(self._total_wait_ms / done, 2) if done else 0.0,
+            "max_wait_ms": round(self._max_wait_ms, 2),
+            "cache": self._worker.cache.stats(),
+        }
+
+    def _record_wait(self, job):
+        self._outstanding -= 1
+        self._jobs_done += 1
+        self._last_wait_ms = job.wait_ms
+        self._total_wait_ms += job.wait_ms
+        self._max_wait_ms = max(self._max_wait_ms, job.wait_ms)
+
+    @pyqtSlot(object, object)
+    def _on_job_finished(self, job, result):
+        self._record_wait(job)
+        job.on_finished(result)
+
+    @pyqtSlot(object, int)
+    def _on_job_progress(self, job, done):
+        osd = get_osd()
+        if not self._osd_cancel_connected:
+            osd.clicked.connect(self.cancel)
+            self._osd_cancel_connected = True
+        osd.show_progress(f"Transforming… {done // MB} MB\n(click to cancel)")
+
+    @pyqtSlot(object, str)
+    def _on_job_aborted(self, job, reason):
+        self._record_wait(job)
+        get_osd().show_message(reason)
+
+    @pyqtSlot(object, str)
+    def _on_job_error(self, job, err):
         # Log errors and show OSD notification to user
-        def handle_error(err):
-            logger.error(f"TextEngine Worker error: {err}")
-            try:
-                get_osd().show_message("Transformation Failed")
-            except Exception as osd_err:
-                logger.warning(f"Failed to show OSD error: {osd_err}")
+        self._record_wait(job)
+        self.logger.error("TextEngine Worker error: %s", err)
+        try:
+            get_osd().show_message(
+                "Expansion Failed" if isinstance(job, ExpandJob) else "Transformation Failed"
+            )
+        except Exception as osd_err:
+            self.logger.warning("Failed to show OSD error: %s", osd_err)
 
-        worker.error.connect(handle_error)
 
-        worker.finished.connect(thread.quit)
-        worker.finished.connect(worker.deleteLater)
-        thread.finished.connect(thread.deleteLater)
+class TransformScheduler(QObject):
+    """Serializes transform requests and coalesces bursts into one mode chain.
 
-        # Keep references to prevent GC with bounded list
-        TextEngine._active_threads = getattr(TextEngine, "_active_threads", [])
+    A request that finds the engine idle is dispatched at once. Requests
+    arriving while a job is queued or running are held for
+    TRANSFORM_DEBOUNCE_MS: repeats of the last mode are dropped, and
+    distinct modes are appended to the pending chain, so Caps+X,L followed
+    by Caps+X,C and Caps+X,T during one transformation become a single
+    "camel|title" job with one Ctrl+C / Ctrl+V round-trip.
+    """
 
-        # Limit the list size to prevent unbounded growth
-        if len(TextEngine._active_threads) >= MAX_ACTIVE_THREADS:
-            # Remove oldest finished threads
-            TextEngine._active_threads = [
-                (t, w) for t, w in TextEngine._active_threads
-                if t.isRunning()
-            ][:MAX_ACTIVE_THREADS - 1]
+    def __init__(self, engine, on_finished):
+        super().__init__()
+        self.logger = get_logger()
+        self._engine = engine
+        self._on_finished = on_finished
+        self._pending = []
+        self._last_chain = None
+        self._last_dispatch_at = 0.0
 
-        TextEngine._active_threads.append((thread, worker))
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._dispatch)
 
-        # Cleanup routine with error handling
-        def cleanup():
-            try:
-                if (thread, worker) in TextEngine._active_threads:
-                    TextEngine._active_threads.remove((thread, worker))
-            except (ValueError, RuntimeError) as e:
-                logger.debug(f"Thread cleanup note: {e}")
+    def request(self, mode):
+        """Queue `mode` (a mode or chain). Raises UnknownModeError for unknown modes."""
+        steps = parse_chain(mode)
+
+        now = time.monotonic()
+        if not self._pending and steps == self._last_chain \
+                and (now - self._last_dispatch_at) * 1000 < TRANSFORM_DEBOUNCE_MS:
+            self.logger.debug("Dropping duplicate transform request: %s", mode)
+            return
+        if self._pending[-len(steps):] == steps:
+            self.logger.debug("Dropping duplicate transform request: %s", mode)
+            return
+
+        self._pending.extend(steps)
+        if len(self._pending) == len(steps) and self._engine.idle:
+            self._timer.stop()
+            self._dispatch()
+            return
+        self._timer.start(TRANSFORM_DEBOUNCE_MS)
+        self.logger.debug("Pending transform chain: %s", CHAIN_SEPARATOR.join(self._pending))
+
+    @pyqtSlot()
+    def _dispatch(self):
+        steps, self._pending = self._pending, []
+        if not steps:
+            return
+        chain = CHAIN_SEPARATOR.join(steps)
+        self._last_chain = steps
+        self._last_dispatch_at = time.monotonic()
+        self._engine.process_selection(chain, lambda res: self._on_finished(chain, res))
+
+
+_engine_instance = None
 
-        thread.finished.connect(cleanup)
-        thread.start()
+def get_text_engine():
+    global _engine_instance
+    if _engine_instance is None:
+        _engine_instance = TextEngine()
+    return _engine_instance
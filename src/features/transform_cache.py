@@ -0,0 +1,136 @@
+"""
+Recent transformation results, kept for undo and mode cycling.
+
+Each transformed selection is stored under a hash of its text together
+with the results computed for it so far, one per mode chain. Undoing a
+transformation or cycling the same selection through other modes then
+pastes a stored result instead of copying and transforming again.
+
+The cache is bounded by an entry count and a byte budget; when over
+budget, the least recently used large selections go first.
+
+This module only uses the standard library.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+
+MB = 1024 * 1024
+
+# Selections kept, and the budget for their text plus all results
+MAX_SELECTIONS = 32
+MAX_BYTES = 16 * MB
+# Selections at least this big are evicted first when over the byte budget
+LARGE_SELECTION_BYTES = 1 * MB
+
+
+def selection_key(text):
+    return hashlib.blake2b(text.encode("utf-8", errors="surrogatepass"), digest_size=16).digest()
+
+
+def _text_bytes(text):
+    # Close enough for budgeting and much cheaper than encoding
+    return len(text) if text.isascii() else len(text) * 4
+
+
+class CachedSelection:
+    __slots__ = ("key", "original", "results", "size")
+
+    def __init__(self, key, original):
+        self.key = key
+        self.original = original
+        self.results = {}  # chain -> transformed text
+        self.size = _text_bytes(original)
+
+
+class TransformCache:
+    """LRU of transformed selections and their results per mode chain."""
+
+    def __init__(self, max_selections=MAX_SELECTIONS, max_bytes=MAX_BYTES):
+        self.max_selections = max_selections
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._selections = OrderedDict()  # key -> CachedSelection, oldest first
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._selections)
+
+    @property
+    def total_bytes(self):
+        return self._bytes
+
+    def get(self, key, chain):
+        """Return the cached result of `chain` for selection `key`, or None."""
+        with self._lock:
+            selection = self._selections.get(key)
+            result = selection.results.get(chain) if selection is not None else None
+            if result is None:
+                self.misses += 1
+                return None
+            self._selections.move_to_end(key)
+            self.hits += 1
+            return result
+
+    def original(self, key):
+        """Return the text of selection `key` before any transformation, or None if evicted."""
+        with self._lock:
+            selection = self._selections.get(key)
+            return selection.original if selection is not None else None
+
+    def put(self, original, chain, result, key=None):
+        """Store `result` as `chain` applied to `original`. Returns the selection key."""
+        key = key or selection_key(original)
+        size = _text_bytes(result)
+        with self._lock:
+            selection = self._selections.get(key)
+            if selection is None:
+                selection = self._selections[key] = CachedSelection(key, original)
+                self._bytes += selection.size
+            else:
+                self._selections.move_to_end(key)
+            previous = selection.results.get(chain)
+            if previous is not None:
+                selection.size -= _text_bytes(previous)
+                self._bytes -= _text_bytes(previous)
+            selection.results[chain] = result
+            selection.size += size
+            self._bytes += size
+            self._evict(keep=key)
+        return key
+
+    def clear(self):
+        with self._lock:
+            self._selections.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "selections": len(self._selections),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def _evict(self, keep):
+        while len(self._selections) > self.max_selections:
+            self._drop(next(iter(self._selections.values())))
+        if self._bytes > self.max_bytes:
+            # Large selections cost the most and are rarely cycled again; drop those first
+            large = [s for s in self._selections.values() if s.size >= LARGE_SELECTION_BYTES and s.key != keep]
+            for selection in large:
+                if self._bytes <= self.max_bytes:
+                    break
+                self._drop(selection)
+        while self._bytes > self.max_bytes and len(self._selections) > 1:
+            self._drop(next(s for s in self._selections.values() if s.key != keep))
+        if self._bytes > self.max_bytes:
+            # The selection just stored does not fit on its own
+            self._drop(self._selections[keep])
+
+    def _drop(self, selection):
+        del self._selections[selection.key]
+        self._bytes -= selection.size
@@ -0,0 +1,349 @@
+"""
+Case transformation engine.
+
+Modes are registered by name and can be chained ("lower|camel"). Identifier
+style modes (camel, pascal, snake, kebab, constant) share one compiled
+tokenizer that splits text into words in a single linear scan, handling
+camelCase humps, acronyms (HTTPServer -> HTTP, Server), digits and any
+separator. Each line of the input becomes one identifier.
+
+Every mode also declares a boundary: a pattern after which its output no
+longer depends on earlier text (whitespace for upper and lower, a newline
+for title and the identifier modes, a sentence end for sentence).
+StreamTransformer uses it to transform large input chunk by chunk,
+carrying only the unfinished tail between chunks. The result is the same
+as a single call unless a stretch without a boundary (one title line, one
+sentence) grows past STREAM_MAX_CARRY; that stretch is then cut where it
+stands.
+
+This module only uses the standard library so the CLI can import it
+without booting Qt.
+"""
+import re
+from functools import lru_cache
+
+# Separates the steps of a mode chain, e.g. "lower|camel"
+CHAIN_SEPARATOR = "|"
+
+# Only the tail of a buffer is searched for a safe cut point
+STREAM_CUT_WINDOW = 64 * 1024
+# How far back into the carried tail a boundary match may start
+STREAM_CARRY_LOOKBACK = 1024
+# Text without any boundary is force-cut once the carried tail grows this big
+STREAM_MAX_CARRY = 4 * 1024 * 1024
+
+# Places after which each kind of mode starts from a clean state
+WORD_BOUNDARY = re.compile(r"\s")
+LINE_BOUNDARY = re.compile(r"\n")
+SENTENCE_BOUNDARY = re.compile(r"[.!?]\s+(?=\S)")
+
+
+class UnknownModeError(ValueError):
+    """Raised when a transform mode is not registered."""
+    pass
+
+
+class Mode:
+    """A registered case transformation."""
+
+    def __init__(self, name, func, description, boundary):
+        self.name = name
+        self.func = func
+        self.description = description
+        self.boundary = boundary
+
+    def __call__(self, text):
+        return self.func(text)
+
+    def safe_cut(self, text, start=0):
+        """Return the last offset where `text` can be split without changing the result.
+
+        Boundaries are searched from `start`; the tail window is tried first
+        so the common case does not walk the whole buffer.
+        """
+        window_start = max(start, len(text) - STREAM_CUT_WINDOW)
+        cut = self._last_boundary(text, window_start)
+        if cut == 0 and window_start > start:
+            cut = self._last_boundary(text, start)
+        return cut
+
+    def _last_boundary(self, text, start):
+        cut = 0
+        for m in self.boundary.finditer(text, start):
+            cut = m.end()
+        return cut
+
+
+_MODES = {}
+
+def register_mode(name, description, boundary=WORD_BOUNDARY):
+    """Decorator registering `func(text) -> text` as a transform mode."""
+    def decorator(func):
+        _MODES[name] = Mode(name, func, description, boundary)
+        return func
+    return decorator
+
+def available_modes():
+    return list(_MODES)
+
+def get_mode(name):
+    try:
+        return _MODES[name]
+    except KeyError:
+        raise UnknownModeError(
+            f"Unknown mode '{name}' (available: {', '.join(_MODES)})"
+        ) from None
+
+def parse_chain(chain):
+    """Split a mode chain such as "lower|camel" into validated mode names."""
+    steps = [step.strip() for step in chain.split(CHAIN_SEPARATOR) if step.strip()]
+    if not steps:
+        raise UnknownModeError("No transform mode given")
+    for step in steps:
+        get_mode(step)
+    return steps
+
+def apply_chain(text, chain):
+    """Apply every mode of `chain` to `text` in order."""
+    for step in parse_chain(chain):
+        text = _MODES[step](text)
+    return text
+
+
+class StreamTransformer:
+    """Applies a mode chain to text that arrives in chunks.
+
+    Each mode keeps back the text after its last boundary until more input
+    (or flush) arrives, so words, lines and sentences spanning chunk edges
+    are transformed as in one call. The exception is a stretch without a
+    boundary longer than STREAM_MAX_CARRY, which is force-cut to bound
+    memory; the text around that cut may then differ from one call (a
+    half of a title line judged as shouted, a capital mid-sentence). Only
+    the last STREAM_CARRY_LOOKBACK characters of the carry are searched for
+    the start of a boundary; a boundary missed that way only delays the cut.
+    Chains run as a pipeline of per-mode stages.
+    """
+
+    def __init__(self, chain):
+        self._modes = [_MODES[step] for step in parse_chain(chain)]
+        self._carry = [""] * len(self._modes)
+
+    def feed(self, text):
+        """Transform `text` and return the output that is final so far."""
+        for i, mode in enumerate(self._modes):
+            carry = self._carry[i]
+            buf = carry + text
+            # The carry holds no complete boundary, so only its end can be part of one
+            cut = mode.safe_cut(buf, max(0, len(carry) - STREAM_CARRY_LOOKBACK))
+            if cut == 0 and len(buf) > STREAM_MAX_CARRY:
+                # No boundary at all in a huge run; give up exactness to bound memory
+                cut = len(buf)
+            self._carry[i] = buf[cut:]
+            text = mode(buf[:cut]) if cut else ""
+        return text
+
+    def flush(self):
+        """Transform and return everything still held back."""
+        text = ""
+        for i, mode in enumerate(self._modes):
+            buf = self._carry[i] + text
+            self._carry[i] = ""
+            text = mode(buf) if buf else ""
+        return text
+
+
+# --- Tokenizer ---------------------------------------------------------------
+
+def _char_class(predicate):
+    """Build a regex character class body for all BMP characters matching `predicate`."""
+    parts = []
+    start = prev = None
+    for cp in range(0x10000):
+        if predicate(chr(cp)):
+            if start is None:
+                start = cp
+            prev = cp
+        elif start is not None:
+            parts.append(re.escape(chr(start)) if start == prev
+                         else f"{re.escape(chr(start))}-{re.escape(chr(prev))}")
+            start = None
+    return "".join(parts)
+
+@lru_cache(maxsize=None)
+def _case_classes():
+    # Built on first use; scanning the BMP takes a few ms
+    return _char_class(str.isupper), _char_class(str.islower)
+
+@lru_cache(maxsize=None)
+def _tokenizer():
+    upper, lower = _case_classes()
+    return re.compile(
+        rf"[{upper}]+(?=[{upper}][{lower}])"  # acronym before a capitalised word
+        rf"|[{upper}]?[{lower}]+\d*"          # word, optionally capitalised
+        rf"|[{upper}]+\d*"                    # trailing acronym
+        rf"|\d+"
+        rf"|[^\W\d_]+"                        # letters without case (CJK, ...)
+    )
+
+@lru_cache(maxsize=None)
+def _acronym_re():
+    upper, _ = _case_classes()
+    return re.compile(rf"\b[{upper}]{{2,}}\b")
+
+def tokenize(text):
+    """Return the words of `text` as identifier tokens."""
+    return _tokenizer().findall(text)
+
+def _render_identifiers(text, join):
+    # The tokenizer scans each line once; `join` builds the identifier from
+    # the token list with C-level string operations
+    findall = _tokenizer().findall
+    out = []
+    for line in text.split("\n"):
+        body = line.lstrip(" \t")
+        # Keep indentation and CRLF endings so multi-line selections stay aligned
+        indent = line[:len(line) - len(body)]
+        words = findall(body)
+        rendered = indent + join(words) if words else indent
+        if body.endswith("\r"):
+            rendered += "\r"
+        out.append(rendered)
+    return "\n".join(out)
+
+
+# --- Prose helpers -----------------------------------------------------------
+
+_WORD_RE = re.compile(r"[^\W_]+(?:['’][^\W_]+)*")
+# Letters str.title() wrongly capitalises: after an apostrophe or a digit
+# (each alternative starts with a literal class so most positions fail fast)
+_TITLE_FIX_RE = re.compile(r"['’](?<=[^\W_]['’])[^\W\d_]+|\d[^\W\d_]+")
+_TEXT_START_RE = re.compile(r"\A\W*[^\W\d_]")
+_SENTENCE_START_RE = re.compile(r"[.!?]\s+\W*[^\W\d_]")
+
+def _lower_match(match):
+    return match.group().lower()
+
+def _upper_last(match):
+    s = match.group()
+    return s[:-1] + s[-1].upper()
+
+def _is_acronym(word):
+    return len(word) > 1 and word.isupper()
+
+def _title_word(match):
+    word = match.group()
+    if _is_acronym(word):
+        return word
+    return word[:1].upper() + word[1:].lower()
+
+def _title_word_shouted(match):
+    word = match.group()
+    return word[:1].upper() + word[1:].lower()
+
+def _restore_acronyms(original, transformed, unit_boundary):
+    """Copy all-caps words from `original` back into the same-length `transformed`.
+
+    `unit_boundary` splits the text into the units its mode works on
+    (lines, sentences). A unit written entirely in capitals has no acronyms
+    to tell apart, so it keeps its transformed case; the decision never
+    looks past the unit, so it does not depend on where the text is cut.
+    """
+    pieces = []
+    pos = 0
+    cuts = unit_boundary.finditer(original)
+    unit_start = unit_end = 0
+    shouted = False
+    for m in _acronym_re().finditer(original):
+        if m.start() >= unit_end:
+            # Move on to the unit holding this acronym
+            unit_start = unit_end
+            for cut in cuts:
+                if cut.end() > m.start():
+                    unit_end = cut.end()
+                    break
+                unit_start = cut.end()
+            else:
+                unit_end = len(original)
+            shouted = original[unit_start:unit_end].isupper()
+        if shouted:
+            continue
+        pieces.append(transformed[pos:m.start()])
+        pieces.append(m.group())
+        pos = m.end()
+    if not pieces:
+        return transformed
+    pieces.append(transformed[pos:])
+    return "".join(pieces)
+
+
+# --- Modes -------------------------------------------------------------------
+
+@register_mode("upper", "UPPER CASE")
+def to_upper(text):
+    return text.upper()
+
+@register_mode("lower", "lower case")
+def to_lower(text):
+    return text.lower()
+
+def _title_line(line):
+    titled = line.title()
+    if len(titled) != len(line):
+        # Case mapping changed the length (e.g. ß), so positions no longer line up
+        return _WORD_RE.sub(_title_word_shouted if line.isupper() else _title_word, line)
+    return _restore_acronyms(line, _TITLE_FIX_RE.sub(_lower_match, titled), LINE_BOUNDARY)
+
+def _lower_sentence(sentence):
+    lowered = sentence.lower()
+    if len(lowered) != len(sentence):
+        return lowered
+    return _restore_acronyms(sentence, lowered, SENTENCE_BOUNDARY)
+
+def _sentences(text):
+    pos = 0
+    for m in SENTENCE_BOUNDARY.finditer(text):
+        yield text[pos:m.end()]
+        pos = m.end()
+    yield text[pos:]
+
+# Whether a line is all capitals decides how its words are cased, so title works per line
+@register_mode("title", "Title Case (keeps apostrophes and acronyms)", LINE_BOUNDARY)
+def to_title(text):
+    titled = text.title()
+    if len(titled) != len(text):
+        return "\n".join(map(_title_line, text.split("\n")))
+    return _restore_acronyms(text, _TITLE_FIX_RE.sub(_lower_match, titled), LINE_BOUNDARY)
+
+@register_mode("sentence", "Sentence case", SENTENCE_BOUNDARY)
+def to_sentence(text):
+    lowered = text.lower()
+    # Acronyms go back in before sentence starts are capitalised, which may change the length (ß -> SS)
+    if len(lowered) == len(text):
+        lowered = _restore_acronyms(text, lowered, SENTENCE_BOUNDARY)
+    else:
+        # Lowering never shortens a character, so only sentences that grew are left without acronyms
+        lowered = "".join(map(_lower_sentence, _sentences(text)))
+    return _SENTENCE_START_RE.sub(_upper_last, _TEXT_START_RE.sub(_upper_last, lowered, count=1))
+
+def _camel_join(words):
+    return words[0].lower() + "".join(map(str.capitalize, words[1:]))
+
+@register_mode("camel", "camelCase", LINE_BOUNDARY)
+def to_camel(text):
+    return _render_identifiers(text, _camel_join)
+
+@register_mode("pascal", "PascalCase", LINE_BOUNDARY)
+def to_pascal(text):
+    return _render_identifiers(text, lambda words: "".join(map(str.capitalize, words)))
+
+@register_mode("snake", "snake_case", LINE_BOUNDARY)
+def to_snake(text):
+    return _render_identifiers(text, lambda words: "_".join(words).lower())
+
+@register_mode("kebab", "kebab-case", LINE_BOUNDARY)
+def to_kebab(text):
+    return _render_identifiers(text, lambda words: "-".join(words).lower())
+
+@register_mode("constant", "CONSTANT_CASE", LINE_BOUNDARY)
+def to_constant(text):
+    return _render_identifiers(text, lambda words: "_".join(words).upper())
@@ -1,9 +1,21 @@
+from collections import OrderedDict
 from PyQt6.QtWidgets import QWidget, QLabel, QVBoxLayout
-from PyQt6.QtCore import Qt, QTimer
+from PyQt6.QtCore import Qt, QTimer, QPoint, pyqtSignal
 from PyQt6.QtGui import QFont
 from core.logger import get_logger
 
+# Number of message geometries remembered so repeated messages skip the relayout
+GEOMETRY_CACHE_SIZE = 64
+
 class OSD(QWidget):
+    """On-screen display for short status messages.
+
+    Repeats of the message currently on screen are coalesced into one
+    ("Converted to camel ×3") instead of flashing the OSD again, and the
+    size and position of recent messages are cached.
+    """
+    clicked = pyqtSignal()
+
     def __init__(self):
         super().__init__()
         self.logger = get_logger()
@@ -39,21 +51,72 @@ class OSD(QWidget):
         self._hide_timer.setSingleShot(True)
         self._hide_timer.timeout.connect(self.hide)
 
+        self._geometry_cache = OrderedDict()
+        self._current = None
+        self._repeats = 0
+
+    def prewarm(self):
+        """Load fonts, parse the stylesheet and create the window without showing it."""
+        self.ensurePolished()
+        self._label.ensurePolished()
+        self.winId()
+        self._layout.activate()
+        self.logger.debug("OSD pre-warmed")
+
     def show_message(self, text, duration=1500):
-        self.logger.debug(f"OSD Message: {text}")
+        self.logger.debug("OSD Message: %s", text)
+        if self.isVisible() and self._hide_timer.isActive() and text == self._current:
+            self._repeats += 1
+            self._show_text(f"{text} ×{self._repeats}")
+        else:
+            self._current = text
+            self._repeats = 1
+            self._show_text(text)
+        self._hide_timer.start(duration)
+
+    def show_progress(self, text):
+        """Show a message that stays up until the next show_message."""
+        self._hide_timer.stop()
+        self._current = None
+        self._show_text(text)
+
+    def hideEvent(self, event):
+        self._current = None
+        super().hideEvent(event)
+
+    def mousePressEvent(self, event):
+        self.clicked.emit()
+        super().mousePressEvent(event)
+
+    def _show_text(self, text):
+        if text == self._label.text() and self.isVisible():
+            return
         self._label.setText(text)
-        self.adjustSize()
-        
-        # Center on screen (rough approximation, can be improved)
+
         screen = self.screen()
-        if screen:
-            screen_geo = screen.geometry()
-            x = (screen_geo.width() - self.width()) // 2
-            y = (screen_geo.height() - self.height()) * 0.8
-            self.move(int(x), int(y))
-        
+        screen_geo = screen.geometry() if screen else None
+        key = (text, (screen_geo.width(), screen_geo.height()) if screen else None)
+        cached = self._geometry_cache.get(key)
+        if cached is not None:
+            self._geometry_cache.move_to_end(key)
+            size, pos = cached
+            self.resize(size)
+        else:
+            self.adjustSize()
+            size = self.size()
+            pos = None
+            # Center on screen (rough approximation, can be improved)
+            if screen:
+                x = (screen_geo.width() - self.width()) // 2
+                y = (screen_geo.height() - self.height()) * 0.8
+                pos = QPoint(int(x), int(y))
+            self._geometry_cache[key] = (size, pos)
+            if len(self._geometry_cache) > GEOMETRY_CACHE_SIZE:
+                self._geometry_cache.popitem(last=False)
+        if pos is not None:
+            self.move(pos)
+
         self.show()
-        self._hide_timer.start(duration)
 
 _osd_instance = None
 
@@ -62,3 +125,7 @@ def get_osd():
     if _osd_instance is None:
         _osd_instance = OSD()
     return _osd_instance
+
+def prewarm_osd():
+    """Build the OSD ahead of the first message so triggers do not pay for it."""
+    get_osd().prewarm()
@@ -0,0 +1,76 @@
+from PyQt6.QtCore import QObject, pyqtSignal, pyqtSlot
+from PyQt6.QtDBus import (
+    QDBusConnection, QDBusMessage, QDBusPendingCallWatcher, QDBusPendingReply, QDBusVariant
+)
+from core.logger import get_logger
+
+PORTAL_SERVICE = "org.freedesktop.portal.Desktop"
+PORTAL_PATH = "/org/freedesktop/portal/desktop"
+PORTAL_SETTINGS = "org.freedesktop.portal.Settings"
+APPEARANCE_NAMESPACE = "org.freedesktop.appearance"
+COLOR_SCHEME_KEY = "color-scheme"
+
+# color-scheme: 0 = no preference, 1 = dark, 2 = light
+COLOR_SCHEME_DARK = 1
+
+
+def _unwrap(value):
+    # The portal nests the setting in one or two variants depending on the method
+    while isinstance(value, QDBusVariant):
+        value = value.variant()
+    return value
+
+
+class ThemeWatcher(QObject):
+    """Tracks the desktop color scheme through the freedesktop settings portal.
+
+    The scheme is read once, asynchronously, and then kept up to date from
+    the portal's SettingChanged signal, so nothing is polled.
+    """
+
+    changed = pyqtSignal(bool)
+
+    def __init__(self, default_dark=True):
+        super().__init__()
+        self.logger = get_logger()
+        self.is_dark = default_dark
+        self._initial_read = None
+
+    def start(self):
+        bus = QDBusConnection.sessionBus()
+        if not bus.connect(PORTAL_SERVICE, PORTAL_PATH, PORTAL_SETTINGS,
+                           "SettingChanged", self._on_setting_changed):
+            self.logger.warning("Could not subscribe to portal SettingChanged; theme changes will be missed")
+
+        msg = QDBusMessage.createMethodCall(PORTAL_SERVICE, PORTAL_PATH, PORTAL_SETTINGS, "Read")
+        msg.setArguments([APPEARANCE_NAMESPACE, COLOR_SCHEME_KEY])
+        self._initial_read = QDBusPendingCallWatcher(bus.asyncCall(msg), self)
+        self._initial_read.finished.connect(self._on_initial_read)
+        self.logger.info("Listening for theme changes (portal SettingChanged)")
+
+    @pyqtSlot(QDBusPendingCallWatcher)
+    def _on_initial_read(self, watcher):
+        reply = QDBusPendingReply(watcher)
+        if reply.isError():
+            self.logger.warning("Theme detection failed: %s", reply.error().message())
+        else:
+            self._apply(reply.argumentAt(0))
+        watcher.deleteLater()
+        self._initial_read = None
+
+    @pyqtSlot(QDBusMessage)
+    def _on_setting_changed(self, msg):
+        args = msg.arguments()
+        if len(args) == 3 and args[0] == APPEARANCE_NAMESPACE and args[1] == COLOR_SCHEME_KEY:
+            self._apply(args[2])
+
+    def _apply(self, value):
+        try:
+            is_dark = int(_unwrap(value)) == COLOR_SCHEME_DARK
+        except (TypeError, ValueError) as e:
+            self.logger.warning("Unexpected color-scheme value %r: %s", value, e)
+            return
+        self.logger.debug("Theme detected: %s", "dark" if is_dark else "light")
+        if is_dark != self.is_dark:
+            self.is_dark = is_dark
+            self.changed.emit(is_dark)